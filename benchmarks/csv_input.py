@@ -0,0 +1,78 @@
+"""Time reading the Chamber and Westminster Hall sheets from xlsx against reading
+the same data from CSV files, and check both give the same rows.
+
+usage: python benchmarks/csv_input.py path/to/excel_file.xlsx [repeats]
+"""
+
+import csv
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from datetime import time as dt_time
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+from sessional_diary.cli import CH_SHEET_TITLE, WH_SHEET_TITLE, Sessional_Diary
+
+
+def csv_value(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, datetime) and value.time() == dt_time():
+        return value.date().isoformat()
+    if isinstance(value, (date, dt_time)):
+        return value.isoformat()
+    return str(value)
+
+
+def export_csv(excel_file_path: str, folder: Path) -> None:
+    """Save the two sheets as CSV, as the upstream system would."""
+
+    workbook = load_workbook(excel_file_path, data_only=True, read_only=True)
+    for title in (CH_SHEET_TITLE, WH_SHEET_TITLE):
+        with open(folder / f'{title}.csv', 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            for row in workbook[title].iter_rows(values_only=True):
+                writer.writerow([csv_value(value) for value in row])
+
+
+def read_rows(input_path) -> list:
+    sd = Sessional_Diary(input_path, no_excel=True)
+    rows = []
+    for title in (CH_SHEET_TITLE, WH_SHEET_TITLE):
+        rows.extend((title, c, vars(entry)) for c, entry in sd.entries(title))
+    return rows
+
+
+def timed(name: str, repeats: int, func, *args):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    print(f'{name:<8}{best:8.3f}s')
+    return best, result
+
+
+def main():
+    excel_file_path = sys.argv[1]
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with tempfile.TemporaryDirectory() as folder:
+        export_csv(excel_file_path, Path(folder))
+
+        xlsx_time, xlsx_rows = timed('xlsx', repeats, read_rows, excel_file_path)
+        csv_time, csv_rows = timed('csv', repeats, read_rows, folder)
+
+    for row in xlsx_rows + csv_rows:
+        # the diagnostics collector is not part of the row
+        row[2].pop('diagnostics', None)
+    assert xlsx_rows == csv_rows, 'the CSV rows differ from the xlsx rows'
+
+    print(f'{len(csv_rows)} rows, CSV is {xlsx_time / csv_time:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Time rendering a diary table in this process against rendering the days in a
+process pool, and check both give the same table.
+
+usage: python benchmarks/diary_render.py [sitting days] [rows per day] [processes]
+"""
+
+import pickle
+import sys
+from datetime import date, time, timedelta
+from time import perf_counter
+
+from lxml import etree
+
+from sessional_diary.diary import DiaryDay, diary_columns, render_diary
+from sessional_diary.tables import CH_Diary_Table, TableChunks
+from sessional_diary.utilities import AID, AID5, NS_MAP
+
+
+def make_days(days: int, rows: int) -> list[DiaryDay]:
+    diary_days = []
+    for d in range(days):
+        day = DiaryDay(f'{d + 1}. Day {d + 1}', date(2024, 1, 1) + timedelta(days=d),
+                       f'{d // 20 + 1:02}')
+        for r in range(rows):
+            duration = timedelta(minutes=r % 90 + 1)
+            aat = timedelta(minutes=r % 5)
+            day.rows.append((time(11 + r % 12, r % 60), f'Subject {r}',
+                             f'Detail of item {r} on day {d + 1}', duration, aat))
+            day.duration += duration
+            day.aat += aat
+        diary_days.append(day)
+    return diary_days
+
+
+def render(days: list[DiaryDay], processes: int) -> bytes:
+    table = CH_Diary_Table(nsmap=NS_MAP,  # type: ignore
+                           attrib={AID + 'table': 'table', AID + 'tcols': '4',
+                                   AID5 + 'tablestyle': 'Part1Table'})
+    table.increment_rows()
+    render_diary(table, TableChunks(table), True, days, processes=processes)
+    return etree.tostring(table)
+
+
+def timed(name: str, func, *args) -> tuple[float, bytes]:
+    start = perf_counter()
+    result = func(*args)
+    seconds = perf_counter() - start
+    print(f'{name:<16}{seconds:8.3f}s')
+    return seconds, result
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    diary_days = make_days(days, rows)
+    print(f'{days} sitting days, {days * rows} rows')
+
+    # what the workers would be sent if the rows were pickled, against the
+    # layout of the columns in shared memory
+    pickled = len(pickle.dumps([(day.title, day.rows) for day in diary_days]))
+    with diary_columns(diary_days, [timedelta()] * days, [timedelta()] * days) as columns:
+        layout = len(pickle.dumps(columns.layout))
+    print(f'pickled rows {pickled // 1024}kB, shared memory layout {layout} bytes')
+
+    serial_time, serial = timed('this process', render, diary_days, 1)
+    parallel_time, parallel = timed('process pool', render, diary_days, processes)
+
+    assert serial == parallel, 'the tables are different'
+    print(f'process pool is {serial_time / parallel_time:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""Check that an alternative engine (a faster reader, renderer or Excel writer)
+creates the same output files as the reference pipeline, and time both.
+
+The XML files have to be byte for byte the same. If they are not, the XML
+trees are compared to show where they first differ. For Analysis.xlsx the
+values and formatting of the cells are compared sheet by sheet (the files
+themselves can differ, e.g. in the order of the styles).
+
+The engines are run on generated workbooks and on anonymised copies of any
+workbooks given with --workbook (the subjects are replaced, everything that
+decides which section a row is in is kept).
+
+usage: python benchmarks/equivalence.py ENGINE [--workbook file.xlsx ...]
+                                               [--days 150 ...] [--repeats 3]
+
+ENGINE is `csv` (read the sheets from CSV files) or `module:function` for a
+function that takes the path of the Excel file and returns the output files
+like sessional_diary.api.generate.
+"""
+
+import argparse
+import hashlib
+import importlib
+import io
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
+from pathlib import Path
+from typing import Callable, Optional
+
+from csv_input import export_csv
+from lxml import etree
+from openpyxl import Workbook, load_workbook
+
+from sessional_diary.api import generate
+from sessional_diary.cli import CH_SHEET_TITLE, SUBJECT2, WH_SHEET_TITLE
+
+Engine = Callable[[str], dict]
+
+# Subject 1 and Tags of the rows in the generated Chamber sheet. These cover
+# most of the analysis sections, and some rows that are in none.
+CHAMBER_SUBJECTS = [
+    ('Questions', ''), ('Topical Questions', ''), ('Urgent Question', ''),
+    ('Statement', ''), ('Business Statement', ''), ('Committee Statement', ''),
+    ('Second reading', '[PBC]'), ('Second reading', '[PMB]'), ('Consideration', ''),
+    ('Third reading', ''), ('Other stages', ''), ('Lords Amendments', ''),
+    ('Committee of the whole House', ''), ('Allocation of time motion', ''),
+    ('Government motion', ''), ('General debate', ''), ('Opposition day', ''),
+    ('Backbench Business', ''), ('Ten minute rule motion', ''), ('Adjournment', ''),
+    ('Estimates day', ''), ('Money resolution', ''), ('Ways and Means', ''),
+    ('Affirmative statutory instrument', ''), ('Point of order', ''),
+    ('Public petition', ''), ('Tributes', ''), ('Private business', ''),
+    ('Something new', ''),
+]
+WH_SUBJECTS = [
+    'Debate (Private Member’s)', 'Debate (BBCom recommended)', 'Debate (Liaison Committee)',
+    'Petition', 'Suspension', 'Statement', 'Time limit',
+]
+WORDS = ['Rwanda', 'Health', 'Roads', 'Schools', 'Energy', 'Housing', 'Defence', 'Farming']
+
+
+def generated_workbook(file_path: Path, days: int, seed: int = 1) -> Path:
+    """A workbook with `days` Chamber sitting days and Westminster Hall sittings
+    on Tuesdays to Thursdays. There are also blank and invalid rows."""
+
+    rand = random.Random(seed)
+    wb = Workbook()
+    chamber = wb.active
+    chamber.title = CH_SHEET_TITLE
+    chamber.append(['Day', 'Date', 'Time', 'Subject 1', 'Subject 2', 'Tags', 'Duration', 'AAT'])
+    wh = wb.create_sheet(WH_SHEET_TITLE)
+    wh.append(['Day', 'Date', 'Time', 'Subject 1', 'Subject 2', 'Tags', 'Duration'])
+
+    day_date = date(2024, 9, 2)
+    wh_day = 0
+    for day in range(1, days + 1):
+        day_date += timedelta(days=1 if day_date.weekday() < 4 else 3)
+        start = datetime.combine(day_date, dt_time(11, 30))
+        chamber.append([day, day_date, start.time(), 'Prayers', '', '',
+                        dt_time(0, 5), None])
+        start += timedelta(minutes=5)
+        for _ in range(rand.randint(5, 14)):
+            subject1, tags = rand.choice(CHAMBER_SUBJECTS)
+            minutes = rand.randint(1, 180)
+            aat = dt_time(0, rand.randint(1, 45)) if rand.random() < 0.2 else None
+            chamber.append([day, day_date, start.time(), subject1, rand.choice(WORDS), tags,
+                            dt_time(minutes // 60, minutes % 60), aat])
+            start += timedelta(minutes=minutes)
+
+        if day_date.weekday() in (1, 2, 3):
+            wh_day += 1
+            start = datetime.combine(day_date, dt_time(9, 30))
+            for _ in range(rand.randint(2, 6)):
+                minutes = rand.randint(5, 90)
+                wh.append([wh_day, day_date, start.time(), rand.choice(WH_SUBJECTS),
+                           rand.choice(WORDS), '', dt_time(minutes // 60, minutes % 60)])
+                start += timedelta(minutes=minutes)
+
+        if day % 37 == 5:
+            chamber.append([None] * 8)
+            chamber.append(['bad', day_date, None, 'x', '', '', None, None])
+
+    wb.save(file_path)
+    return file_path
+
+
+def anonymised_workbook(file_path: str, anonymised_path: Path) -> Path:
+    """A copy of a workbook with every Subject 2 replaced by a made up one.
+    The same subject is always given the same replacement."""
+
+    wb = load_workbook(file_path)
+    for title in (CH_SHEET_TITLE, WH_SHEET_TITLE):
+        ws = wb[title]
+        headings = [cell.value for cell in ws[1]]
+        column = headings.index(SUBJECT2)
+        for row in ws.iter_rows(min_row=2):
+            cell = row[column]
+            if not isinstance(cell.value, str) or not cell.value.strip():
+                continue
+            if 'committee of the whole house' in cell.value.lower():
+                # this decides which section the row is in
+                continue
+            digest = hashlib.sha256(cell.value.strip().encode('UTF-8')).hexdigest()[:8]
+            cell.value = f'Subject {digest}'
+    wb.save(anonymised_path)
+    return anonymised_path
+
+
+def csv_engine(excel_file_path: str) -> dict:
+    folder = tempfile.mkdtemp()
+    export_csv(excel_file_path, Path(folder))
+    return generate(folder)
+
+
+def load_engine(name: str) -> Engine:
+    if name == 'csv':
+        return csv_engine
+    module_name, _, function_name = name.partition(':')
+    if not function_name:
+        sys.exit(f'unknown engine {name!r}, use csv or module:function')
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def xml_difference(expected: bytes, actual: bytes) -> Optional[str]:
+    """Where two XML files first differ, or None if they are the same."""
+
+    if expected == actual:
+        return None
+
+    def walk(a, b, path: str) -> Optional[str]:
+        if a.tag != b.tag:
+            return f'{path}: element {b.tag} instead of {a.tag}'
+        if dict(a.attrib) != dict(b.attrib):
+            return f'{path}: attributes {dict(b.attrib)} instead of {dict(a.attrib)}'
+        if (a.text or '') != (b.text or ''):
+            return f'{path}: text {b.text!r} instead of {a.text!r}'
+        if (a.tail or '') != (b.tail or ''):
+            return f'{path}: tail {b.tail!r} instead of {a.tail!r}'
+        for i, (child_a, child_b) in enumerate(zip(a, b)):
+            difference = walk(child_a, child_b, f'{path}/{child_a.tag.split("}")[-1]}[{i}]')
+            if difference:
+                return difference
+        if len(a) != len(b):
+            return f'{path}: {len(b)} child elements instead of {len(a)}'
+        return None
+
+    difference = walk(etree.fromstring(expected), etree.fromstring(actual), 'root')
+    # the same trees, e.g. a different XML declaration or namespace prefixes
+    return difference or 'the trees are the same but the bytes differ'
+
+
+def xlsx_cells(xlsx: bytes) -> dict[str, list]:
+    workbook = load_workbook(io.BytesIO(xlsx))
+    return {ws.title: [(cell.coordinate, cell.value, cell.font.b, cell.number_format)
+                       for row in ws.iter_rows() for cell in row]
+            for ws in workbook.worksheets}
+
+
+def xlsx_difference(expected: bytes, actual: bytes) -> Optional[str]:
+    expected_cells = xlsx_cells(expected)
+    actual_cells = xlsx_cells(actual)
+    if list(expected_cells) != list(actual_cells):
+        return f'sheets {list(actual_cells)} instead of {list(expected_cells)}'
+    for title, cells in expected_cells.items():
+        for cell_a, cell_b in zip(cells, actual_cells[title]):
+            if cell_a != cell_b:
+                return f'{title}!{cell_a[0]}: {cell_b[1:]} instead of {cell_a[1:]}'
+        if len(cells) != len(actual_cells[title]):
+            return f'{title}: {len(actual_cells[title])} cells instead of {len(cells)}'
+    return None
+
+
+def timed(engine: Engine, excel_file_path: str, repeats: int) -> tuple[float, dict]:
+    best = float('inf')
+    outputs: dict = {}
+    for _ in range(repeats):
+        start = time.perf_counter()
+        outputs = engine(excel_file_path)
+        best = min(best, time.perf_counter() - start)
+    return best, outputs
+
+
+def compare(name: str, excel_file_path: str, engine: Engine, repeats: int) -> bool:
+    reference_time, expected = timed(generate, excel_file_path, repeats)
+    engine_time, actual = timed(engine, excel_file_path, repeats)
+
+    print(f'\n{name}')
+    same = True
+    for file_name in sorted(expected):
+        if file_name not in actual:
+            difference: Optional[str] = 'missing'
+        elif file_name.endswith('.xml'):
+            difference = xml_difference(expected[file_name], actual[file_name])
+        elif file_name.endswith('.xlsx'):
+            difference = xlsx_difference(expected[file_name], actual[file_name])
+        else:
+            difference = None if expected[file_name] == actual[file_name] else 'bytes differ'
+        print(f'  {file_name:<24}{difference or "same"}')
+        same = same and difference is None
+
+    print(f'  reference {reference_time:.3f}s, engine {engine_time:.3f}s '
+          f'({reference_time / engine_time:.2f}x)')
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('engine')
+    parser.add_argument('--workbook', action='append', default=[],
+                        help='a real workbook to anonymise and use as well')
+    parser.add_argument('--days', type=int, action='append',
+                        help='number of sitting days in each generated workbook '
+                             '(default 30 and 150)')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    engine = load_engine(args.engine)
+
+    all_same = True
+    with tempfile.TemporaryDirectory() as folder:
+        workbooks = []
+        for i, days in enumerate(args.days or [30, 150]):
+            path = generated_workbook(Path(folder) / f'generated_{days}.xlsx', days, seed=i + 1)
+            workbooks.append((f'generated, {days} sitting days', path))
+        for i, workbook in enumerate(args.workbook):
+            path = anonymised_workbook(workbook, Path(folder) / f'anonymised_{i}.xlsx')
+            workbooks.append((f'anonymised {workbook}', path))
+
+        for name, path in workbooks:
+            all_same = compare(name, str(path), engine, args.repeats) and all_same
+
+    print('\nall the same' if all_same else '\nTHE OUTPUT DIFFERS')
+    sys.exit(0 if all_same else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Time creating Analysis.xlsx with openpyxl alone against creating the analysis
+sheets separately (in this process and in a process pool).
+
+usage: python benchmarks/excel_export.py [rows per sheet] [sheets]
+"""
+
+import io
+import sys
+import time
+from datetime import timedelta
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import Cell
+from openpyxl.styles import Font
+
+import sessional_diary.cli  # noqa: F401 (sets the duration number format)
+from sessional_diary.excel import COLUMN_WIDTHS, StyleIds, render_worksheets
+from sessional_diary.output import workbook_to_bytes
+from sessional_diary.tables import CH_ExcelSheet
+
+
+def make_sheets(workbook: Workbook, rows: int, sheets: int) -> list[CH_ExcelSheet]:
+    excel_sheets = []
+    for i in range(sheets):
+        sheet = CH_ExcelSheet(f'{i}:\tSection {i}', f'Section {i}', workbook)
+        for r in range(rows):
+            sheet.add_row([f'Mon,\t{r % 28 + 1:02}\tJan\t2024',
+                           f'Subject {r} of section {i}',
+                           timedelta(minutes=r % 120),
+                           timedelta(minutes=r % 7)])
+        sheet.add_totals(timedelta(hours=rows), timedelta(minutes=rows))
+        excel_sheets.append(sheet)
+    del workbook['Sheet']
+    return excel_sheets
+
+
+def openpyxl_only(rows: int, sheets: int) -> bytes:
+    """Every cell added to openpyxl worksheets, as before the sheets were
+    created separately."""
+
+    workbook = Workbook()
+    bold = Font(bold=True)
+    for excel_sheet in make_sheets(workbook, rows, sheets):
+        ws = excel_sheet.excel_sheet
+        for row in excel_sheet.data_rows:
+            ws.append(row)
+
+        totals_row = []
+        for item in excel_sheet.totals_row:
+            cell = None
+            if item is not None:
+                cell = Cell(ws, value=item.value)
+                cell.font = bold
+            totals_row.append(cell)
+
+        ws.insert_rows(1, 2)
+        ws['A1'] = excel_sheet.title.replace('\t', ' ')
+        ws['A1'].font = bold
+        for cell in ws[2]:
+            cell.font = bold
+        for cell, heading in zip(ws[2], excel_sheet.headings()):
+            cell.value = heading
+        ws.append(totals_row)
+        ws.column_dimensions['A'].width = COLUMN_WIDTHS[1]
+        ws.column_dimensions['B'].width = COLUMN_WIDTHS[2]
+    return workbook_to_bytes(workbook)
+
+
+def rendered(rows: int, sheets: int, processes=None) -> bytes:
+    workbook = Workbook()
+    excel_sheets = make_sheets(workbook, rows, sheets)
+    worksheets = render_worksheets(excel_sheets, StyleIds(workbook), processes)
+    return workbook_to_bytes(workbook, worksheets)
+
+
+def cells(xlsx: bytes) -> list:
+    """The value and formatting of every cell."""
+    workbook = load_workbook(io.BytesIO(xlsx))
+    return [(ws.title, [(cell.coordinate, cell.value, cell.font.b, cell.number_format)
+                        for row in ws.iter_rows() for cell in row])
+            for ws in workbook.worksheets]
+
+
+def timed(name: str, func, *args) -> tuple[float, bytes]:
+    start = time.perf_counter()
+    xlsx = func(*args)
+    seconds = time.perf_counter() - start
+    print(f'{name:<30}{seconds:8.2f}s')
+    return seconds, xlsx
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    sheets = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    print(f'{sheets} sheets of {rows} rows')
+
+    baseline, expected = timed('openpyxl only', openpyxl_only, rows, sheets)
+    serial, serial_xlsx = timed('separate sheets, 1 process', rendered, rows, sheets, 1)
+    parallel, parallel_xlsx = timed('separate sheets, pool', rendered, rows, sheets, 0)
+
+    # the content of the files should be the same (the style ids can differ)
+    expected_cells = cells(expected)
+    assert cells(serial_xlsx) == expected_cells, 'content differs (1 process)'
+    assert cells(parallel_xlsx) == expected_cells, 'content differs (pool)'
+
+    print(f'time saved: {baseline - min(serial, parallel):.2f}s '
+          f'({baseline / min(serial, parallel):.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
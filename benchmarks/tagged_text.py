@@ -0,0 +1,62 @@
+"""Time writing each table as XML against writing it as InDesign Tagged Text,
+and compare the sizes of the files.
+
+How long InDesign takes to import the files can only be timed in InDesign:
+import the XML file into its template (see the README) and place the .txt
+file into a text frame of the same template, timing both until the text has
+finished flowing.
+
+usage: python benchmarks/tagged_text.py path/to/excel_file.xlsx [repeats]
+"""
+
+import sys
+import time
+
+from sessional_diary.api import generate
+from sessional_diary.cli import (
+    HOUSE_ANALYSIS_FILE,
+    HOUSE_CONTENTS_FILE,
+    HOUSE_DIARY_FILE,
+    WH_ANALYSIS_FILE,
+    WH_CONTENTS_FILE,
+    WH_DIARY_FILE,
+)
+from sessional_diary.output import tree_to_bytes
+from sessional_diary.tagged_text import table_to_tagged_text
+
+XML_FILES = [HOUSE_DIARY_FILE, HOUSE_ANALYSIS_FILE, HOUSE_CONTENTS_FILE,
+             WH_DIARY_FILE, WH_ANALYSIS_FILE, WH_CONTENTS_FILE]
+
+
+def timed(repeats: int, func, *args) -> tuple[float, bytes]:
+    best = float('inf')
+    result = b''
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    excel_file_path = sys.argv[1]
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    trees = generate(excel_file_path, outputs=XML_FILES, trees=True)
+
+    print(f'{"file":<20}{"XML":>10}{"Tagged Text":>14}{"XML size":>12}{"txt size":>12}')
+    xml_total = text_total = 0.0
+    for name in XML_FILES:
+        tree = trees[name]
+        xml_time, xml = timed(repeats, tree_to_bytes, tree)
+        text_time, text = timed(repeats, table_to_tagged_text, tree.getroot()[0], name)
+        xml_total += xml_time
+        text_total += text_time
+        print(f'{name:<20}{xml_time * 1000:8.1f}ms{text_time * 1000:12.1f}ms'
+              f'{len(xml) // 1024:10}kB{len(text) // 1024:10}kB')
+
+    print(f'{"total":<20}{xml_total * 1000:8.1f}ms{text_total * 1000:12.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
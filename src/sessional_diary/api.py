@@ -0,0 +1,100 @@
+"""Create the Sessional Diary output files in memory.
+
+`generate` is for using the tool from other programs (e.g. a web service, a
+notebook or tests). It takes the Excel file as a path, bytes or a file object
+and returns the output files as a mapping of file name to content. Nothing is
+written to disk and nothing is kept between calls. `cli.run` does the same work
+but writes the files next to the Excel file.
+
+    from sessional_diary.api import generate
+
+    with open('diary.xlsx', 'rb') as f:
+        outputs = generate(f, outputs=['House_Diary.xml', 'Analysis.xlsx'])
+    outputs['House_Diary.xml']  # bytes
+"""
+
+from datetime import date
+from typing import Optional, Sequence, Union
+
+from lxml import etree
+
+from sessional_diary.classification import ClassificationReport
+from sessional_diary.cli import (
+    EXCEL_FILE,
+    InputSource,
+    Sessional_Diary,
+    create_outputs,
+    plan_outputs,
+    session_totals,
+)
+from sessional_diary.diagnostics import Diagnostics
+
+
+def generate(source: InputSource,
+             include_chamber=True,
+             include_wh=True,
+             no_excel=False,
+             idml=False,
+             stats=False,
+             outputs: Optional[Sequence[str]] = None,
+             chunk_by: Optional[Union[str, int]] = None,
+             trees=False,
+             diagnostics: Optional[Diagnostics] = None,
+             date_from: Optional[date] = None,
+             date_to: Optional[date] = None,
+             classification: Optional[ClassificationReport] = None,
+             derive_durations=False,
+             tagged_text=False,
+             icml=False,
+             ) -> dict[str, Union[bytes, etree._ElementTree]]:
+    """The output files created from `source`, keyed by file name.
+
+    `source` is the Excel file as a path, bytes or a binary file object, or the
+    path(s) of the CSV files. The other options are the same as for `cli.run`.
+    If `trees` is True the XML files are returned as lxml trees rather than
+    bytes. Problems found in the input are added to `diagnostics` if given.
+    `date_from` and `date_to` limit the output to the sitting days in that range.
+    How the rows were classified into the analysis sections is recorded in
+    `classification` if given."""
+
+    output_names, required, stats = plan_outputs(include_chamber, include_wh, no_excel,
+                                                 idml, stats, outputs, tagged_text, icml)
+
+    sd = Sessional_Diary(source, no_excel=EXCEL_FILE not in required,
+                         write_files=False, diagnostics=diagnostics)
+    sd.chunk_by = chunk_by
+    sd.classification = classification
+    sd.derive_durations = derive_durations
+    if date_from is not None or date_to is not None:
+        sd.date_range = (date_from or date.min, date_to or date.max)
+    if trees:
+        sd.trees = {}
+    create_outputs(sd, output_names, required, stats)
+
+    # only the files asked for (and their chunks), not the ones they are made from
+    requested = sd.requested or set()
+    results: dict[str, Union[bytes, etree._ElementTree]] = {}
+    for name, data in sd.outputs.items():
+        if name not in requested:
+            continue
+        if sd.trees is not None and name in sd.trees:
+            results[name] = sd.trees[name]
+        else:
+            results[name] = data
+    return results
+
+
+def totals(source: InputSource,
+           include_chamber=True,
+           include_wh=True,
+           diagnostics: Optional[Diagnostics] = None,
+           classification: Optional[ClassificationReport] = None,
+           derive_durations=False) -> dict:
+    """The session totals and section totals (as in the tables of contents) for
+    the Chamber and Westminster Hall. No output files are created, so this is
+    much quicker than `generate`."""
+
+    sd = Sessional_Diary(source, no_excel=True, write_files=False, diagnostics=diagnostics)
+    sd.classification = classification
+    sd.derive_durations = derive_durations
+    return session_totals(sd, include_chamber, include_wh)
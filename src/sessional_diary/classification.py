@@ -0,0 +1,115 @@
+"""How the rows of the Chamber and Westminster Hall sheets were classified into
+the analysis sections.
+
+When the subjects used in the Excel file change, rows can silently stop being
+in any analysis section. The report shows how many rows (and how much time)
+each section got, the rows in more than one section, and every Subject 1/Tags
+combination that was in no section. It also shows how long the classification
+took. Only counts and totals are kept (plus a few example rows), so the report
+is cheap enough to always create.
+"""
+
+import json
+from datetime import timedelta
+from typing import Optional, Sequence
+
+from sessional_diary.utilities import format_timedelta
+
+# how many example rows to keep for each combination
+EXAMPLES = 5
+
+
+class _Tally:
+    __slots__ = ('rows', 'duration', 'examples')
+
+    def __init__(self):
+        self.rows = 0
+        self.duration = timedelta()
+        self.examples: list[int] = []
+
+    def add(self, c: int, duration: timedelta) -> None:
+        self.rows += 1
+        self.duration += duration
+        if len(self.examples) < EXAMPLES:
+            self.examples.append(c)
+
+    def to_dict(self) -> dict:
+        return {'rows': self.rows,
+                'duration': format_timedelta(self.duration),
+                'examples': [f'Row {c}' for c in self.examples]}
+
+
+class SheetClassification:
+    """The classification of the rows of one sheet."""
+
+    def __init__(self, sections: Sequence[tuple[str, str]]):
+        # (key, title) of every section, in order
+        self.sections = list(sections)
+        self.rows = 0
+        self.seconds = 0.0
+        self.hits = {key: _Tally() for key, _ in self.sections}
+        self.multi_section: dict[tuple[str, ...], _Tally] = {}
+        self.unclassified: dict[tuple[str, str], _Tally] = {}
+
+    def add(self, c: int, subject1: str, tags: str, duration: timedelta,
+            section_keys: Sequence[str], seconds: float) -> None:
+        """Row `c` was put in `section_keys`, which took `seconds`."""
+
+        self.rows += 1
+        self.seconds += seconds
+        for key in section_keys:
+            self.hits[key].add(c, duration)
+        if not section_keys:
+            tally = self.unclassified.get((subject1, tags))
+            if tally is None:
+                tally = self.unclassified[(subject1, tags)] = _Tally()
+            tally.add(c, duration)
+        elif len(section_keys) > 1:
+            keys = tuple(section_keys)
+            tally = self.multi_section.get(keys)
+            if tally is None:
+                tally = self.multi_section[keys] = _Tally()
+            tally.add(c, duration)
+
+    def to_dict(self) -> dict:
+        unclassified_rows = sum(tally.rows for tally in self.unclassified.values())
+        return {
+            'rows': self.rows,
+            'unclassified_rows': unclassified_rows,
+            'multi_section_rows': sum(tally.rows for tally in self.multi_section.values()),
+            'classify_seconds': round(self.seconds, 4),
+            'mean_microseconds_per_row': round(self.seconds / self.rows * 1e6, 2)
+                                         if self.rows else 0,
+            'sections': [{'key': key, 'title': title.replace('\t', ' '),
+                          **self.hits[key].to_dict()}
+                         for key, title in self.sections],
+            'multi_section': [{'sections': list(keys), **tally.to_dict()}
+                              for keys, tally in sorted(self.multi_section.items(),
+                                                        key=lambda item: -item[1].rows)],
+            # the most time first, as those matter most to the analysis
+            'unclassified': [{'subject1': subject1, 'tags': tags, **tally.to_dict()}
+                             for (subject1, tags), tally in
+                             sorted(self.unclassified.items(),
+                                    key=lambda item: -item[1].duration)],
+        }
+
+
+class ClassificationReport:
+    """The classification of every sheet read."""
+
+    def __init__(self):
+        self.sheets: dict[str, SheetClassification] = {}
+
+    def sheet(self, sheet_title: str, sections: Sequence[tuple[str, str]]) -> SheetClassification:
+        """The classification of a sheet, started again if it is read again."""
+        self.sheets[sheet_title] = SheetClassification(sections)
+        return self.sheets[sheet_title]
+
+    def to_json(self) -> str:
+        return json.dumps({title: sheet.to_dict() for title, sheet in self.sheets.items()},
+                          indent=2, ensure_ascii=False)
+
+    def save_json(self, file_path: Optional[str]) -> None:
+        if file_path:
+            with open(file_path, 'w', encoding='UTF-8') as f:
+                f.write(self.to_json())
@@ -1,10 +1,29 @@
 #!/usr/bin/env python3
 
 import argparse
+import io
+import json
 import os
+import re
 import sys
+from bisect import bisect_left, bisect_right
+from concurrent.futures import Future
 from datetime import date, datetime, time, timedelta
-from typing import Optional, Sequence, Type, cast
+from functools import partial
+from itertools import accumulate
+from time import perf_counter
+from typing import (
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Type,
+    Union,
+    cast,
+)
 
 # 3rd party imports
 from lxml import etree
@@ -12,28 +31,74 @@ from lxml.etree import Element, SubElement
 from openpyxl import Workbook, load_workbook
 from openpyxl.cell import cell as CELL
 from openpyxl.cell.cell import Cell
+from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.worksheet import Worksheet
 
+from sessional_diary.classification import ClassificationReport, SheetClassification
+from sessional_diary.csv_input import (
+    CsvWorkbook,
+    csv_files,
+    is_csv_input,
+    load_csv_workbook,
+)
+from sessional_diary.diagnostics import (
+    DATETIME_CONVERTED,
+    DURATION_DERIVED,
+    DURATION_MISMATCH,
+    DURATION_MISSING,
+    INVALID_DATE,
+    INVALID_DAY,
+    INVALID_DURATION,
+    INVALID_TIME,
+    ROW_OUT_OF_ORDER,
+    SKIPPED_ROW,
+    Diagnostics,
+    InvalidCell,
+)
+from sessional_diary.diary import DiaryDay, render_diary
+from sessional_diary.durations import rebuild_durations
+from sessional_diary.excel import StyleIds, render_worksheets
+from sessional_diary.icml import icml_file_name, table_to_icml
+from sessional_diary.idml import TEMPLATE_TABLES, create_idml_files, idml_file_name
+from sessional_diary.metrics import COUNTS_CACHE_NAME, RunMetrics, stage
+from sessional_diary.output import (
+    BackgroundWriter,
+    OutputCache,
+    file_sha256,
+    files_sha256,
+    tree_to_bytes,
+    workbook_to_bytes,
+    write_if_changed,
+)
+from sessional_diary.stats import (
+    SheetColumns,
+    add_statistics_sheet,
+    numpy_available,
+    statistics,
+    statistics_to_bytes,
+)
 from sessional_diary.tables import (
     CH_AnalysisTableSection,
     CH_Diary_Table,
-    CH_DiaryDay_TableSection,
+    CH_ExcelSheet,
+    CH_SectionTotal,
     CH_Table,
     Contents_Table,
-    Excel,
     SudoTableSection,
+    TableChunks,
     WH_AnalysisTableSection,
     WH_Diary_Table,
-    WH_DiaryDay_TableSection,
+    WH_ExcelSheet,
+    WH_SectionTotal,
     WH_Table,
 )
+from sessional_diary.tagged_text import table_to_tagged_text, tagged_text_file_name
 
 # 1st party imports
 from sessional_diary.utilities import (
     AID,
     AID5,
     NS_MAP,
-    ID_Cell,
     format_date,
     format_timedelta,
     make_id_cells,
@@ -43,13 +108,6 @@ from sessional_diary.utilities import (
 # override default openpyxl timedelta (duration) format
 CELL.TIME_FORMATS[timedelta] = '[h].mm'
 
-# In the westminster hall diary part, the chamber day number appearers in square brackets
-# if the chamber diary part is created first we can store a set of key value pairs
-# (dates and [chamber day numbers]) here and use it for the westminster hall diaryself.
-# e.g. {2021-07-29: 1}
-DATE_NUM_LOOK_UP: dict[date, int] = {}
-
-
 #  We expect the following column headings in the Excel document
 DAY = 'Day'
 DATE = 'Date'
@@ -70,30 +128,79 @@ WH_COLS = [DAY, DATE, TIME, SUBJECT1, SUBJECT2, TAGS, DURATION]
 CH_SHEET_TITLE = 'Chamber'
 WH_SHEET_TITLE = 'Westminster Hall'
 
+# the input, the path of the Excel file (or CSV files), or the Excel file itself
+InputSource = Union[str, Sequence[str], bytes, BinaryIO]
+
+# names of the output files
+HOUSE_DIARY_FILE = 'House_Diary.xml'
+HOUSE_ANALYSIS_FILE = 'House_Analysis.xml'
+HOUSE_CONTENTS_FILE = 'House_An_Contents.xml'
+WH_DIARY_FILE = 'WH_diary.xml'
+WH_ANALYSIS_FILE = 'WH_Analysis.xml'
+WH_CONTENTS_FILE = 'WH_An_Contents.xml'
+EXCEL_FILE = 'Analysis.xlsx'
+STATS_FILE = 'Statistics.json'
+
+# where the output for a range of dates (--from and --to) goes
+PREVIEW_FOLDER = 'Preview'
+
+# the chamber date -> day number look up (Sessional_Diary.date_num_look_up)
+DAY_INDEX = 'chamber day index'
+
+# what each output file is made from. Sheet titles mean that sheet has to be read
+OUTPUT_DEPENDENCIES: dict[str, list[str]] = {
+    HOUSE_DIARY_FILE: [CH_SHEET_TITLE],
+    HOUSE_ANALYSIS_FILE: [CH_SHEET_TITLE],
+    HOUSE_CONTENTS_FILE: [CH_SHEET_TITLE],
+    WH_DIARY_FILE: [WH_SHEET_TITLE, DAY_INDEX],
+    WH_ANALYSIS_FILE: [WH_SHEET_TITLE],
+    WH_CONTENTS_FILE: [WH_SHEET_TITLE],
+    EXCEL_FILE: [CH_SHEET_TITLE, WH_SHEET_TITLE],
+    STATS_FILE: [CH_SHEET_TITLE, WH_SHEET_TITLE],
+}
+# the IDML files are made from the XML files
+for _template_name, _xml_names in TEMPLATE_TABLES.items():
+    OUTPUT_DEPENDENCIES[idml_file_name(_template_name)] = _xml_names
+
+# the other formats a table can be saved in: the file name (from the name of
+# the XML file) and the function that creates it from the table
+TABLE_FORMATS = [(tagged_text_file_name, table_to_tagged_text),
+                 (icml_file_name, table_to_icml)]
+# which are made from the tables of the XML files
+for _xml_names in TEMPLATE_TABLES.values():
+    for _xml_name in _xml_names:
+        for _file_name, _ in TABLE_FORMATS:
+            OUTPUT_DEPENDENCIES[_file_name(_xml_name)] = [_xml_name]
+
 class WHRow:
-    title_index: dict[str, int] = {}
+    sheet_title = WH_SHEET_TITLE
 
-    def __init__(self, excel_row: Sequence[Cell]):
-        t_index = WHRow.title_index
+    def __init__(self, excel_row: Sequence[Cell], title_index: dict[str, int],
+                 diagnostics: Optional[Diagnostics] = None):
+        """`title_index` maps the column headings to column indexes."""
 
-        self.inner_init(excel_row, t_index)
+        self.inner_init(excel_row, title_index, diagnostics)
 
-    def inner_init(self, excel_row: Sequence[Cell], t_index: dict[str, int]):
+    def inner_init(self, excel_row: Sequence[Cell], t_index: dict[str, int],
+                   diagnostics: Optional[Diagnostics] = None):
 
         if not t_index:
             print('Error: title_index not set up')
             exit()
 
+        # problems are recorded rather than printed (see diagnostics.py)
+        if diagnostics is None:
+            diagnostics = Diagnostics()
+        self.diagnostics = diagnostics
 
         self.day: int
         _day = excel_row[t_index[DAY]].value
         if isinstance(_day, int):
             self.day = _day
         else:
-            print(excel_row[t_index[DAY]].coordinate,
-                  ' has value ',
-                  _day)
-            raise ValueError
+            diagnostics.add(INVALID_DAY, self.sheet_title,
+                            excel_row[t_index[DAY]].coordinate, _day)
+            raise InvalidCell(f'invalid day in {excel_row[t_index[DAY]].coordinate}')
 
         _date = excel_row[t_index[DATE]].value
 
@@ -101,10 +208,9 @@ class WHRow:
         if isinstance(_date, date):
             self.date = _date
         else:
-            print(excel_row[t_index[DATE]].coordinate,
-                  ' has value ',
-                  _date)
-            raise ValueError
+            diagnostics.add(INVALID_DATE, self.sheet_title,
+                            excel_row[t_index[DATE]].coordinate, _date)
+            raise InvalidCell(f'invalid date in {excel_row[t_index[DATE]].coordinate}')
 
         self.time: time
         time_cell = excel_row[t_index[TIME]]
@@ -113,15 +219,14 @@ class WHRow:
             self.time = _time
         else:
             if excel_row[t_index[TIME]].value is not None:
-                print(excel_row[t_index[TIME]].coordinate,
-                      ' has value ',
-                      _time)
-            raise ValueError
+                diagnostics.add(INVALID_TIME, self.sheet_title,
+                                excel_row[t_index[TIME]].coordinate, _time)
+                raise InvalidCell(f'invalid time in {time_cell.coordinate}')
+            raise ValueError(f'no valid time in {time_cell.coordinate}')
 
         if isinstance(self.time, datetime):
             time_obj = self.time.time()
-            print(f'There is a datetime at cell {time_cell.coordinate}:', str(self.time))
-            print(f'This has been converted to the following time: {time_obj}')
+            self.datetime_converted(time_cell, time_obj)
             self.time = time_obj
 
         self.subject1: str = str_strip(
@@ -134,56 +239,606 @@ class WHRow:
             excel_row[t_index[TAGS]].value)
 
 
-        duration_cell = excel_row[t_index[DURATION]]
-        self.duration: timedelta
-        if isinstance(duration_cell.value, datetime):
-            # don't trust the datetime only the time
-            time_obj = duration_cell.value.time()
-            print(f'There is a datetime at cell {duration_cell.coordinate}:',
-                  str(duration_cell.value))
-            print(f'This has been converted to the following time: {time_obj}')
-            self.duration = datetime.combine(date.min, time_obj) - datetime.min
-        elif isinstance(duration_cell.value, time):
-            self.duration = datetime.combine(date.min, duration_cell.value) - datetime.min
-        elif not isinstance(duration_cell.value, timedelta):
-            # TODO: log this
-            # print(f'Problem in cell {duration_cell.coordinate}')
-            self.duration = timedelta()
+        self.duration: timedelta = self.cell_duration(excel_row[t_index[DURATION]])
 
-class CHRow(WHRow):
-    title_index: dict[str, int] = {}
+    def datetime_converted(self, cell: Cell, time_obj: time):
+        self.diagnostics.add(DATETIME_CONVERTED, self.sheet_title, cell.coordinate,
+                             cell.value, f'{cell.value} converted to {time_obj}')
 
-    def __init__(self, excel_row: Sequence[Cell]):
+    def cell_duration(self, cell: Cell) -> timedelta:
+        """The value of a Duration or AAT cell. A value that is not a time is
+        added to the diagnostics."""
 
-        t_index = CHRow.title_index
-        super().inner_init(excel_row, t_index)
+        if isinstance(cell.value, datetime):
+            self.datetime_converted(cell, cell.value.time())
+        elif cell.value not in (None, '') and not isinstance(cell.value, (time, timedelta)):
+            self.diagnostics.add(INVALID_DURATION, self.sheet_title, cell.coordinate, cell.value)
+        return duration_value(cell.value)
 
-        aat_cell = excel_row[t_index[AAT]]
-        self.aat: timedelta
-        if isinstance(aat_cell.value, datetime):
-            # don't trust the datetime only the time
-            time_obj = aat_cell.value.time()
-            print(f'There is a datetime at cell {aat_cell.coordinate}:', str(aat_cell.value))
-            print(f'This has been converted to the following time: {time_obj}')
-            self.aat = datetime.combine(date.min, time_obj) - datetime.min
-        elif isinstance(aat_cell.value, time):
-            self.aat = datetime.combine(date.min, aat_cell.value) - datetime.min
-        elif not isinstance(aat_cell.value, timedelta):
-            self.aat = timedelta()
+class CHRow(WHRow):
+    sheet_title = CH_SHEET_TITLE
+
+    def __init__(self, excel_row: Sequence[Cell], title_index: dict[str, int],
+                 diagnostics: Optional[Diagnostics] = None):
+
+        t_index = title_index
+        super().inner_init(excel_row, t_index, diagnostics)
+
+        self.aat: timedelta = self.cell_duration(excel_row[t_index[AAT]])
+
+
+def duration_value(value) -> timedelta:
+    """The value of a Duration or AAT cell as a timedelta. Anything that is not
+    a duration counts as no time (`WHRow` adds those cells to the diagnostics)."""
+
+    if isinstance(value, datetime):
+        # don't trust the datetime only the time
+        value = value.time()
+    if isinstance(value, time):
+        return datetime.combine(date.min, value) - datetime.min
+    if isinstance(value, timedelta):
+        return value
+    return timedelta()
+
+
+def as_date(value: date) -> date:
+    """openpyxl gives the dates as datetimes."""
+    return value.date() if isinstance(value, datetime) else value
+
+
+class DayTotals(NamedTuple):
+    """A sitting day in the Chamber or Westminster Hall sheet."""
+    day: int
+    date: date
+    first_row: int
+    last_row: int
+    duration: timedelta
+    aat: timedelta
+
+
+class DayWindow(NamedTuple):
+    """The rows of a sheet for a range of dates (see `Sessional_Diary.day_window`)
+    and the session totals before them."""
+    first_row: int
+    last_row: int
+    duration_before: timedelta
+    aat_before: timedelta
+
+
+# Sections of the House analysis. Each is (key, title, excel sheet title, parent)
+# the order matters!
+CH_SECTIONS: list[tuple[str, str, str, Optional[str]]] = [
+    ('addresses',
+     '1:\tAddresses other than Prayers',
+     '1 Addresses other than Prayers',
+     None),
+    ('second_readings',
+     '2a:\tGovernment Bills: Read a second time and committed to Public Bill Committee',
+     '2a Govt Bills 2R & committed',
+     '2'),
+    ('cwh_bills',
+     '2b:\tGovernment Bills: Read a second time and committed to '
+     'Committee of the whole House (in whole or part)',
+     '2b Govt Bill 2R & sent to CWH',
+     '2'),
+    ('cwh_2_bills',
+     '2d:\tGovernment Bills: Committee of the whole House',
+     '2d Govt Bills CWH',
+     '2'),
+    ('gov_bil_cons',
+     '2e:\tGovernment Bills: Consideration',
+     '2e Govt Bills Consideration',
+     '2'),
+    ('gov_bill_3rd',
+     '2f:\tGovernment Bills: Third Reading',
+     '2f Govt Bills 3R',
+     '2'),
+    ('gov_bill_lord_amend',
+     '2g:\tGovernment Bills: Lord Amendments',
+     '2g Lords Amendments',
+     '2'),
+    ('alloc_time',
+     '2h:\tAllocation of time motions',
+     '2h Allocation of time motions',
+     '2'),
+    ('gov_bill_other',
+     '2i:\tGovernment Bills: Other Stages',
+     '2i Govt Bills Other Stages',
+     '2'),
+    ('pmbs_2r',
+     '3a:\tPrivate Members\' Bills: Second Reading',
+     '3a PMB 2R',
+     '3'),
+    ('pmbs_other',
+     '3b:\tPrivate Members\' Bills: Other Stages',
+     '3b PMB Other stages',
+     '3'),
+    ('private_business',
+     '4:\tPrivate Business',
+     '4 Private Business',
+     None),
+
+    # George says that European Union documents are no longer needed 2026-06-17
+    # ('eu_docs',
+    #  '5a:\tEuropean Union documents',
+    #  '5a European Union documents',
+    #  '5'),
+    ('gov_motions',
+     '5a:\tGovernment motions',
+     '5a Government motions',
+     '5'),
+    # George says that these are no longer needed 2026-06-17
+    # ('gov_motions_gen',
+    #  '5c:\tGovernment motions (General)',
+    #  '5c Govt motions (General)',
+    #  '5'),
+    ('gen_debates',
+     '5b:\tGovernment motions (General Debates)',
+     '5b Govt motions (Gen Debates)',
+     '5'),
+    ('opposition_days',
+     '6a:\tOpposition Days',
+     '6a Opposition Days',
+     '6'),
+    ('oppo_motions_in_gov_time',
+     '6b:\tOpposition motions in Government time',
+     '6b Opp Motion in Govt time',
+     '6'),
+    ('backbench_business',
+     '7: \tBackbench Business',
+     '7 Backbench Business',
+     None),
+    ('pm_motion',
+     '8a:\tPrivate Members\' Motions',
+     '8a Private Members\' Motions',
+     '8'),
+    ('ten_min_motion',
+     '8b:\tTen Minute Rule Motions',
+     '8b Ten minute rules',
+     '8'),
+    ('emergency_debates',
+     '8c:\tEmergency debates',
+     '8c Emergency debates',
+     '8'),
+    ('adjournment_debates',
+     '8d:\tAdjournment debates',
+     '8d Adjournment debates',
+     '8'),
+    ('estimates',
+     '9:\tEstimates',
+     '9 Estimates',
+     None),
+    ('money',
+     '10:\tMoney Resolutions',
+     '10 Money Resolutions',
+     None),
+    ('ways_and_means',
+     '11:\tWays and Means',
+     '11 Ways and Means',
+     None),
+    ('affirmative_sis',
+     '12:\tAffirmative Statutory Instruments',
+     '12 Affirmative SIs',
+     None),
+    ('negative_sis',
+     '13:\tNegative Statutory Instruments',
+     '13 Negative SIs',
+     None),
+    ('questions',
+     '14a:\tQuestions',
+     '14a Questions',
+     '14'),
+    ('topical_questions',
+     '14b:\tTopical Questions',
+     '14b Topical Questions',
+     '14'),
+    ('urgent_questions',
+     '14c:\tUrgent Questions',
+     '14c Urgent Questions',
+     '14'),
+    ('statements',
+     '14d:\tStatements',
+     '14d Statements',
+     '14'),
+    ('business_statements',
+     '14e:\tBusiness Statements',
+     '14e Business Statements',
+     '14'),
+    ('committee_statements',
+     '14f:\tCommittee Statements',
+     '14f Committee Statements',
+     '14'),
+    ('app_for_emerg_debate',
+     '14g:\tS.O. No. 24 Applications',
+     '14g SO No 24 Applications',
+     '14'),
+    ('points_of_order',
+     '14h:\tPoints of Order',
+     '14h Points of Order',
+     '14'),
+    ('public_petitions',
+     '14i:\tPublic Petitions',
+     '14i Public Petitions',
+     '14'),
+    ('miscellaneous',
+     '14j:\tMiscellaneous',
+     '14j Miscellaneous',
+     '14'),
+    ('prayers',
+     '15:\tDaily Prayers',
+     '15 Daily Prayers',
+     None),
+]
+
+# some tables have a parent e.g. 2 is the parent of 2a and 2b
+# parents are only referenced in the table of contents
+CH_PARENT_TITLES = {
+    '2': '2:\tGovernment bills',
+    '3': '3:\tPrivate Members’ bills',
+    '5': '5:\tGovernment motions',
+    '6': '6:\tOpposition business',
+    '8': '8:\tPrivate Members’ business (other than bills)',
+    '14': '14:\tBusiness when no Question before House',
+}
+
+
+def chamber_sections(entry: CHRow) -> list[str]:
+    """Return the keys of every House analysis section (see `CH_SECTIONS`)
+    that a row of the Chamber sheet belongs to. A row can be in more than one
+    section or in none."""
+
+    subject_lower = entry.subject1.lower()
+    col_exit    = entry.tags.lower()
+
+    sections: list[str] = []
+
+    # Table 1 Addresses other than Prayers
+    if subject_lower == 'address':
+        sections.append('addresses')
+    # Table 2a Government bills second reading
+    if '[pmb]' not in col_exit:
+        # here we have items that are not explicitly private members' bills
+        if subject_lower == 'second reading' and 'pbc' in col_exit:
+            # gov bill second reading
+            sections.append('second_readings')
+
+        if 'committee of the whole house' in subject_lower:
+            sections.append('cwh_2_bills')
+        if 'consideration' in subject_lower:
+            # gov bill consideration
+            sections.append('gov_bil_cons')
+        if subject_lower == 'third reading':
+            # gov bill third reading
+            sections.append('gov_bill_3rd')
+        if subject_lower == 'lords amendments':
+            # gov bill lords amendments
+            sections.append('gov_bill_lord_amend')
+        gov_bill_other_subs = (
+            'second and third reading',  # not in subject list (Sep 2024)
+            'money resolution',  # not in subject list (Sep 2024)
+            # 'lords amendments',  # removed on Tuesday, 16  June 2026
+            'other stages'  # added in Sep 2024 (Sara ELKHAWAD)
+        )
+        if ('legislative grand committee' in subject_lower
+                or subject_lower in gov_bill_other_subs):
+            sections.append('gov_bill_other')
+
+    if (subject_lower == 'second reading'
+            and 'committee of the whole house' in entry.subject2.lower()):
+        sections.append('cwh_bills')
+
+    if subject_lower.lower() == 'allocation of time motion':
+        sections.append('alloc_time')
+
+    if '[pmb]' in col_exit:
+        if subject_lower == 'second reading':
+            # private members' bills second reading
+            sections.append('pmbs_2r')
+        elif subject_lower not in (
+            'ten minute rule motion',
+            'point of order',
+            'remaining orders',
+        ):
+            # private members' bills other
+            # this does not include ten minute rules
+            # Explicitly this is `other stages`
+            sections.append('pmbs_other')
+
+    if 'private business' in subject_lower:
+        sections.append('private_business')
+
+    # if subject_lower == 'eu documents':
+        # George says that European Union documents are no longer needed 2026-06-17
+        # sections.append('eu_docs')
+
+    if subject_lower in ('government motion', 'government motions', 'business motion'):
+        sections.append('gov_motions')
+
+    # George says that these are no longer needed 2026-06-17
+    # if subject_lower == 'general motion':
+    #     sections.append('gov_motions_gen')
+
+    if subject_lower == 'general debate':
+        sections.append('gen_debates')
+
+    if subject_lower == 'opposition day':
+        sections.append('opposition_days')
+
+    if subject_lower == 'opposition motion in government time':
+        sections.append('oppo_motions_in_gov_time')
+    if subject_lower == 'backbench business':
+        sections.append('backbench_business')
+    if subject_lower in ('private member\'s motion',
+                         'private member’s motion',
+                         'private members\' motion'):
+        sections.append('pm_motion')
+    if subject_lower == 'ten minute rule motion':
+        sections.append('ten_min_motion')
+    if 'no. 24 debate' in subject_lower:
+        sections.append('emergency_debates')
+    if 'adjournment' in subject_lower:
+        sections.append('adjournment_debates')
+    if subject_lower == 'estimates day':
+        sections.append('estimates')
+    if subject_lower == 'money resolution':
+        sections.append('money')
+    if subject_lower == 'ways and means':
+        sections.append('ways_and_means')
+    if 'affirmative' in subject_lower:
+        sections.append('affirmative_sis')
+    if subject_lower == 'negative statutory instrument':
+        sections.append('negative_sis')
+    if subject_lower == 'questions':
+        sections.append('questions')
+    if subject_lower == 'topical questions':
+        sections.append('topical_questions')
+    if subject_lower in ('urgent question', 'urgent questions'):
+        sections.append('urgent_questions')
+    if subject_lower == 'statement':
+        sections.append('statements')
+    if subject_lower == 'business statement':
+        sections.append('business_statements')
+    if 'committee statement' in subject_lower:
+        sections.append('committee_statements')
+    if 'no. 24 application' in subject_lower:
+        sections.append('app_for_emerg_debate')
+    if subject_lower in ('point of order', 'points of order'):
+        sections.append('points_of_order')
+    if 'public petition' in subject_lower:
+        sections.append('public_petitions')
+    if subject_lower == 'prayers':
+        # prayers are not itemised
+        sections.append('prayers')
+
+    miscellaneous_options = ('tributes', 'election of a speaker',
+                             'suspension', 'observation of a minute\'s silence',
+                             'personal statement',
+                             'presentation of private members\' bills')
+    if (subject_lower in miscellaneous_options
+            or 'message to attend the lords' in subject_lower):
+        sections.append('miscellaneous')
+
+    return sections
+
+
+# Sections of the Westminster Hall analysis.
+# Each is (key, title, excel sheet title, parent)
+# the order matters!
+WH_SECTIONS: list[tuple[str, str, str, Optional[str]]] = [
+    ('private',
+     '1a:\tPrivate Members’ Debates',
+     'WH1 Members debates',
+     '1'),
+    ('bbcom',
+     '1b:\tPrivate Members’ (Backbench Business Committee recommended) Debates',
+     'WH2 BBCom debates',
+     '1'),
+    ('liaison',
+     '2:\tLiaison Committee Debates',
+     'WH3 Liaison Com debates',
+     None),
+    ('e_petition',
+     '3:\tDebates on e-Petitions',
+     'WH4 e-Petitions',
+     None),
+    ('suspension',
+     '4:\tSuspensions',
+     'WH5 Suspensions',
+     None),
+    ('miscellaneous',
+     '5:\tMiscellaneous',
+     'WH6 Miscellaneous',
+     None),
+    ('statements',
+     '6:\tStatements',
+     'WH7 Statements',
+     None),
+]
+
+WH_PARENT_TITLES = {
+    '1': '1:\tPrivate Members',
+}
+
+
+def wh_section(entry: WHRow) -> Optional[str]:
+    """Return the key of the Westminster Hall analysis section (see `WH_SECTIONS`)
+    that a row of the Westminster Hall sheet belongs to, if any."""
+
+    if entry.subject1 in ('Debate (Private Member’s)', 'Debate (Private Member\'s)'):
+        return 'private'
+    elif entry.subject1 in ('Debate (BBCom recommended)',
+                            'Debate (BBCom)', 'Debate (BBBCom)'):
+        return 'bbcom'
+
+    elif entry.subject1 in ('Debate (Liaison Committee)', ):
+        return 'liaison'
+
+    elif entry.subject1 in ('Petition', 'Petitions'):
+        return 'e_petition'
+
+    elif entry.subject1 == 'Suspension' and entry.tags not in ('[Questions]', '[Question]'):
+        return 'suspension'
+
+    elif entry.subject1 in ('Committee Statement',):
+        return 'statements'
+    elif entry.subject1 in ('Time limit', 'Time Limit',
+                            'Observation of a period of silence'):
+        return 'miscellaneous'
+
+    return None
+
+
+def section_keys(chamber: bool, entry: WHRow) -> list[str]:
+    """The keys of the analysis sections that a row of the Chamber (`chamber`)
+    or Westminster Hall sheet is in."""
+
+    if chamber:
+        return chamber_sections(entry)  # type: ignore
+    key = wh_section(entry)
+    return [key] if key is not None else []
 
 
 class Sessional_Diary:
 
-    def __init__(self, input_excel_file_path: str, no_excel: bool):
-
-        self.input_workbook = load_workbook(filename=input_excel_file_path,
-                                            data_only=True, read_only=True)
-
+    def __init__(self, input_excel_file_path: InputSource, no_excel: bool,
+                 write_files: bool = True, diagnostics: Optional[Diagnostics] = None):
+        """`input_excel_file_path` is the path of the Excel file (or CSV files), or
+        the Excel file as bytes or a binary file object. If `write_files` is
+        False the output files are only kept in `outputs`."""
+
+        self.input_workbook: Union[Workbook, CsvWorkbook]
+        if isinstance(input_excel_file_path, (bytes, bytearray, memoryview)):
+            self.input_workbook = load_workbook(filename=io.BytesIO(input_excel_file_path),
+                                                data_only=True, read_only=True)
+        elif hasattr(input_excel_file_path, 'read'):
+            self.input_workbook = load_workbook(filename=cast(BinaryIO, input_excel_file_path),
+                                                data_only=True, read_only=True)
+        elif is_csv_input(cast(Union[str, Sequence[str]], input_excel_file_path)):
+            # CSV files (or a folder of them) for the sheets, instead of Excel
+            self.input_workbook = load_csv_workbook(
+                cast(Union[str, Sequence[str]], input_excel_file_path))
+        else:
+            self.input_workbook = load_workbook(filename=cast(str, input_excel_file_path),
+                                                data_only=True, read_only=True)
+
+        # the column headings -> column index of each sheet (see check_chamber)
+        self.title_index: dict[str, dict[str, int]] = {}
+
+        # In the westminster hall diary part, the chamber day number appearers in
+        # square brackets. The chamber dates and day numbers are kept here to use
+        # in the westminster hall diary. e.g. {2021-07-29: 1}
+        self.date_num_look_up: dict[date, int] = {}
+
+        # the bytes of every output file created, keyed by file name
+        self.outputs: dict[str, bytes] = {}
+        self.write_files = write_files
+        # if set, the XML trees of the tables are also kept, keyed by file name
+        self.trees: Optional[dict[str, etree._ElementTree]] = None
+        # output files are serialised and written on a background thread
+        self.writer = BackgroundWriter()
+        self._pending: dict[str, Future] = {}
+        # the names of the files actually written (i.e. that had changed)
+        self.written: set[str] = set()
+        # if set, only these files are written, anything else in
+        # outputs is just needed to make them (e.g. XML for the IDML files)
+        self.requested: Optional[set[str]] = None
+        # if set, each diary and analysis table is also split into smaller
+        # tables. 'month' or a number of sitting days (see `diary_chunk_key`)
+        self.chunk_by: Optional[Union[str, int]] = None
+        # if set, only the sitting days in this (inclusive) range of dates are
+        # included (see `day_window`)
+        self.date_range: Optional[tuple[date, date]] = None
+        self._day_windows: dict[str, Optional[DayWindow]] = {}
+        # if set, empty durations are worked out from the Time column (see
+        # `derived_durations`)
+        self.derive_durations = False
+        self._derived: dict[str, dict[int, timedelta]] = {}
+
+        # problems found in the input, summarised at the end of the run
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics()
+        # if set, how the rows were classified is recorded (see classification.py)
+        self.classification: Optional[ClassificationReport] = None
+        # if set, metrics about the run are kept (see metrics.py)
+        self.metrics: Optional[RunMetrics] = None
 
         # if we require an output excel file
+        self.out_wb: Optional[Workbook] = None
         if no_excel is False:
-            Excel.out_wb = Workbook()  # new Excel workbook obi
-
+            self.out_wb = Workbook()  # new Excel workbook obi
+        # the analysis sheets, rendered separately when the workbook is saved
+        self.excel_sheets: list[WH_ExcelSheet] = []
+
+
+    def save_output(self, output_file_path: str, data: Union[bytes, Callable[[], bytes]]):
+        """Keep a copy of the output and write it to disk if it has changed.
+
+        `data` can be a function that returns the bytes (e.g. serialises an XML
+        tree). This, and the writing, is done on a background thread. Call
+        `flush_outputs` to wait for it and raise any error."""
+
+        name = os.path.basename(output_file_path)
+        write = self.write_files and (self.requested is None or name in self.requested)
+
+        def save() -> bytes:
+            content = data() if callable(data) else data
+            self.outputs[name] = content
+            if write and write_if_changed(output_file_path, content):
+                self.written.add(name)
+            return content
+
+        self._pending[name] = self.writer.submit(save)
+
+    def output(self, name: str) -> bytes:
+        """The bytes of an output file, waiting for it if need be."""
+        return self._pending[name].result()
+
+    def output_names(self) -> list[str]:
+        return list(self._pending)
+
+    def flush_outputs(self):
+        """Wait for all the output files to be written. Raises any error."""
+        self.writer.flush()
+
+    def save_table(self, output_file_path: str, table: WH_Table,
+                   chunks: Optional[TableChunks] = None,
+                   new_table: Optional[Callable[[], WH_Table]] = None):
+        """Save the XML for a table and, if `chunk_by` is set, for each chunk of
+        it, e.g. House_Diary.xml and House_Diary_2024-09.xml etc. The table is
+        saved in any of the `TABLE_FORMATS` requested too (e.g. House_Diary.txt)."""
+
+        chunk_tables: list[tuple[str, WH_Table]] = []
+        if self.chunk_by and chunks is not None and new_table is not None:
+            # copy the chunks before the table is serialised on the writer thread
+            chunk_tables = list(chunks.tables(new_table))
+
+        xml_name = os.path.basename(output_file_path)
+        if self.metrics is not None:
+            self.metrics.table_cells[xml_name] = len(table)
+        formats = [(file_name, render) for file_name, render in TABLE_FORMATS
+                   if self.requested is not None and file_name(xml_name) in self.requested]
+
+        tables = [(output_file_path, table)]
+        stem, extension = os.path.splitext(output_file_path)
+        for key, chunk in chunk_tables:
+            chunk_file_path = f'{stem}_{key}{extension}'
+            if self.requested is not None:
+                # the chunks are written along with the whole table
+                if xml_name in self.requested:
+                    self.requested.add(os.path.basename(chunk_file_path))
+                for file_name, _ in formats:
+                    self.requested.add(file_name(os.path.basename(chunk_file_path)))
+            tables.append((chunk_file_path, chunk))
+
+        for file_path, table_ele in tables:
+            output_root = Element('root')
+            output_root.append(table_ele)
+            tree = etree.ElementTree(output_root)
+            if self.trees is not None:
+                self.trees[os.path.basename(file_path)] = tree
+            self.save_output(file_path, partial(tree_to_bytes, tree))
+            for file_name, render in formats:
+                # with the styles of the template the whole table goes into
+                self.save_output(file_name(file_path), partial(render, table_ele, xml_name))
 
     def check_chamber(self):
         try:
@@ -194,9 +849,10 @@ class Sessional_Diary:
             exit()
 
         top_row = cmbr_data[1]
-        CHRow.title_index = {item.value: i for i, item in enumerate(top_row)}
+        title_index = {item.value: i for i, item in enumerate(top_row)}
+        self.title_index[CH_SHEET_TITLE] = title_index
 
-        if not set(CHAMBER_COLS).issubset(set(CHRow.title_index.keys())):
+        if not set(CHAMBER_COLS).issubset(set(title_index.keys())):
             expected_row_headings = '", "'.join(CHAMBER_COLS)
             print(f'Expected the following column titles '
                   f'to be in the top row of the {CHAMBER_COLS} sheet\n',
@@ -211,128 +867,497 @@ class Sessional_Diary:
             exit()
 
         top_row = wh_data[1]
-        WHRow.title_index = {item.value: i for i, item in enumerate(top_row)}
+        title_index = {item.value: i for i, item in enumerate(top_row)}
+        self.title_index[WH_SHEET_TITLE] = title_index
 
-        if not set(WH_COLS).issubset(set(WHRow.title_index.keys())):
+        if not set(WH_COLS).issubset(set(title_index.keys())):
             expected_row_headings = '", "'.join(WH_COLS)
             print(f'Expected the following column titles '
                   f'to be in the top row of the {WH_SHEET_TITLE} sheet',
                   f'"{expected_row_headings}"',
-                  f'Got {WHRow.title_index.keys()}',
+                  f'Got {title_index.keys()}',
                   sep='\n')
 
 
 
+    def entries(self, sheet_title: str) -> Iterator[tuple[int, WHRow]]:
+        """Yield the row number and parsed row for every usable row in the
+        Chamber or Westminster Hall sheet. Blank rows and rows that can not be
+        parsed are skipped."""
+
+        row_class: Type[WHRow]
+        if sheet_title == CH_SHEET_TITLE:
+            self.check_chamber()
+            row_class = CHRow
+        else:
+            self.check_wh()
+            row_class = WHRow
+
+        data = cast(Worksheet, self.input_workbook[sheet_title])
+        title_index = self.title_index[sheet_title]
+        derived = self.derived_durations(sheet_title)
+
+        min_row, max_row = 1, None
+        if self.date_range is not None:
+            window = self.day_window(sheet_title)
+            if window is None:
+                # no sitting days in the range
+                return
+            # go straight to the rows for the range
+            min_row, max_row = window.first_row, window.last_row
+
+        for c, excel_row in enumerate(data.iter_rows(min_row=min_row, max_row=max_row),
+                                      start=min_row):
+            if c == 1:
+                # top row just has headings in
+                continue
+
+            if all(not v.value for v in excel_row[:10]):
+                # skip over any blank rows
+                continue
+
+            try:
+                entry = row_class(excel_row, title_index, self.diagnostics)
+            except InvalidCell:
+                # the cell is already in the diagnostics
+                continue
+            except (ValueError, AttributeError) as e:
+                self.diagnostics.add(SKIPPED_ROW, sheet_title, f'Row {c}', message=str(e))
+                continue
+
+            if self.date_range is not None and not (
+                    self.date_range[0] <= as_date(entry.date) <= self.date_range[1]):
+                continue
+
+            if c in derived:
+                entry.duration = derived[c]
+
+            yield c, entry
+
+    def timing_rows(self, sheet_title: str) -> Iterator[tuple]:
+        """The row number, day, date, time, duration and AAT (the cell values) of
+        every row of a sheet that `entries` would parse. Only those columns are
+        read and no rows are parsed."""
+
+        if sheet_title == CH_SHEET_TITLE:
+            self.check_chamber()
+        else:
+            self.check_wh()
+        title_index = self.title_index[sheet_title]
+        headings = [DAY, DATE, TIME, DURATION] + ([AAT] if sheet_title == CH_SHEET_TITLE else [])
+        columns = [title_index[heading] for heading in headings]
+        first_col = min(columns)
+        day_col, date_col, time_col, duration_col, *aat_col = (c - first_col for c in columns)
+
+        data = cast(Worksheet, self.input_workbook[sheet_title])
+        for c, values in enumerate(data.iter_rows(min_row=2, min_col=first_col + 1,
+                                                  max_col=max(columns) + 1, values_only=True),
+                                   start=2):
+            day, day_date, row_time = values[day_col], values[date_col], values[time_col]
+            # the same rows as are skipped by entries (and WHRow)
+            if (not isinstance(day, int) or not isinstance(day_date, date)
+                    or not isinstance(row_time, time)):
+                continue
+            yield (c, day, day_date, row_time, values[duration_col],
+                   values[aat_col[0]] if aat_col else None)
+
+    def day_totals(self, sheet_title: str) -> list[DayTotals]:
+        """The rows and total durations of every sitting day in a sheet."""
+
+        derived = self.derived_durations(sheet_title)
+
+        days: dict[int, DayTotals] = {}
+        for c, day, day_date, _, duration_cell, aat_cell in self.timing_rows(sheet_title):
+            duration = derived[c] if c in derived else duration_value(duration_cell)
+            aat = duration_value(aat_cell)
+            totals = days.get(day)
+            if totals is not None:
+                days[day] = totals._replace(last_row=c, duration=totals.duration + duration,
+                                            aat=totals.aat + aat)
+            else:
+                days[day] = DayTotals(day, as_date(day_date), c, c, duration, aat)
+        # in day order, whatever order the rows are in
+        return [days[day] for day in sorted(days)]
+
+    def derived_durations(self, sheet_title: str) -> dict[int, timedelta]:
+        """If `derive_durations` is set, the durations of the rows of a sheet with
+        an empty Duration cell, worked out from the Time column, keyed on row
+        number. Those rows, and the rows whose duration is not the time until
+        the next item, are added to the diagnostics."""
+
+        if not self.derive_durations:
+            return {}
+        if sheet_title in self._derived:
+            return self._derived[sheet_title]
+
+        derived: dict[int, timedelta] = {}
+        self._derived[sheet_title] = derived
+        if not numpy_available():
+            print('NumPy is needed to work out the durations but is not installed. '
+                  'Install it with `pip install numpy`. Continuing without.')
+            return derived
+
+        rows: list[int] = []
+        days: list[int] = []
+        times: list[float] = []
+        durations: list[float] = []
+        for c, day, _, row_time, duration_cell, _ in self.timing_rows(sheet_title):
+            rows.append(c)
+            days.append(day)
+            times.append(row_time.hour * 3600 + row_time.minute * 60 + row_time.second)
+            is_duration = isinstance(duration_cell, (time, timedelta, datetime))
+            durations.append(duration_value(duration_cell).total_seconds()
+                             if is_duration else float('nan'))
+
+        to_next, rebuilt, mismatched, not_rebuilt = rebuild_durations(days, times, durations)
+
+        column = get_column_letter(self.title_index[sheet_title][DURATION] + 1)
+        for i in rebuilt.tolist():
+            derived[rows[i]] = timedelta(seconds=to_next[i])
+            self.diagnostics.add(DURATION_DERIVED, sheet_title, f'{column}{rows[i]}',
+                                 message=f'worked out as {format_timedelta(derived[rows[i]])}')
+        for i in mismatched.tolist():
+            duration = format_timedelta(timedelta(seconds=durations[i]))
+            self.diagnostics.add(DURATION_MISMATCH, sheet_title, f'{column}{rows[i]}', duration,
+                                 f'is {duration} but the next item starts '
+                                 f'{format_timedelta(timedelta(seconds=to_next[i]))} later')
+        for i in not_rebuilt.tolist():
+            self.diagnostics.add(DURATION_MISSING, sheet_title, f'{column}{rows[i]}')
+        return derived
+
+    def day_window(self, sheet_title: str) -> Optional[DayWindow]:
+        """The rows of the sitting days in `date_range` and the session totals
+        up to the first of them, or None if there are none."""
+
+        if sheet_title in self._day_windows:
+            return self._day_windows[sheet_title]
+
+        window = None
+        if self.date_range is not None:
+            days = self.day_totals(sheet_title)
+            # the days are in date order
+            dates = [day.date for day in days]
+            start = bisect_left(dates, self.date_range[0])
+            end = bisect_right(dates, self.date_range[1])
+            if start < end:
+                # running totals before each day
+                duration_before = list(accumulate((day.duration for day in days),
+                                                  initial=timedelta()))
+                aat_before = list(accumulate((day.aat for day in days), initial=timedelta()))
+                # rows for a day can be further down the sheet than later days
+                window = DayWindow(min(day.first_row for day in days[start:end]),
+                                   max(day.last_row for day in days[start:end]),
+                                   duration_before[start], aat_before[start])
+
+        self._day_windows[sheet_title] = window
+        return window
+
+    def chamber_day_index(self):
+        """Fill `date_num_look_up` (chamber sitting date -> day number) without
+        processing the chamber sheet. Only the day and date columns are read."""
+
+        self.check_chamber()
+        day_col = self.title_index[CH_SHEET_TITLE][DAY]
+        date_col = self.title_index[CH_SHEET_TITLE][DATE]
+        first_col = min(day_col, date_col)
+
+        data = cast(Worksheet, self.input_workbook[CH_SHEET_TITLE])
+        for values in data.iter_rows(min_row=2, min_col=first_col + 1,
+                                     max_col=max(day_col, date_col) + 1, values_only=True):
+            day = values[day_col - first_col]
+            day_date = values[date_col - first_col]
+            if isinstance(day, int) and isinstance(day_date, date):
+                self.date_num_look_up.setdefault(day_date, day)
+
+    def process(self, sheet_title: str, sinks: Sequence['Sink']):
+        """Read a sheet once, passing every parsed row and the analysis sections
+        it is in to each of the sinks. Each row is only classified once, and
+        its classification is added to the classification report."""
+
+        chamber = sheet_title == CH_SHEET_TITLE
+        report: Optional[SheetClassification] = None
+        if self.classification is not None:
+            sections = CH_SECTIONS if chamber else WH_SECTIONS
+            report = self.classification.sheet(sheet_title,
+                                               [(key, title) for key, title, *_ in sections])
+        classify = report is not None or any(sink.needs_sections for sink in sinks)
+
+        rows = 0
+        last_day = 0
+        keys: list[str] = []
+        for c, entry in self.entries(sheet_title):
+            rows += 1
+            if entry.day < last_day:
+                # the sinks put the row with the rest of its day
+                self.diagnostics.add(ROW_OUT_OF_ORDER, sheet_title, f'Row {c}', entry.day,
+                                     f'day {entry.day} is below day {last_day}')
+            else:
+                last_day = entry.day
+            if classify:
+                start = perf_counter()
+                keys = section_keys(chamber, entry)
+                if report is not None:
+                    report.add(c, entry.subject1, entry.tags, entry.duration, keys,
+                               perf_counter() - start)
+            for sink in sinks:
+                sink.add(c, entry, keys)
+        if self.metrics is not None:
+            self.metrics.rows[sheet_title] = rows
+
+        for sink in sinks:
+            sink.finish()
+
+    def analysis_sinks(self, sheet_title: str, output_folder_path: str = '') -> list['Sink']:
+        """The analysis table, its table of contents and, if required,
+        the Excel version of the analysis."""
+
+        sinks: list[Sink]
+        if sheet_title == CH_SHEET_TITLE:
+            sinks = [HouseAnalysisSink(self, output_folder_path),
+                     ContentsSink(self, sheet_title,
+                                  os.path.join(output_folder_path, HOUSE_CONTENTS_FILE))]
+        else:
+            sinks = [WHAnalysisSink(self, output_folder_path),
+                     ContentsSink(self, sheet_title,
+                                  os.path.join(output_folder_path, WH_CONTENTS_FILE))]
+
+        if self.out_wb is not None:
+            sinks.append(ExcelSink(self, sheet_title))
+
+        return sinks
+
     def house_diary(self, output_folder_path: str = ''):
         """Create an (indesign formatted) XML file for the house diary section of
         the Sessional diary."""
 
-        self.check_chamber()
+        # the look up of chamber day numbers is also filled for the WH diary
+        self.process(CH_SHEET_TITLE, [HouseDiarySink(self, output_folder_path),
+                                      DayIndexSink(self)])
+        self.flush_outputs()
 
-        cmbr_data = cast(Worksheet, self.input_workbook[CH_SHEET_TITLE])
+    def house_analysis(self, output_folder_path: str = ''):
 
-        session_total_time      = timedelta(seconds=0)
-        # day_total_time          = timedelta(seconds=0)
-        session_total_after_moi = timedelta(seconds=0)
-        # day_total_after_moi     = timedelta(seconds=0)
+        self.process(CH_SHEET_TITLE, self.analysis_sinks(CH_SHEET_TITLE, output_folder_path))
+        self.flush_outputs()
 
-        table_sections = []
+    def wh_diary(self, output_folder_path: str = ''):
 
-        total_days: int = 0
+        if len(self.date_num_look_up) == 0:
+            self.chamber_day_index()
+        self.process(WH_SHEET_TITLE, [WHDiarySink(self, output_folder_path)])
+        self.flush_outputs()
 
-        # day_number_counter = 0
+    def wh_analysis(self, output_folder_path: str = ''):
 
-        table_ele = id_table(
-            [('Time', 35), ('Subject', 355),
-             # ('Exit', 45),
-             ('Duration', 45),
-             ('After appointed time', 45)],
-            table_class=CH_Diary_Table)
+        self.process(WH_SHEET_TITLE, self.analysis_sinks(WH_SHEET_TITLE, output_folder_path))
+        self.flush_outputs()
 
-        previous_day = 1
+    def create_contents(self, table_sections: dict, output_file_path: str):
 
-        for c, excel_row in enumerate(cmbr_data.iter_rows(), start=1):
-            if c == 1:
-                continue
+        # create XML element for the contents table
+        contents_table = id_table(
+            [('Part ', 50), ('Contents', 200), ('Duration', 45), ('After appointed time', 45)],
+            table_class=Contents_Table
+        )
 
-            if all(not v.value for v in excel_row[:10]):
-                # skip over any blank rows
-                continue
 
+        # I'm not sure we need the part information because I'm not sure it is meaningful
+        # especially for the Chamber
+        # if part_aat:
+        #     part_aat_str = format_timedelta(part_aat)
+        # else:
+        #     part_aat_str = ''
+        # cells = make_id_cells(['Part II',
+        #                        '',
+        #                        format_timedelta(part_dur),
+        #                        part_aat_str],
+        #                       attrib={AID5 + 'cellstyle': 'RightAlign'})
+        # contents_table.add_row(cells)
+
+
+        for row in contents_rows(table_sections):
+            cells = make_id_cells(row, attrib={AID5 + 'cellstyle': 'RightAlign'})
+            contents_table.add_row(cells)  # type: ignore
+
+        # print(text)
+        self.save_table(output_file_path, contents_table)
+
+def contents_rows(table_sections: dict) -> Iterator[list[str]]:
+    """The rows of the table of contents: number, title, duration and after
+    appointed time (blank for westminster hall). Each parent (e.g. 2:
+    Government bills) comes before its first section."""
+
+    previous_parents = set()
+    for table_section in table_sections.values():
+        if table_section.parent is not None and table_section.parent not in previous_parents:
+            previous_parents.add(table_section.parent)
+
+
+            table_num_dur_formatted = format_timedelta(table_section.parent.total_duration)
             try:
-                entry = CHRow(excel_row)
-            except (ValueError, AttributeError):
-                print(f'Skipping row {c}')
-                continue
+                table_num_aat_formatted = format_timedelta(table_section.parent.total_aat)
+            except AttributeError:
+                table_num_aat_formatted = ''
+            try:
+                table_num, title = table_section.parent.title.split('\t')
+            except Exception:
+                table_num = ''
+                title = table_section.parent.title
+            yield [
+                f'{table_num}',
+                title,
+                f'{table_num_dur_formatted}',
+                f'{table_num_aat_formatted}'
+            ]
+
+            # we do not want it include tables totals more than once
+            try:
+                if table_num == int(table_section.title.split(":\t")[0]):
+                    continue
+            except Exception:
+                pass
 
-            if c == 2:
-                table_sections.append(CH_DiaryDay_TableSection(
-                    f'{entry.day}.\u2002{entry.date.strftime("%A %d %B %Y")}'))
+        try:
+            title_num, title = table_section.title.split(":\t")
+        except Exception:
+            title_num = ''
+            title = table_section.title
+        formatted_dur = format_timedelta(table_section.duration)
+        try:
+            formatted_aat = format_timedelta(table_section.after_appointed_time)
+        except AttributeError:
+            formatted_aat = ''
+        # text += f'\n\t{title_number}\t{formatted_dur}\t{formatted_aat}'
+        yield [
+            f'{title_num}',
+            title,
+            f'{formatted_dur}',
+            f'{formatted_aat}'
+        ]
 
-            if entry.day > total_days:
-                # For calculating the average duration of sitting days we need
-                # the total number of days. This should be the last entry.day
-                # but we can't just look as the last row in cambr_data because
-                # there can be blank rows at the end of the sheet.
-                total_days = entry.day
 
+class Sink:
+    """Something that is given the parsed rows of a sheet one at a time.
 
-            if entry.day != previous_day:
-                previous_day = entry.day
+    However many sinks there are, each sheet is only read once.
+    See `Sessional_Diary.process`."""
 
-                # day_total_time = timedelta()
-                # day_total_after_moi = timedelta()
+    # whether `add` is given the analysis sections of the rows
+    needs_sections = True
 
-                table_sections[-1].add_to(table_ele, session_total_time, session_total_after_moi)
+    def add(self, c: int, entry, section_keys: Sequence[str]) -> None:
+        """Add the parsed row `entry` which is row number `c` of the sheet and
+        is in the analysis sections `section_keys`."""
+        raise NotImplementedError
 
-                table_sections.append(CH_DiaryDay_TableSection(
-                    f'{entry.day}.\u2002{entry.date.strftime("%A %d %B %Y")}'))
+    def finish(self) -> None:
+        """Called once all the rows of the sheet have been added."""
+        raise NotImplementedError
 
-                # add the date and number to the lookup.
-                # this is so this info can also be put in the WH table
-                DATE_NUM_LOOK_UP[entry.date] = entry.day
 
-            # need to add up all the durations
-            session_total_time += entry.duration
-            session_total_after_moi += entry.aat
+class DayIndexSink(Sink):
+    """Fills `Sessional_Diary.date_num_look_up` from the chamber sheet so the
+    chamber day numbers can be put in the westminster hall diary."""
 
-            # there will be 4 cells per row
-            cell = ID_Cell()
+    needs_sections = False
 
-            # create a Bold element. Optionally can have non bold tail text
-            bold = SubElement(cell, 'Bold')
-            bold.text = entry.subject1
-            if entry.subject2:
-                bold.tail = f': {entry.subject2}'  # this text will not be bold
+    def __init__(self, sd: Sessional_Diary):
+        self.date_num_look_up = sd.date_num_look_up
 
+    def add(self, c: int, entry: WHRow, section_keys: Sequence[str]):
+        self.date_num_look_up.setdefault(entry.date, entry.day)
 
-            duration = entry.duration
-            if duration == timedelta():
-                duration = ''
-            aat = entry.aat
-            if aat == timedelta():
-                aat = ''
+    def finish(self):
+        pass
 
-            table_sections[-1].add_row(
-                [entry.time.strftime('%H.%M'), cell, duration, aat],
-                duration=entry.duration, aat=entry.aat)
 
-        # need to add the last table section
-        if len(table_sections) > 0:
-            table_sections[-1].add_to(table_ele, session_total_time, session_total_after_moi)
+class HouseDiarySink(Sink):
+    """Create an (indesign formatted) XML file for the house diary section of
+    the Sessional diary."""
+
+    needs_sections = False
+
+    def __init__(self, sd: Sessional_Diary, output_folder_path: str = ''):
+        self.sd = sd
+        self.output_folder_path = output_folder_path
+
+        self.session_total_time      = timedelta(seconds=0)
+        self.session_total_after_moi = timedelta(seconds=0)
+
+        # the rows of each sitting day keyed on day number, rendered in
+        # `finish` (see diary.py)
+        self.days: dict[int, DiaryDay] = {}
+
+        self.total_days: int = 0
+
+        self.table_ele = self.new_table()
+        self.chunks = TableChunks(self.table_ele)
+
+        self.previous_day: Optional[int] = None
+
+        window = sd.day_window(CH_SHEET_TITLE) if sd.date_range else None
+        if window is not None:
+            # the session totals carry on from the days before the window
+            self.session_total_time = window.duration_before
+            self.session_total_after_moi = window.aat_before
+        self.duration_before = self.session_total_time
+        self.aat_before = self.session_total_after_moi
+
+    def new_table(self) -> CH_Diary_Table:
+        return id_table(
+            [('Time', 35), ('Subject', 355),
+             # ('Exit', 45),
+             ('Duration', 45),
+             ('After appointed time', 45)],
+            table_class=CH_Diary_Table)
+
+    def new_day(self, entry: CHRow) -> DiaryDay:
+        return DiaryDay(f'{entry.day}.\u2002{entry.date.strftime("%A %d %B %Y")}', entry.date)
+
+    def add(self, c: int, entry: CHRow, section_keys: Sequence[str]):
+        day = self.days.get(entry.day)
+        if day is None:
+            day = self.days[entry.day] = self.new_day(entry)
+        elif entry.day != self.previous_day:
+            # more rows for a day, further down the sheet
+            day.out_of_order = True
+        self.previous_day = entry.day
+
+        if entry.day > self.total_days:
+            # For calculating the average duration of sitting days we need
+            # the total number of days. This should be the last entry.day
+            # but we can't just look as the last row in cambr_data because
+            # there can be blank rows at the end of the sheet.
+            self.total_days = entry.day
+
+        # need to add up all the durations
+        self.session_total_time += entry.duration
+        self.session_total_after_moi += entry.aat
+        day.duration += entry.duration
+        day.aat += entry.aat
+
+        # there will be 4 cells per row
+        day.rows.append((entry.time, entry.subject1, entry.subject2,
+                         entry.duration, entry.aat))
+
+    def finish(self):
+        render_diary(self.table_ele, self.chunks, True,
+                     diary_days(self.days, self.sd.chunk_by),
+                     self.duration_before, self.aat_before)
 
 
         # now output XML (for InDesign) file
-        output_root = Element('root')  # create root element
-        output_root.append(table_ele)
-        output_tree = etree.ElementTree(output_root)
-        output_tree.write(os.path.join(output_folder_path, 'House_Diary.xml'),
-                          encoding='UTF-8', xml_declaration=True)
+        self.sd.save_table(os.path.join(self.output_folder_path, HOUSE_DIARY_FILE),
+                           self.table_ele, self.chunks, self.new_table)
+
+        if self.sd.date_range is not None:
+            # the averages are only for the whole session
+            return
 
         # calculate the average duration of sitting days
-        if total_days > 0:
-            avg_duration = session_total_time / total_days
-            avg_after_moi = session_total_after_moi / total_days
+        if self.total_days > 0:
+            avg_duration = self.session_total_time / self.total_days
+            avg_after_moi = self.session_total_after_moi / self.total_days
         else:
             avg_duration = timedelta()
             avg_after_moi = timedelta()
@@ -340,363 +1365,114 @@ class Sessional_Diary:
         print(f'Average duration of sitting days: {format_timedelta(avg_duration)}')
         print(f'Average duration after appointed time: {format_timedelta(avg_after_moi)}')
 
-    def house_analysis(self, output_folder_path: str = ''):
 
-        # we're only interested in the main data here
-        main_data = self.input_workbook[CH_SHEET_TITLE]
+def diary_chunk_key(chunk_by: Optional[Union[str, int]], day_date: date,
+                    day_index: int) -> str:
+    """The chunk of the diary that a sitting day is in. `chunk_by` is either
+    'month' or a number of sitting days. `day_index` counts the sitting days
+    from 0."""
 
-        # add heading elements to table
-        table_ele = id_table(
-            [('Date', 95), ('', 295), ('Duration', 45), ('After appointed time', 45)],
-            table_class=CH_Table
-        )
+    if not chunk_by:
+        return ''
+    if chunk_by == 'month':
+        return day_date.strftime('%Y-%m')
+    return f'{day_index // int(chunk_by) + 1:02}'
 
-        # parents
-        # some tables have a parent e.g. 2 is the parent of 2a and 2b
-        # parents are only referenced in the table of contents
-        parent_2 = SudoTableSection('2:\tGovernment bills')
-        parent_3 = SudoTableSection('3:\tPrivate Members’ bills')
-        parent_5 = SudoTableSection('5:\tGovernment motions')
-        parent_6 = SudoTableSection('6:\tOpposition business')
-        parent_8 = SudoTableSection('8:\tPrivate Members’ business (other than bills)')
-        parent_14 = SudoTableSection('14:\tBusiness when no Question before House')
-
-        t_sections = {
-            # the order matters!
-            'addresses': CH_AnalysisTableSection(
-                '1:\tAddresses other than Prayers',
-                '1 Addresses other than Prayers',
-                None),
-            'second_readings': CH_AnalysisTableSection(
-                '2a:\tGovernment Bills: Read a second time and committed to Public Bill Committee',
-                '2a Govt Bills 2R & committed',
-                parent_2),
-            'cwh_bills': CH_AnalysisTableSection(
-                '2b:\tGovernment Bills: Read a second time and committed to '
-                'Committee of the whole House (in whole or part)',
-                '2b Govt Bill 2R & sent to CWH',
-                parent_2),
-            'cwh_2_bills': CH_AnalysisTableSection(
-                '2d:\tGovernment Bills: Committee of the whole House',
-                '2d Govt Bills CWH',
-                parent_2),
-            'gov_bil_cons': CH_AnalysisTableSection(
-                '2e:\tGovernment Bills: Consideration',
-                '2e Govt Bills Consideration',
-                parent_2),
-            'gov_bill_3rd': CH_AnalysisTableSection(
-                '2f:\tGovernment Bills: Third Reading',
-                '2f Govt Bills 3R',
-                parent_2),
-            'gov_bill_lord_amend': CH_AnalysisTableSection(
-                '2g:\tGovernment Bills: Lord Amendments',
-                '2g Lords Amendments',
-                parent_2),
-            'alloc_time': CH_AnalysisTableSection(
-                '2h:\tAllocation of time motions',
-                '2h Allocation of time motions',
-                parent_2),
-            'gov_bill_other': CH_AnalysisTableSection(
-                '2i:\tGovernment Bills: Other Stages',
-                '2i Govt Bills Other Stages',
-                parent_2),
-            'pmbs_2r': CH_AnalysisTableSection(
-                '3a:\tPrivate Members\' Bills: Second Reading',
-                '3a PMB 2R',
-                parent_3),
-            'pmbs_other': CH_AnalysisTableSection(
-                '3b:\tPrivate Members\' Bills: Other Stages',
-                '3b PMB Other stages',
-                parent_3),
-            'private_business': CH_AnalysisTableSection(
-                '4:\tPrivate Business',
-                '4 Private Business',
-                None),
-
-            # George says that European Union documents are no longer needed 2026-06-17
-            # 'eu_docs': CH_AnalysisTableSection(
-            #     '5a:\tEuropean Union documents',
-            #     '5a European Union documents',
-            #     parent_5),
-            'gov_motions': CH_AnalysisTableSection(
-                '5a:\tGovernment motions',
-                '5a Government motions',
-                parent_5),
-            # George says that these are no longer needed 2026-06-17
-            # 'gov_motions_gen': CH_AnalysisTableSection(
-            #     '5c:\tGovernment motions (General)',
-            #     '5c Govt motions (General)',
-            #     parent_5),
-            'gen_debates': CH_AnalysisTableSection(
-                '5b:\tGovernment motions (General Debates)',
-                '5b Govt motions (Gen Debates)',
-                parent_5),
-            'opposition_days': CH_AnalysisTableSection(
-                '6a:\tOpposition Days',
-                '6a Opposition Days',
-                parent_6),
-            'oppo_motions_in_gov_time': CH_AnalysisTableSection(
-                '6b:\tOpposition motions in Government time',
-                '6b Opp Motion in Govt time',
-                parent_6),
-            'backbench_business': CH_AnalysisTableSection(
-                '7: \tBackbench Business',
-                '7 Backbench Business',
-                None),
-            'pm_motion': CH_AnalysisTableSection(
-                '8a:\tPrivate Members\' Motions',
-                '8a Private Members\' Motions',
-                parent_8),
-            'ten_min_motion': CH_AnalysisTableSection(
-                '8b:\tTen Minute Rule Motions',
-                '8b Ten minute rules',
-                parent_8),
-            'emergency_debates': CH_AnalysisTableSection(
-                '8c:\tEmergency debates',
-                '8c Emergency debates',
-                parent_8),
-            'adjournment_debates': CH_AnalysisTableSection(
-                '8d:\tAdjournment debates',
-                '8d Adjournment debates',
-                parent_8),
-            'estimates': CH_AnalysisTableSection(
-                '9:\tEstimates',
-                '9 Estimates',
-                None),
-            'money': CH_AnalysisTableSection(
-                '10:\tMoney Resolutions',
-                '10 Money Resolutions',
-                None),
-            'ways_and_means': CH_AnalysisTableSection(
-                '11:\tWays and Means',
-                '11 Ways and Means',
-                None),
-            'affirmative_sis': CH_AnalysisTableSection(
-                '12:\tAffirmative Statutory Instruments',
-                '12 Affirmative SIs',
-                None),
-            'negative_sis': CH_AnalysisTableSection(
-                '13:\tNegative Statutory Instruments',
-                '13 Negative SIs',
-                None),
-            'questions': CH_AnalysisTableSection(
-                '14a:\tQuestions',
-                '14a Questions',
-                parent_14),
-            'topical_questions': CH_AnalysisTableSection(
-                '14b:\tTopical Questions',
-                '14b Topical Questions',
-                parent_14),
-            'urgent_questions': CH_AnalysisTableSection(
-                '14c:\tUrgent Questions',
-                '14c Urgent Questions',
-                parent_14),
-            'statements': CH_AnalysisTableSection(
-                '14d:\tStatements',
-                '14d Statements',
-                parent_14),
-            'business_statements': CH_AnalysisTableSection(
-                '14e:\tBusiness Statements',
-                '14e Business Statements',
-                parent_14),
-            'committee_statements': CH_AnalysisTableSection(
-                '14f:\tCommittee Statements',
-                '14f Committee Statements',
-                parent_14),
-            'app_for_emerg_debate': CH_AnalysisTableSection(
-                '14g:\tS.O. No. 24 Applications',
-                '14g SO No 24 Applications',
-                parent_14),
-            'points_of_order': CH_AnalysisTableSection(
-                '14h:\tPoints of Order',
-                '14h Points of Order',
-                parent_14),
-            'public_petitions': CH_AnalysisTableSection(
-                '14i:\tPublic Petitions',
-                '14i Public Petitions',
-                parent_14),
-            'miscellaneous': CH_AnalysisTableSection(
-                '14j:\tMiscellaneous',
-                '14j Miscellaneous',
-                parent_14),
-            'prayers': CH_AnalysisTableSection(
-                '15:\tDaily Prayers',
-                '15 Daily Prayers',
-                None),
-        }
 
-        for c, excel_row in enumerate(main_data.iter_rows(), start=1):  # type: ignore
+def diary_days(days: dict[int, DiaryDay], chunk_by: Optional[Union[str, int]]) -> list[DiaryDay]:
+    """The sitting days of a diary, keyed on day number, in day order with the
+    chunk each is in. The rows of a day that were not all together in the sheet
+    are put in time order."""
 
-            if c == 1:
-                # top row just has headings in
-                continue
+    ordered = [days[day_number] for day_number in sorted(days)]
+    for i, day in enumerate(ordered):
+        if day.out_of_order:
+            day.sort_rows()
+        day.chunk_key = diary_chunk_key(chunk_by, day.date, i)
+    return ordered
 
-            if all(not v.value for v in excel_row[:9]):
-                # skip any blank rows
-                continue
 
-            try:
-                entry = CHRow(excel_row)
-            except (ValueError, AttributeError):
-                print(f'Skipping row {c}')
-                continue
+def analysis_part(section_title: str) -> str:
+    """The chunk of the analysis that a section is in, i.e. its part,
+    e.g. Part_2 for '2a:\tGovernment Bills: ...'"""
 
+    match = re.match(r'\d+', section_title)
+    return f'Part_{int(match.group()):02}' if match else ''
 
-            forematted_date = format_date(entry.date)
 
-            # col_time = Time.strip().lower()
-            subject_lower = entry.subject1.lower()
-            col_exit    = entry.tags.lower()
+def chamber_cells(key: str, entry: CHRow, formatted_date: Optional[str]) -> list:
+    """The cells for a row of the House analysis section with this key."""
+
+    if key == 'miscellaneous':
+        # for Miscellaneous we will also include stuff in col_subject3
+        return [
+            formatted_date,
+            ': '.join([entry.subject1, entry.subject2]).rstrip(': '),
+            entry.duration,
+            entry.aat
+        ]
+
+    return [
+        formatted_date,
+        entry.subject2,
+        entry.duration,
+        entry.aat
+    ]
 
-            cells_vals = [
-                forematted_date,
-                entry.subject2,
-                entry.duration,
-                entry.aat
-            ]
 
-            fullrow = [cells_vals, entry.duration, entry.aat]
-
-            # Table 1 Addresses other than Prayers
-            if subject_lower == 'address':
-                t_sections['addresses'].add_row(*fullrow)
-            # Table 2a Government bills second reading
-            if '[pmb]' not in col_exit:
-                # here we have items that are not explicitly private members' bills
-                if subject_lower == 'second reading' and 'pbc' in col_exit:
-                    # gov bill second reading
-                    t_sections['second_readings'].add_row(*fullrow)
-
-                if 'committee of the whole house' in subject_lower:
-                    t_sections['cwh_2_bills'].add_row(*fullrow)
-                if 'consideration' in subject_lower:
-                    # gov bill consideration
-                    t_sections['gov_bil_cons'].add_row(*fullrow)
-                if subject_lower == 'third reading':
-                    # gov bill third reading
-                    t_sections['gov_bill_3rd'].add_row(*fullrow)
-                if subject_lower == 'lords amendments':
-                    # gov bill lords amendments
-                    t_sections['gov_bill_lord_amend'].add_row(*fullrow)
-                gov_bill_other_subs = (
-                    'second and third reading',  # not in subject list (Sep 2024)
-                    'money resolution',  # not in subject list (Sep 2024)
-                    # 'lords amendments',  # removed on Tuesday, 16  June 2026
-                    'other stages'  # added in Sep 2024 (Sara ELKHAWAD)
-                )
-                if ('legislative grand committee' in subject_lower
-                        or subject_lower in gov_bill_other_subs):
-                    t_sections['gov_bill_other'].add_row(*fullrow)
-
-            if (subject_lower == 'second reading'
-                    and 'committee of the whole house' in entry.subject2.lower()):
-                t_sections['cwh_bills'].add_row(*fullrow)
-
-            if subject_lower.lower() == 'allocation of time motion':
-                t_sections['alloc_time'].add_row(*fullrow)
-
-            if '[pmb]' in col_exit:
-                if subject_lower == 'second reading':
-                    # private members' bills second reading
-                    t_sections['pmbs_2r'].add_row(*fullrow)
-                elif subject_lower not in (
-                    'ten minute rule motion',
-                    'point of order',
-                    'remaining orders',
-                ):
-                    # private members' bills other
-                    # this does not include ten minute rules
-                    # Explicitly this is `other stages`
-                    t_sections['pmbs_other'].add_row(*fullrow)
-
-            if 'private business' in subject_lower:
-                t_sections['private_business'].add_row(*fullrow)
-
-            # if subject_lower == 'eu documents':
-                # George says that European Union documents are no longer needed 2026-06-17
-                # t_sections['eu_docs'].add_row(*fullrow)
-
-            if subject_lower in ('government motion', 'government motions', 'business motion'):
-                t_sections['gov_motions'].add_row(*fullrow)
-
-            # George says that these are no longer needed 2026-06-17
-            # if subject_lower == 'general motion':
-            #     t_sections['gov_motions_gen'].add_row(*fullrow)
-
-            if subject_lower == 'general debate':
-                t_sections['gen_debates'].add_row(*fullrow)
-
-            if subject_lower == 'opposition day':
-                t_sections['opposition_days'].add_row(*fullrow)
-
-            if subject_lower == 'opposition motion in government time':
-                t_sections['oppo_motions_in_gov_time'].add_row(*fullrow)
-            if subject_lower == 'backbench business':
-                t_sections['backbench_business'].add_row(*fullrow)
-            if subject_lower in ('private member\'s motion',
-                                 'private member’s motion',
-                                 'private members\' motion'):
-                t_sections['pm_motion'].add_row(*fullrow)
-            if subject_lower == 'ten minute rule motion':
-                t_sections['ten_min_motion'].add_row(*fullrow)
-            if 'no. 24 debate' in subject_lower:
-                t_sections['emergency_debates'].add_row(*fullrow)
-            if 'adjournment' in subject_lower:
-                t_sections['adjournment_debates'].add_row(*fullrow)
-            if subject_lower == 'estimates day':
-                t_sections['estimates'].add_row(*fullrow)
-            if subject_lower == 'money resolution':
-                t_sections['money'].add_row(*fullrow)
-            if subject_lower == 'ways and means':
-                t_sections['ways_and_means'].add_row(*fullrow)
-            if 'affirmative' in subject_lower:
-                t_sections['affirmative_sis'].add_row(*fullrow)
-            if subject_lower == 'negative statutory instrument':
-                t_sections['negative_sis'].add_row(*fullrow)
-            if subject_lower == 'questions':
-                t_sections['questions'].add_row(*fullrow)
-            if subject_lower == 'topical questions':
-                t_sections['topical_questions'].add_row(*fullrow)
-            if subject_lower in ('urgent question', 'urgent questions'):
-                t_sections['urgent_questions'].add_row(*fullrow)
-            if subject_lower == 'statement':
-                t_sections['statements'].add_row(*fullrow)
-            if subject_lower == 'business statement':
-                t_sections['business_statements'].add_row(*fullrow)
-            if 'committee statement' in subject_lower:
-                t_sections['committee_statements'].add_row(*fullrow)
-            if 'no. 24 application' in subject_lower:
-                t_sections['app_for_emerg_debate'].add_row(*fullrow)
-            if subject_lower in ('point of order', 'points of order'):
-                t_sections['points_of_order'].add_row(*fullrow)
-            if 'public petition' in subject_lower:
-                t_sections['public_petitions'].add_row(*fullrow)
-            if subject_lower == 'prayers':
+def wh_cells(entry: WHRow, formatted_date: Optional[str]) -> list:
+    """The cells for a row of a Westminster Hall analysis section."""
+
+    return [
+        formatted_date,
+        entry.subject2,
+        entry.duration,
+    ]
+
+
+class HouseAnalysisSink(Sink):
+
+    def __init__(self, sd: Sessional_Diary, output_folder_path: str = ''):
+        self.sd = sd
+        self.output_folder_path = output_folder_path
+
+        # add heading elements to table
+        self.table_ele = self.new_table()
+        self.chunks = TableChunks(self.table_ele)
+
+        parents = {num: SudoTableSection(title) for num, title in CH_PARENT_TITLES.items()}
+        self.t_sections = {
+            key: CH_AnalysisTableSection(title, parents.get(parent))
+            for key, title, _, parent in CH_SECTIONS
+        }
+
+    def new_table(self) -> CH_Table:
+        return id_table(
+            [('Date', 95), ('', 295), ('Duration', 45), ('After appointed time', 45)],
+            table_class=CH_Table
+        )
+
+    def add(self, c: int, entry: CHRow, section_keys: Sequence[str]):
+        t_sections = self.t_sections
+
+        forematted_date = format_date(entry.date)
+
+        for key in section_keys:
+            if key == 'prayers':
                 # prayers are not itemised
-                # t_sections['prayers'].add_row(*fullrow)
                 t_sections['prayers'].duration += entry.duration
                 t_sections['prayers'].after_appointed_time += entry.aat
+            else:
+                t_sections[key].add_row(chamber_cells(key, entry, forematted_date),
+                                        entry.duration, entry.aat)
 
-            miscellaneous_options = ('tributes', 'election of a speaker',
-                                     'suspension', 'observation of a minute\'s silence',
-                                     'personal statement',
-                                     'presentation of private members\' bills')
-            if (subject_lower in miscellaneous_options
-                    or 'message to attend the lords' in subject_lower):
-
-                # for Miscellaneous we will also include stuff in col_subject3
-                misc_cells = [
-                    forematted_date,
-                    ': '.join([entry.subject1, entry.subject2]).rstrip(': '),
-                    entry.duration,
-                    entry.aat
-                ]
-                t_sections['miscellaneous'].add_row(misc_cells, entry.duration, entry.aat)
-
+    def finish(self):
+        table_ele = self.table_ele
 
         previous_table_sec_parent: Optional[SudoTableSection] = None
 
-        for table_section in t_sections.values():
+        for table_section in self.t_sections.values():
+            self.chunks.mark(analysis_part(table_section.title))
             if table_section.parent != previous_table_sec_parent:
                 # if there is a section with a new parent we will put a
                 # new subhead row into the table This will probably
@@ -721,194 +1497,118 @@ class Sessional_Diary:
 
 
         # now create XML for InDesign
-        # create root element
-        output_root = Element('root')
-        output_root.append(table_ele)
-        output_tree = etree.ElementTree(output_root)
-        output_tree.write(os.path.join(output_folder_path, 'House_Analysis.xml'),
-                          encoding='UTF-8', xml_declaration=True)
-
-        self.create_contents(t_sections,
-                             os.path.join(output_folder_path, 'House_An_Contents.xml'),
-                             CH_AnalysisTableSection.part_dur,
-                             CH_AnalysisTableSection.part_aat)
+        self.sd.save_table(os.path.join(self.output_folder_path, HOUSE_ANALYSIS_FILE),
+                           table_ele, self.chunks, self.new_table)
 
-    def wh_diary(self, output_folder_path: str = ''):
 
-        self.check_wh()
+class WHDiarySink(Sink):
 
-        table_ele = id_table(
-            [('Time', 35), ('Subject', 400), ('Duration', 45)],
-            table_class=WH_Diary_Table
-        )
+    needs_sections = False
+
+    def __init__(self, sd: Sessional_Diary, output_folder_path: str = ''):
+        self.sd = sd
+        self.output_folder_path = output_folder_path
+
+        self.table_ele = self.new_table()
+        self.chunks = TableChunks(self.table_ele)
 
-        if len(DATE_NUM_LOOK_UP) == 0:
+        if len(sd.date_num_look_up) == 0:
             print('Data for the chamber has not yet been processed so the chamber number will'
                   ' not be put in the westminstar hall table. The square brackets will'
                   ' instead be left blank.')
 
-        wh_data = cast(Worksheet, self.input_workbook[WH_SHEET_TITLE])
+        self.session_total_time = timedelta(seconds=0)
 
-        session_total_time = timedelta(seconds=0)
+        # the rows of each sitting day keyed on day number, rendered in
+        # `finish` (see diary.py)
+        self.days: dict[int, DiaryDay] = {}
 
-        table_sections = []
+        self.previous_day: Optional[int] = None
 
-        previous_day = 1
-
-        for c, excel_row in enumerate(wh_data.iter_rows()):
-
-            if c == 0:
-                continue
-
-            try:
-                entry = WHRow(excel_row)
-            except (ValueError, AttributeError):
-                continue
-
-            if c == 1:
-                chamber_daynum = DATE_NUM_LOOK_UP.get(entry.date, '')
-                sec_title = (f'{entry.day}.\u2002[{chamber_daynum}]'
-                             f'\u2002{entry.date.strftime("%A %d %B %Y")}')
-                table_sections.append(WH_DiaryDay_TableSection(sec_title))
+        window = sd.day_window(WH_SHEET_TITLE) if sd.date_range else None
+        if window is not None:
+            # the session total carries on from the days before the window
+            self.session_total_time = window.duration_before
+        self.duration_before = self.session_total_time
 
+    def new_table(self) -> WH_Diary_Table:
+        return id_table(
+            [('Time', 35), ('Subject', 400), ('Duration', 45)],
+            table_class=WH_Diary_Table
+        )
 
-            if entry.day != previous_day:
-                previous_day = entry.day
-
-                table_sections[-1].add_to(table_ele, session_total_time)
-
-                # if the chamber diary has already been created the global
-                # dictionary, `DATE_NUM_LOOK_UP` will have been populated
-                # with datetime.date objs as the keys and Integers as values
-                # if the chamber diary has not already been created or
-                # if westminster hall sat on a day where the chamber did not
-                # sit, we may have empty square brackets.
-                chamber_daynum = DATE_NUM_LOOK_UP.get(entry.date, '')
-
-                sec_title = (f'{entry.day}.\u2002[{chamber_daynum}]'
-                             f'\u2002{entry.date.strftime("%A %d %B %Y")}')
-
-                table_sections.append(WH_DiaryDay_TableSection(sec_title))
-
-
-            # need to add up all the durations
-            session_total_time += entry.duration
-
-            # there will be 3 cells per row
-            cell = ID_Cell()
-            if entry.subject1:
-                bold = SubElement(cell, 'Bold')
-                bold.text = entry.subject1
-                if entry.subject2:
-                    bold.tail = f': {entry.subject2}'
-                cells = make_id_cells(
-                    [entry.time.strftime('%H.%M'), cell, entry.duration])  # type: ignore
-                table_sections[-1].add_row(cells, entry.duration)
-
-        # last table section will not have been added in the above loop
-        # so add it below
-        if len(table_sections) > 0:
-            # if the westminster Hall section is empty we will not need to add it
-            table_sections[-1].add_to(table_ele, session_total_time)
-
+    def new_day(self, entry: WHRow) -> DiaryDay:
+        # if the chamber diary has already been created the
+        # dictionary, `date_num_look_up` will have been populated
+        # with datetime.date objs as the keys and Integers as values
+        # if the chamber diary has not already been created or
+        # if westminster hall sat on a day where the chamber did not
+        # sit, we may have empty square brackets.
+        chamber_daynum = self.sd.date_num_look_up.get(entry.date, '')
+        sec_title = (f'{entry.day}.\u2002[{chamber_daynum}]'
+                     f'\u2002{entry.date.strftime("%A %d %B %Y")}')
+        return DiaryDay(sec_title, entry.date)
+
+    def add(self, c: int, entry: WHRow, section_keys: Sequence[str]):
+        day = self.days.get(entry.day)
+        if day is None:
+            day = self.days[entry.day] = self.new_day(entry)
+        elif entry.day != self.previous_day:
+            # more rows for a day, further down the sheet
+            day.out_of_order = True
+        self.previous_day = entry.day
+
+        # need to add up all the durations
+        self.session_total_time += entry.duration
+        day.duration += entry.duration
+
+        # there will be 3 cells per row
+        if entry.subject1:
+            day.rows.append((entry.time, entry.subject1, entry.subject2,
+                             entry.duration))
+
+    def finish(self):
+        # if the westminster Hall section is empty there are no days
+        render_diary(self.table_ele, self.chunks, False,
+                     diary_days(self.days, self.sd.chunk_by), self.duration_before)
 
 
         # Create XML for InDesign
-        output_root = Element('root')
-        output_root.append(table_ele)
-        tree = etree.ElementTree(output_root)
-        tree.write(os.path.join(output_folder_path, 'WH_diary.xml'),
-                   encoding='UTF-8', xml_declaration=True)
+        self.sd.save_table(os.path.join(self.output_folder_path, WH_DIARY_FILE),
+                           self.table_ele, self.chunks, self.new_table)
 
-    def wh_analysis(self, output_folder_path: str = ''):
 
-        wh_data = cast(Worksheet, self.input_workbook['Westminster Hall'])
+class WHAnalysisSink(Sink):
 
-        # add a new table element with headings
-        table_ele = id_table([('Date', 95), ('Detail', 340), ('Duration', 45)],
-                             table_class=WH_Table)
-
-        # parents
-        parent_1 = SudoTableSection('1:\tPrivate Members')
-
-        # can now use dict (rather than ordered dict) as order is guaranteed
-        t_sections = {
-            # the order matters!
-            'private': WH_AnalysisTableSection(
-                '1a:\tPrivate Members’ Debates',
-                'WH1 Members debates',
-                parent_1),
-            'bbcom': WH_AnalysisTableSection(
-                '1b:\tPrivate Members’ (Backbench Business Committee recommended) Debates',
-                'WH2 BBCom debates',
-                parent_1),
-            'liaison': WH_AnalysisTableSection(
-                '2:\tLiaison Committee Debates',
-                'WH3 Liaison Com debates',
-                None),
-            'e_petition': WH_AnalysisTableSection(
-                '3:\tDebates on e-Petitions',
-                'WH4 e-Petitions',
-                None),
-            'suspension': WH_AnalysisTableSection(
-                '4:\tSuspensions',
-                'WH5 Suspensions',
-                None),
-            'miscellaneous': WH_AnalysisTableSection(
-                '5:\tMiscellaneous',
-                'WH6 Miscellaneous',
-                None),
-            'statements': WH_AnalysisTableSection(
-                '6:\tStatements',
-                'WH7 Statements',
-                None)
-        }
+    def __init__(self, sd: Sessional_Diary, output_folder_path: str = ''):
+        self.sd = sd
+        self.output_folder_path = output_folder_path
 
-        for c, excel_row in enumerate(wh_data.iter_rows()):
-            if c == 0:
-                continue
-
-            if all(bool(v) is False for v in excel_row[:8]):
-                # skip any blank rows
-                continue
-
-            try:
-                entry = WHRow(excel_row)
-            except (ValueError, AttributeError):
-                continue
-
-            forematted_date = format_date(entry.date)
-
-            cells_vals = [
-                forematted_date,
-                entry.subject2,
-                entry.duration,
-            ]
-            fullrow = [cells_vals, entry.duration]
-            if entry.subject1 in ('Debate (Private Member’s)', 'Debate (Private Member\'s)'):
-                t_sections['private'].add_row(*fullrow)
-            elif entry.subject1 in ('Debate (BBCom recommended)',
-                                    'Debate (BBCom)', 'Debate (BBBCom)'):
-                t_sections['bbcom'].add_row(*fullrow)
-
-            elif entry.subject1 in ('Debate (Liaison Committee)', ):
-                t_sections['liaison'].add_row(*fullrow)
+        # add a new table element with headings
+        self.table_ele = self.new_table()
+        self.chunks = TableChunks(self.table_ele)
 
-            elif entry.subject1 in ('Petition', 'Petitions'):
-                t_sections['e_petition'].add_row(*fullrow)
+        parents = {num: SudoTableSection(title) for num, title in WH_PARENT_TITLES.items()}
+        self.t_sections = {
+            key: WH_AnalysisTableSection(title, parents.get(parent))
+            for key, title, _, parent in WH_SECTIONS
+        }
 
-            elif entry.subject1 == 'Suspension' and entry.tags not in ('[Questions]', '[Question]'):
-                t_sections['suspension'].add_row(*fullrow)
+    def new_table(self) -> WH_Table:
+        return id_table([('Date', 95), ('Detail', 340), ('Duration', 45)],
+                        table_class=WH_Table)
 
-            elif entry.subject1 in ('Committee Statement',):
-                t_sections['statements'].add_row(*fullrow)
-            elif entry.subject1 in ('Time limit', 'Time Limit',
-                                    'Observation of a period of silence'):
-                t_sections['miscellaneous'].add_row(*fullrow)
+    def add(self, c: int, entry: WHRow, section_keys: Sequence[str]):
+        for key in section_keys:
+            self.t_sections[key].add_row(wh_cells(entry, format_date(entry.date)),
+                                         entry.duration)
 
+    def finish(self):
+        table_ele = self.table_ele
 
         previous_table_sec_parent = None
-        for table_section in t_sections.values():
+        for table_section in self.t_sections.values():
+            self.chunks.mark(analysis_part(table_section.title))
             if table_section.parent != previous_table_sec_parent:
                 # if there is a section with a new parent we will put a
                 # new subhead row into the table This will probably
@@ -929,99 +1629,170 @@ class Sessional_Diary:
 
 
         # create XML for indesign
-        output_root = Element('root')
-        output_root.append(table_ele)
-        tree = etree.ElementTree(output_root)
-        tree.write(os.path.join(output_folder_path, 'WH_Analysis.xml'),
-                   encoding='UTF-8', xml_declaration=True)
+        self.sd.save_table(os.path.join(self.output_folder_path, WH_ANALYSIS_FILE),
+                           table_ele, self.chunks, self.new_table)
 
-        self.create_contents(t_sections,
-                             os.path.join(output_folder_path, 'WH_An_Contents.xml'),
-                             WH_AnalysisTableSection.part_dur,
-                             None)
 
+class _SectionTotalsSink(Sink):
+    """Classifies rows into analysis sections and keeps the section totals
+    without creating any XML."""
 
-    def create_contents(self, table_sections: dict,
-                        output_file_path: str,
-                        part_dur: timedelta,
-                        part_aat: Optional[timedelta]):
+    def __init__(self, sheet_title: str):
+        self.chamber = sheet_title == CH_SHEET_TITLE
 
-        # create XML element for the contents table
-        contents_table = id_table(
-            [('Part ', 50), ('Contents', 200), ('Duration', 45), ('After appointed time', 45)],
-            table_class=Contents_Table
-        )
+        self.totals: dict[str, WH_SectionTotal]
+        if self.chamber:
+            parents = {num: SudoTableSection(title) for num, title in CH_PARENT_TITLES.items()}
+            self.totals = {key: CH_SectionTotal(title, parents.get(parent))
+                           for key, title, _, parent in CH_SECTIONS}
+        else:
+            parents = {num: SudoTableSection(title) for num, title in WH_PARENT_TITLES.items()}
+            self.totals = {key: WH_SectionTotal(title, parents.get(parent))
+                           for key, title, _, parent in WH_SECTIONS}
+
+    def add(self, c: int, entry: WHRow, section_keys: Sequence[str]):
+        for key in section_keys:
+            if self.chamber:
+                self.totals[key].add(entry.duration, entry.aat)  # type: ignore
+            else:
+                self.totals[key].add(entry.duration)
+
+    def finish(self):
+        pass
+
+
+class ContentsSink(_SectionTotalsSink):
+    """The table of contents for the House or Westminster Hall analysis."""
+
+    def __init__(self, sd: Sessional_Diary, sheet_title: str, output_file_path: str):
+        super().__init__(sheet_title)
+        self.sd = sd
+        self.output_file_path = output_file_path
+
+    def finish(self):
+        self.sd.create_contents(self.totals, self.output_file_path)
+
+
+class TotalsSink(_SectionTotalsSink):
+    """The session totals and the section totals (as in the table of contents)
+    for the House or Westminster Hall, without creating any XML."""
+
+    def __init__(self, sheet_title: str):
+        super().__init__(sheet_title)
+        self.min_day: Optional[int] = None
+        self.max_day: Optional[int] = None
+        self.session_total_time = timedelta()
+        self.session_total_after_moi = timedelta()
+
+    def add(self, c: int, entry: WHRow, section_keys: Sequence[str]):
+        super().add(c, entry, section_keys)
+        # as in HouseDiarySink the number of days is the largest day number
+        # (less the days before the first, if only some dates are included).
+        # The rows need not be in day order
+        if self.min_day is None or entry.day < self.min_day:
+            self.min_day = entry.day
+        if self.max_day is None or entry.day > self.max_day:
+            self.max_day = entry.day
+        self.session_total_time += entry.duration
+        if self.chamber:
+            self.session_total_after_moi += entry.aat  # type: ignore
+
+    def summary(self) -> dict:
+        sitting_days = 0
+        if self.min_day is not None and self.max_day is not None:
+            sitting_days = self.max_day - self.min_day + 1
+        result: dict = {'sitting_days': sitting_days,
+                        'total_duration': format_timedelta(self.session_total_time)}
+        days = max(sitting_days, 1)
+        result['average_duration'] = format_timedelta(self.session_total_time / days)
+        if self.chamber:
+            result['total_after_appointed_time'] = format_timedelta(
+                self.session_total_after_moi)
+            result['average_after_appointed_time'] = format_timedelta(
+                self.session_total_after_moi / days)
+
+        sections = []
+        for number, title, duration, aat in contents_rows(self.totals):
+            section = {'number': number.rstrip(':'), 'title': title, 'duration': duration}
+            if self.chamber:
+                section['after_appointed_time'] = aat
+            sections.append(section)
+        result['sections'] = sections
+        return result
+
+
+def session_totals(sd: Sessional_Diary, include_chamber=True, include_wh=True) -> dict:
+    """The totals for each sheet, see `TotalsSink`."""
+
+    result = {}
+    for sheet_title, key, included in ((CH_SHEET_TITLE, 'chamber', include_chamber),
+                                       (WH_SHEET_TITLE, 'westminster_hall', include_wh)):
+        if included:
+            sink = TotalsSink(sheet_title)
+            with stage(sd.metrics, sheet_title):
+                sd.process(sheet_title, [sink])
+            result[key] = sink.summary()
+    return result
+
+
+class ExcelSink(_SectionTotalsSink):
+    """The Excel version of the House or Westminster Hall analysis.
+    There is a sheet for each analysis section."""
+
+    def __init__(self, sd: Sessional_Diary, sheet_title: str):
+        super().__init__(sheet_title)
+
+        out_wb = cast(Workbook, sd.out_wb)
+        self.sheets: dict[str, WH_ExcelSheet]
+        if self.chamber:
+            self.sheets = {key: CH_ExcelSheet(title, excel_sheet_title, out_wb)
+                           for key, title, excel_sheet_title, _ in CH_SECTIONS}
+        else:
+            self.sheets = {key: WH_ExcelSheet(title, excel_sheet_title, out_wb)
+                           for key, title, excel_sheet_title, _ in WH_SECTIONS}
+        sd.excel_sheets.extend(self.sheets.values())
 
+    def add(self, c: int, entry: WHRow, section_keys: Sequence[str]):
+        super().add(c, entry, section_keys)
 
-        # I'm not sure we need the part information because I'm not sure it is meaningful
-        # especially for the Chamber
-        # if part_aat:
-        #     part_aat_str = format_timedelta(part_aat)
-        # else:
-        #     part_aat_str = ''
-        # cells = make_id_cells(['Part II',
-        #                        '',
-        #                        format_timedelta(part_dur),
-        #                        part_aat_str],
-        #                       attrib={AID5 + 'cellstyle': 'RightAlign'})
-        # contents_table.add_row(cells)
+        forematted_date = format_date(entry.date)
+        for key in section_keys:
+            if key == 'prayers':
+                # prayers are not itemised
+                continue
+            if self.chamber:
+                self.sheets[key].add_row(chamber_cells(key, entry, forematted_date))  # type: ignore
+            else:
+                self.sheets[key].add_row(wh_cells(entry, forematted_date))
+
+    def finish(self):
+        for key, sheet in self.sheets.items():
+            if sheet.rows == 0 and key != 'prayers':
+                # add empty sections but put nil in.
+                sheet.add_row(['Nil', '', '', ''] if self.chamber else ['Nil', '', ''])
+            total = self.totals[key]
+            if self.chamber:
+                sheet.add_totals(total.duration, total.after_appointed_time)  # type: ignore
+            else:
+                sheet.add_totals(total.duration)
 
 
-        previous_parents = set()
-        for table_section in table_sections.values():
-            if table_section.parent is not None and table_section.parent not in previous_parents:
-                previous_parents.add(table_section.parent)
-
-
-                table_num_dur_formatted = format_timedelta(table_section.parent.total_duration)
-                try:
-                    table_num_aat_formatted = format_timedelta(table_section.parent.total_aat)
-                except AttributeError:
-                    table_num_aat_formatted = ''
-                try:
-                    table_num, title = table_section.parent.title.split('\t')
-                except Exception:
-                    table_num = ''
-                    title = table_section.parent.title
-                cells = make_id_cells([
-                    f'{table_num}',
-                    title,
-                    f'{table_num_dur_formatted}',
-                    f'{table_num_aat_formatted}'
-                ], attrib={AID5 + 'cellstyle': 'RightAlign'})
-                contents_table.add_row(cells)  # type: ignore
-
-                # we do not want it include tables totals more than once
-                try:
-                    if table_num == int(table_section.title.split(":\t")[0]):
-                        continue
-                except Exception:
-                    pass
+class StatsSink(Sink):
+    """Keeps the durations of the rows as columns for the statistics."""
 
-            try:
-                title_num, title = table_section.title.split(":\t")
-            except Exception:
-                title_num = ''
-                title = table_section.title
-            formatted_dur = format_timedelta(table_section.duration)
-            try:
-                formatted_aat = format_timedelta(table_section.after_appointed_time)
-            except AttributeError:
-                formatted_aat = ''
-            # text += f'\n\t{title_number}\t{formatted_dur}\t{formatted_aat}'
-            cells = make_id_cells([
-                f'{title_num}',
-                title,
-                f'{formatted_dur}',
-                f'{formatted_aat}'
-            ], attrib={AID5 + 'cellstyle': 'RightAlign'})
-            contents_table.add_row(cells)  # type: ignore
+    def __init__(self, sheet_title: str):
+        self.chamber = sheet_title == CH_SHEET_TITLE
+        sections = CH_SECTIONS if self.chamber else WH_SECTIONS
+        self.columns = SheetColumns([key for key, *_ in sections],
+                                    [title for _, title, *_ in sections])
+
+    def add(self, c: int, entry: WHRow, section_keys: Sequence[str]):
+        aat = entry.aat if self.chamber else timedelta()  # type: ignore
+        self.columns.add(entry.date, entry.duration, aat, list(section_keys))
+
+    def finish(self):
+        pass
 
-        # print(text)
-        output_root = Element('root')
-        output_root.append(contents_table)
-        etree.ElementTree(output_root).write(output_file_path,
-                                             encoding='UTF-8', xml_declaration=True)
 
 def gui_main():
     from sessional_diary import gui
@@ -1029,19 +1800,121 @@ def gui_main():
 
 def main():
 
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and sys.argv[1] == 'diff':
+        from sessional_diary import diff
+        diff.main(sys.argv[2:])
+
+    elif len(sys.argv) > 1 and sys.argv[1] == 'timeline':
+        from sessional_diary import timeline
+        timeline.main(sys.argv[2:])
+
+    elif len(sys.argv) > 1 and sys.argv[1] == 'index':
+        from sessional_diary import search
+        search.index_main(sys.argv[2:])
+
+    elif len(sys.argv) > 1 and sys.argv[1] == 'search':
+        from sessional_diary import search
+        search.main(sys.argv[2:])
+
+    elif len(sys.argv) > 1:
         # do cmd line version
         parser = argparse.ArgumentParser(
             description='Process Sessional diary Excel and create XML for InDesign')
 
-        parser.add_argument('input', metavar='input_file', type=open,
+        parser.add_argument('input', metavar='input_file', type=existing_path, nargs='+',
                             help='File path to the Excel file you wish to process. '
-                                 'If there are spaces in the path you must use quotes.')
+                                 'If there are spaces in the path you must use quotes. '
+                                 'Alternatively the Chamber and Westminster Hall sheets '
+                                 'as CSV files (e.g. Chamber.csv "Westminster Hall.csv") '
+                                 'or a folder containing them.')
 
         parser.add_argument('--no-excel',
                             action='store_true',
                             help='Use this flag if you want do not want to output an excel file.')
 
+        parser.add_argument('--idml',
+                            action='store_true',
+                            help='Also create finished InDesign (IDML) files from the '
+                                 'templates, with the tables already in them.')
+
+        parser.add_argument('--tagged-text',
+                            action='store_true',
+                            help='Also save each table as InDesign Tagged Text (e.g. '
+                                 'House_Diary.txt), which can be placed straight into a '
+                                 'text frame instead of importing the XML.')
+
+        parser.add_argument('--icml',
+                            action='store_true',
+                            help='Also save each table as an InCopy (ICML) story (e.g. '
+                                 'House_Diary.icml), which can be placed as a link and '
+                                 'updated in InDesign when it changes.')
+
+        parser.add_argument('--no-cache',
+                            action='store_true',
+                            help='Always recreate the output files rather than reusing '
+                                 'cached output from a previous run on the same input.')
+
+        parser.add_argument('--stats',
+                            action='store_true',
+                            help=f'Also create {STATS_FILE} with statistics about the '
+                                 'sittings (and add them to the Excel file). '
+                                 'Requires NumPy.')
+
+        parser.add_argument('--diagnostics',
+                            metavar='json_file',
+                            help='Save the problems found in the Excel file '
+                                 '(e.g. rows that have been skipped) to this JSON file.')
+
+        parser.add_argument('--classification',
+                            metavar='json_file',
+                            help='Save a report of how the rows were classified into the '
+                                 'analysis sections to this JSON file: the rows in each '
+                                 'section, the rows in more than one and the subjects '
+                                 'in none.')
+
+        parser.add_argument('--derive-durations',
+                            action='store_true',
+                            help='Work out empty Duration cells from the Time column (the '
+                                 'time until the next item), e.g. if the Excel file was '
+                                 'saved by a program that does not recalculate formulas. '
+                                 'Durations that differ from this are listed. '
+                                 'Requires NumPy.')
+
+        parser.add_argument('--metrics-file',
+                            metavar='prom_file',
+                            help='Save metrics about the run (how long each stage took, '
+                                 'rows read and skipped, output sizes etc.) to this file '
+                                 'in the Prometheus text format, e.g. for the textfile '
+                                 'collector of node_exporter.')
+
+        parser.add_argument('--outputs',
+                            metavar='FILES',
+                            help='Comma separated list of the output files to create, '
+                                 'e.g. House_Analysis,WH_diary. Only the work needed for '
+                                 'these files is done. Choose from: '
+                                 + ', '.join(OUTPUT_DEPENDENCIES))
+
+        parser.add_argument('--chunk',
+                            metavar='BY', type=chunk_option,
+                            help='Also split each diary and analysis table into smaller '
+                                 'tables (in files of their own), which InDesign imports '
+                                 'much faster. BY is "month" or a number of sitting days '
+                                 'for the diaries. The analyses are split by part.')
+
+        parser.add_argument('--totals',
+                            action='store_true',
+                            help='Just print the session and section totals as JSON. '
+                                 'No files are created, so this is much quicker.')
+
+        parser.add_argument('--from',
+                            metavar='DATE', dest='date_from', type=date.fromisoformat,
+                            help='Only include the sitting days from this date, '
+                                 'e.g. 2024-09-03. The output goes in a Preview folder.')
+
+        parser.add_argument('--to',
+                            metavar='DATE', dest='date_to', type=date.fromisoformat,
+                            help='Only include the sitting days up to this date.')
+
         parser.add_argument('--include-only',
                             type=str,
                             choices=['chamber', 'wh'],
@@ -1051,12 +1924,43 @@ def main():
 
         args = parser.parse_args(sys.argv[1:])
 
+        use_cache = not args.no_cache
+
+        input_path = args.input[0] if len(args.input) == 1 else args.input
+        if len(args.input) > 1 and not is_csv_input(args.input):
+            parser.error('Only one Excel file can be processed at a time.')
+
+        outputs = None
+        if args.outputs:
+            try:
+                outputs = [output_name(name) for name in args.outputs.split(',') if name.strip()]
+            except ValueError as e:
+                parser.error(str(e))
+
         if args.include_only == 'chamber':
-            run(args.input.name, include_wh=False, no_excel=args.no_excel)
+            run(input_path, include_wh=False, no_excel=args.no_excel, use_cache=use_cache,
+                idml=args.idml, diagnostics_file=args.diagnostics, stats=args.stats,
+                outputs=outputs, chunk_by=args.chunk, totals=args.totals,
+                date_from=args.date_from, date_to=args.date_to,
+                classification_file=args.classification,
+                derive_durations=args.derive_durations, tagged_text=args.tagged_text,
+                icml=args.icml, metrics_file=args.metrics_file)
         elif args.include_only == 'wh':
-            run(args.input.name, include_chamber=False, no_excel=args.no_excel)
+            run(input_path, include_chamber=False, no_excel=args.no_excel,
+                use_cache=use_cache, idml=args.idml, diagnostics_file=args.diagnostics,
+                stats=args.stats, outputs=outputs, chunk_by=args.chunk,
+                totals=args.totals, date_from=args.date_from, date_to=args.date_to,
+                classification_file=args.classification,
+                derive_durations=args.derive_durations, tagged_text=args.tagged_text,
+                icml=args.icml, metrics_file=args.metrics_file)
         else:
-            run(args.input.name, no_excel=args.no_excel)
+            run(input_path, no_excel=args.no_excel, use_cache=use_cache, idml=args.idml,
+                diagnostics_file=args.diagnostics, stats=args.stats,
+                outputs=outputs, chunk_by=args.chunk, totals=args.totals,
+                date_from=args.date_from, date_to=args.date_to,
+                classification_file=args.classification,
+                derive_durations=args.derive_durations, tagged_text=args.tagged_text,
+                icml=args.icml, metrics_file=args.metrics_file)
 
     else:
         # run the GUI version
@@ -1064,35 +1968,390 @@ def main():
         gui.mainloop(run_callback=run)
 
 
-def run(excel_file_path: str,
+def plan_outputs(include_chamber=True,
+                 include_wh=True,
+                 no_excel=False,
+                 idml=False,
+                 stats=False,
+                 outputs: Optional[Sequence[str]] = None,
+                 tagged_text=False,
+                 icml=False) -> tuple[list[str], set[str], bool]:
+    """The names of the output files to create, everything they need (see
+    `required_stages`) and whether the statistics can be created."""
+
+    if outputs is not None:
+        stats = STATS_FILE in outputs
+
+    if stats and not numpy_available():
+        print('NumPy is needed for the statistics but is not installed. '
+              'Install it with `pip install numpy`. Continuing without statistics.')
+        stats = False
+
+    if outputs is None:
+        output_names = expected_outputs(include_chamber, include_wh, no_excel, idml, stats,
+                                        tagged_text, icml)
+    else:
+        output_names = [name for name in outputs if stats or name != STATS_FILE]
+
+    # only the sheets included are read (apart from the chamber day index)
+    sheets = set()
+    if include_chamber:
+        sheets.add(CH_SHEET_TITLE)
+    if include_wh:
+        sheets.add(WH_SHEET_TITLE)
+    return output_names, required_stages(output_names, sheets), stats
+
+
+def create_outputs(sd: Sessional_Diary, output_names: Sequence[str], required: set[str],
+                   stats=False, output_folder_path: str = ''):
+    """Create the output files in `output_names` (and `required` for them)
+    from the input of `sd`. They end up in `sd.outputs` (and on disk if
+    `sd.write_files`). Any error writing them is raised before returning."""
+
+    sd.requested = set(output_names)
+
+    try:
+        ch_stats: Optional[StatsSink] = None
+        wh_stats: Optional[StatsSink] = None
+
+        # each sheet is only read once, every row being passed to all the
+        # outputs (sinks) made from that sheet
+        if CH_SHEET_TITLE in required:
+            sinks: list[Sink] = []
+            if HOUSE_DIARY_FILE in required:
+                sinks.append(HouseDiarySink(sd, output_folder_path))
+            if HOUSE_ANALYSIS_FILE in required:
+                sinks.append(HouseAnalysisSink(sd, output_folder_path))
+            if HOUSE_CONTENTS_FILE in required:
+                sinks.append(ContentsSink(sd, CH_SHEET_TITLE,
+                                          os.path.join(output_folder_path, HOUSE_CONTENTS_FILE)))
+            if sd.out_wb is not None:
+                sinks.append(ExcelSink(sd, CH_SHEET_TITLE))
+            if stats:
+                ch_stats = StatsSink(CH_SHEET_TITLE)
+                sinks.append(ch_stats)
+            if DAY_INDEX in required:
+                sinks.append(DayIndexSink(sd))
+            with stage(sd.metrics, CH_SHEET_TITLE):
+                sd.process(CH_SHEET_TITLE, sinks)
+
+        elif DAY_INDEX in required:
+            # the chamber sheet is not otherwise needed so just read the dates
+            with stage(sd.metrics, DAY_INDEX):
+                sd.chamber_day_index()
+
+        if WH_SHEET_TITLE in required:
+            sinks = []
+            if WH_DIARY_FILE in required:
+                sinks.append(WHDiarySink(sd, output_folder_path))
+            if WH_ANALYSIS_FILE in required:
+                sinks.append(WHAnalysisSink(sd, output_folder_path))
+            if WH_CONTENTS_FILE in required:
+                sinks.append(ContentsSink(sd, WH_SHEET_TITLE,
+                                          os.path.join(output_folder_path, WH_CONTENTS_FILE)))
+            if sd.out_wb is not None:
+                sinks.append(ExcelSink(sd, WH_SHEET_TITLE))
+            if stats:
+                wh_stats = StatsSink(WH_SHEET_TITLE)
+                sinks.append(wh_stats)
+            with stage(sd.metrics, WH_SHEET_TITLE):
+                sd.process(WH_SHEET_TITLE, sinks)
+
+        if stats:
+            with stage(sd.metrics, 'statistics'):
+                sitting_stats = statistics(ch_stats.columns if ch_stats else None,
+                                           wh_stats.columns if wh_stats else None)
+                sd.save_output(os.path.join(output_folder_path, STATS_FILE),
+                               statistics_to_bytes(sitting_stats))
+                if sd.out_wb is not None:
+                    add_statistics_sheet(sd.out_wb, sitting_stats)
+
+        # remove the default sheet
+        if sd.out_wb is not None:
+            del sd.out_wb['Sheet']
+            # the analysis sheets are created separately (in parallel if large)
+            with stage(sd.metrics, 'excel'):
+                worksheets = render_worksheets(sd.excel_sheets, StyleIds(sd.out_wb))
+            sd.save_output(os.path.join(output_folder_path, EXCEL_FILE),
+                           partial(workbook_to_bytes, sd.out_wb, worksheets))
+
+        idml_names = [name for name in output_names if name.endswith('.idml')]
+        if idml_names:
+            # put the tables straight into the InDesign templates
+            with stage(sd.metrics, 'idml'):
+                xml_outputs = {name: sd.output(name) for name in sd.output_names()
+                               if name.endswith('.xml')}
+                for name, data in create_idml_files(xml_outputs).items():
+                    if name in idml_names:
+                        sd.save_output(os.path.join(output_folder_path, name), data)
+
+    except BaseException:
+        # don't hide the original error behind one from the writer
+        sd.writer.abandon()
+        raise
+
+    # wait for the output files to be written, raising any error
+    with stage(sd.metrics, 'write'):
+        sd.writer.close()
+
+
+def run(excel_file_path: Union[str, Sequence[str]],
         output_folder_path: str = '',
         include_chamber=True,
         include_wh=True,
-        no_excel=False):
+        no_excel=False,
+        use_cache=True,
+        idml=False,
+        diagnostics_file: Optional[str] = None,
+        stats=False,
+        outputs: Optional[Sequence[str]] = None,
+        chunk_by: Optional[Union[str, int]] = None,
+        totals=False,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        classification_file: Optional[str] = None,
+        derive_durations=False,
+        tagged_text=False,
+        icml=False,
+        metrics_file: Optional[str] = None):
+    """Create the output files. By default which files are created depends on
+    the other options, `outputs` is a list of the names of the files to
+    create instead (see `OUTPUT_DEPENDENCIES`).
+
+    `chunk_by` also splits each diary and analysis table into smaller tables,
+    in files of their own. The diaries are split by 'month' or by a number of
+    sitting days, the analyses by part.
+
+    With `totals` no files are created, the session and section totals are
+    printed as JSON instead.
+
+    `date_from` and/or `date_to` create a preview of just the sitting days in
+    that range, in a Preview folder. The session totals in the diaries are
+    still those for the whole session so far.
+
+    `classification_file` is where to save the classification report (see
+    classification.py) as JSON.
+
+    With `derive_durations` empty Duration cells are worked out from the Time
+    column (see durations.py).
+
+    With `tagged_text` each table is also saved as InDesign Tagged Text (see
+    tagged_text.py), with `icml` as an InCopy story (see icml.py).
+
+    `metrics_file` is where to save metrics about the run (e.g. how long each
+    stage took) in the Prometheus text format (see metrics.py).
+
+    To create the output files in memory instead, see api.generate"""
+
+    metrics = RunMetrics() if metrics_file else None
+
+    date_range = None
+    if date_from is not None or date_to is not None:
+        date_range = (date_from or date.min, date_to or date.max)
+
+    if totals:
+        # just the parsing and classification, no XML or Excel
+        with stage(metrics, 'open'):
+            sd = Sessional_Diary(excel_file_path, no_excel=True, write_files=False)
+        sd.date_range = date_range
+        sd.derive_durations = derive_durations
+        sd.metrics = metrics
+        if classification_file:
+            sd.classification = ClassificationReport()
+        print(json.dumps(session_totals(sd, include_chamber, include_wh),
+                         indent=2, ensure_ascii=False))
+        # so the JSON can be piped to another program
+        sd.diagnostics.print_summary(file=sys.stderr)
+        sd.diagnostics.save_json(diagnostics_file)
+        if sd.classification is not None:
+            sd.classification.save_json(classification_file)
+        if metrics is not None:
+            metrics.add_diagnostics(sd.diagnostics)
+            metrics.save(metrics_file)
+        return
+
+    # Excel file or CSV files (see csv_input.py)
+    input_files = [excel_file_path] if isinstance(excel_file_path, str) else excel_file_path
+    csv_input = is_csv_input(excel_file_path)
+    if csv_input:
+        input_files = [str(p) for p in csv_files(input_files)]
 
     if not output_folder_path:
-        output_folder_path = os.path.dirname(excel_file_path)
-
-    sd = Sessional_Diary(excel_file_path, no_excel)
-
+        if os.path.isdir(excel_file_path if isinstance(excel_file_path, str) else ''):
+            output_folder_path = cast(str, excel_file_path)
+        else:
+            output_folder_path = os.path.dirname(input_files[0])
+
+    output_names, required, stats = plan_outputs(include_chamber, include_wh, no_excel,
+                                                 idml, stats, outputs, tagged_text,
+                                                 icml)
+
+    if date_range is not None:
+        # keep the preview apart from the output for the whole session
+        output_folder_path = os.path.join(output_folder_path, PREVIEW_FOLDER)
+        os.makedirs(output_folder_path, exist_ok=True)
+        use_cache = False
+
+    cache: Optional[OutputCache] = None
+    cache_keys: dict[str, str] = {}
+    counts_key = ''
+    if use_cache:
+        cache = OutputCache()
+        with stage(metrics, 'hash input'):
+            input_hash = files_sha256(input_files) if csv_input else file_sha256(input_files[0])
+        options = {'include_chamber': include_chamber,
+                   'include_wh': include_wh,
+                   'no_excel': no_excel,
+                   'idml': idml,
+                   'stats': stats,
+                   'derive_durations': derive_durations,
+                   'tagged_text': tagged_text,
+                   'icml': icml,
+                   'outputs': sorted(outputs) if outputs is not None else None}
+        cache_keys = {name: cache.key(input_hash, name, options) for name in output_names}
+        cached_outputs = {name: cache.get(key, name) for name, key in cache_keys.items()}
+        cached_counts = None
+        if metrics is not None:
+            metrics.cache_hits = sum(data is not None for data in cached_outputs.values())
+            metrics.cache_misses = len(cached_outputs) - metrics.cache_hits
+            # the metrics of the input are cached like an output
+            counts_key = cache.key(input_hash, COUNTS_CACHE_NAME, options)
+            cached_counts = cache.get(counts_key, COUNTS_CACHE_NAME)
+        # with diagnostics_file (or classification_file) the input has to be read
+        # to find the problems in it and with chunk_by the tables are needed to
+        # make the chunks
+        if (not diagnostics_file and not classification_file and not chunk_by
+                and all(data is not None for data in cached_outputs.values())
+                and (metrics is None or cached_counts is not None)):
+            # nothing to compute, just make sure the files on disk are up to date
+            print('The input has not changed since it was last processed. '
+                  'Using the cached output.')
+            for name, data in cached_outputs.items():
+                write_if_changed(os.path.join(output_folder_path, name), cast(bytes, data))
+            if metrics is not None:
+                metrics.load_input_counts(cast(bytes, cached_counts))
+                metrics.output_bytes = {name: len(cast(bytes, data))
+                                        for name, data in cached_outputs.items()}
+                metrics.save(metrics_file)
+            return
+
+    with stage(metrics, 'open'):
+        sd = Sessional_Diary(excel_file_path, no_excel=EXCEL_FILE not in required)
+    sd.chunk_by = chunk_by
+    sd.date_range = date_range
+    sd.derive_durations = derive_durations
+    sd.metrics = metrics
+    if classification_file:
+        sd.classification = ClassificationReport()
+    create_outputs(sd, output_names, required, stats, output_folder_path)
+
+    if cache is not None:
+        for name, key in cache_keys.items():
+            if name in sd.outputs:
+                cache.put(key, name, sd.outputs[name])
+
+    # so that only the links to these need updating in InDesign
+    icml_names = sorted(name for name in sd.requested or () if name.endswith('.icml'))
+    if icml_names:
+        changed = [name for name in icml_names if name in sd.written]
+        if changed:
+            print(f'ICML stories changed: {", ".join(changed)}')
+        else:
+            print('No ICML stories have changed.')
+
+    # only now report any problems with the input
+    sd.diagnostics.print_summary()
+    sd.diagnostics.save_json(diagnostics_file)
+    if sd.classification is not None:
+        sd.classification.save_json(classification_file)
+    if metrics is not None:
+        metrics.output_bytes = {name: len(data) for name, data in sd.outputs.items()
+                                if sd.requested is None or name in sd.requested}
+        metrics.add_diagnostics(sd.diagnostics)
+        metrics.save(metrics_file)
+        if cache is not None:
+            cache.put(counts_key, COUNTS_CACHE_NAME, metrics.input_counts())
+
+
+def chunk_option(value: str) -> Union[str, int]:
+    """argparse type for --chunk, 'month' or a number of sitting days."""
+    if value.lower() == 'month':
+        return 'month'
+    try:
+        days = int(value)
+    except ValueError:
+        days = 0
+    if days < 1:
+        raise argparse.ArgumentTypeError(
+            f'{value!r} is not "month" or a number of sitting days')
+    return days
+
+
+def existing_path(path: str) -> str:
+    """argparse type for an input file or folder."""
+    if not os.path.exists(path):
+        raise argparse.ArgumentTypeError(f"can't open '{path}': No such file or directory")
+    return path
+
+
+def required_stages(output_names: Iterable[str], sheets: set[str]) -> set[str]:
+    """The output files and everything they are made from, following
+    `OUTPUT_DEPENDENCIES`. Sheets not in `sheets` are left out."""
+
+    required: set[str] = set()
+    to_visit = list(output_names)
+    while to_visit:
+        name = to_visit.pop()
+        if name in required:
+            continue
+        if name in (CH_SHEET_TITLE, WH_SHEET_TITLE) and name not in sheets:
+            continue
+        required.add(name)
+        to_visit.extend(OUTPUT_DEPENDENCIES.get(name, []))
+    return required
+
+
+def output_name(name: str) -> str:
+    """The full name of an output file from e.g. 'House_Analysis'."""
+
+    # e.g. 'House_Diary' is the XML file rather than the Tagged Text or ICML one
+    names: dict[str, str] = {}
+    for known in OUTPUT_DEPENDENCIES:
+        names.setdefault(os.path.splitext(known)[0].lower(), known)
+    name = name.strip()
+    if name in OUTPUT_DEPENDENCIES:
+        return name
+    for known in OUTPUT_DEPENDENCIES:
+        if known.lower() == name.lower():
+            return known
+    if os.path.splitext(name)[0].lower() in names:
+        return names[os.path.splitext(name)[0].lower()]
+    raise ValueError(f'Unknown output "{name}". Choose from: {", ".join(OUTPUT_DEPENDENCIES)}')
+
+
+def expected_outputs(include_chamber=True, include_wh=True, no_excel=False,
+                     idml=False, stats=False, tagged_text=False, icml=False) -> list[str]:
+    """Names of the files that `run` will create with these options."""
+
+    names = []
     if include_chamber:
-        # create house diary
-        sd.house_diary(output_folder_path)
-
-        # create house analysis
-        sd.house_analysis(output_folder_path)
-
+        names += [HOUSE_DIARY_FILE, HOUSE_ANALYSIS_FILE, HOUSE_CONTENTS_FILE]
     if include_wh:
-        # crete Westminster hall diary
-        sd.wh_diary(output_folder_path)
-
-        # create Westminster hall analysis
-        sd.wh_analysis(output_folder_path)
-
-    # remove the default sheet
-    if Excel.out_wb is not None:
-        del Excel.out_wb['Sheet']
-        Excel.out_wb.save(filename=os.path.join(output_folder_path, 'Analysis.xlsx'))
+        names += [WH_DIARY_FILE, WH_ANALYSIS_FILE, WH_CONTENTS_FILE]
+    if not no_excel:
+        names.append(EXCEL_FILE)
+    if stats:
+        names.append(STATS_FILE)
+    if idml:
+        names += [idml_file_name(template_name)
+                  for template_name, xml_names in TEMPLATE_TABLES.items()
+                  if set(xml_names) & set(names)]
+    xml_names = [name for name in names if name.endswith('.xml')]
+    if tagged_text:
+        names += [tagged_text_file_name(name) for name in xml_names]
+    if icml:
+        names += [icml_file_name(name) for name in xml_names]
+    return names
 
 
 def id_table(list_of_tuples: list[tuple[str, int]],
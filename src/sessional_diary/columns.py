@@ -0,0 +1,153 @@
+"""A column store in shared memory, for handing rows to worker processes.
+
+Sending rows to a pool of processes means pickling them for every worker,
+which can take as long as the work being handed out. Instead the rows are
+written once into a block of shared memory (see multiprocessing.shared_memory)
+as typed columns: numbers as arrays of 64 bit integers and strings as codes
+into one table of the distinct strings, stored as UTF-8. A worker is only sent
+the small `ColumnsLayout`, attaches to the block by name and reads the numbers
+where they are, without copying them.
+
+The process that creates the block removes it when it is done with it, even if
+there is an error. Workers only close their view of it. If the creating
+process is killed multiprocessing's resource tracker removes the block.
+"""
+
+from array import array
+from itertools import accumulate
+from multiprocessing import shared_memory
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+TYPECODE = 'q'
+ITEM_SIZE = array(TYPECODE).itemsize
+
+
+class ColumnsLayout(NamedTuple):
+    """Where everything is in the shared memory block called `name`."""
+    name: str
+    # column name -> (offset in bytes, number of items)
+    columns: dict[str, tuple[int, int]]
+    # the columns holding string codes
+    string_columns: frozenset[str]
+    # the string table: the offsets of the strings (one more than there are
+    # strings) and of their UTF-8 data
+    string_offsets: tuple[int, int]
+    string_data: int
+
+
+class SharedColumns:
+    """Columns of integers and strings in shared memory. Make them with
+    `create` and, in the workers, `attach` to them. Use as a context manager:
+    on exit a worker closes its view of the memory and the creator also
+    removes it."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, layout: ColumnsLayout,
+                 owner: bool):
+        self._shm = shm
+        self.layout = layout
+        self._owner = owner
+        self._views: list[memoryview] = []
+        self._offsets: Optional[memoryview] = None
+        self._strings: dict[int, str] = {}
+
+    @classmethod
+    def create(cls, columns: dict[str, Iterable[int]],
+               string_columns: Optional[dict[str, Iterable[str]]] = None) -> 'SharedColumns':
+        """Columns of integers and of strings (stored as codes into the
+        string table) in a new block of shared memory."""
+
+        arrays = {name: array(TYPECODE, values) for name, values in columns.items()}
+        codes: dict[str, int] = {}
+        for name, values in (string_columns or {}).items():
+            if name in arrays:
+                raise ValueError(f'column {name!r} given twice')
+            arrays[name] = array(TYPECODE, (codes.setdefault(value, len(codes))
+                                            for value in values))
+
+        encoded = [value.encode('UTF-8') for value in codes]
+        offsets = array(TYPECODE, accumulate(map(len, encoded), initial=0))
+
+        layout_columns: dict[str, tuple[int, int]] = {}
+        position = 0
+        for name, values in arrays.items():
+            layout_columns[name] = (position, len(values))
+            position += len(values) * ITEM_SIZE
+        offsets_position = position
+        position += len(offsets) * ITEM_SIZE
+        data_position = position
+        position += offsets[-1]
+
+        # a block can't be empty
+        shm = shared_memory.SharedMemory(create=True, size=max(position, 1))
+        try:
+            buf = shm.buf
+            for name, values in arrays.items():
+                start = layout_columns[name][0]
+                buf[start:start + len(values) * ITEM_SIZE] = memoryview(values).cast('B')
+            buf[offsets_position:data_position] = memoryview(offsets).cast('B')
+            buf[data_position:position] = b''.join(encoded)
+            del buf
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+
+        layout = ColumnsLayout(shm.name, layout_columns,
+                               frozenset(string_columns or ()),
+                               (offsets_position, len(offsets)), data_position)
+        return cls(shm, layout, owner=True)
+
+    @classmethod
+    def attach(cls, layout: ColumnsLayout) -> 'SharedColumns':
+        """The columns made (by `create`) in another process."""
+        return cls(shared_memory.SharedMemory(name=layout.name), layout, owner=False)
+
+    def column(self, name: str) -> memoryview:
+        """The integers (or string codes) in a column, read in place. Don't
+        keep the view, or slices of it, after closing the columns."""
+
+        start, length = self.layout.columns[name]
+        view = self._shm.buf[start:start + length * ITEM_SIZE].cast(TYPECODE)
+        self._views.append(view)
+        return view
+
+    def string(self, code: int) -> str:
+        """The string for a code in a string column."""
+
+        value = self._strings.get(code)
+        if value is None:
+            if self._offsets is None:
+                start, length = self.layout.string_offsets
+                self._offsets = self._shm.buf[start:start + length * ITEM_SIZE].cast(TYPECODE)
+            data = self.layout.string_data
+            value = str(self._shm.buf[data + self._offsets[code]:data + self._offsets[code + 1]],
+                        'UTF-8')
+            self._strings[code] = value
+        return value
+
+    def strings(self, name: str) -> Sequence[str]:
+        """The strings in a string column."""
+        if name not in self.layout.string_columns:
+            raise ValueError(f'{name!r} is not a string column')
+        return [self.string(code) for code in self.column(name)]
+
+    def close(self) -> None:
+        """Stop using the columns, and remove them if this process made them."""
+
+        # the memory can't be closed while there are views of it
+        if self._offsets is not None:
+            self._views.append(self._offsets)
+            self._offsets = None
+        for view in self._views:
+            view.release()
+        self._views.clear()
+        self._shm.close()
+        if self._owner:
+            self._owner = False
+            self._shm.unlink()
+
+    def __enter__(self) -> 'SharedColumns':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
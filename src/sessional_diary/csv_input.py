@@ -0,0 +1,192 @@
+"""Read the Chamber and Westminster Hall sheets from CSV files instead of xlsx.
+
+CSV is much quicker to read than xlsx. `CsvWorkbook` provides the small part of
+the openpyxl (read only) workbook interface that `Sessional_Diary` uses, so the
+rows are parsed into the same CHRow/WHRow records as rows from an Excel file.
+The day, date, time and duration columns are converted to the same types that
+openpyxl would give.
+"""
+
+import csv
+import os
+from datetime import datetime, time
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, Sequence, Union
+
+from openpyxl.utils import get_column_letter
+
+# the CSV file names (without the extension, ignoring case, spaces and
+# underscores) that are recognised as each sheet
+SHEET_FILE_NAMES = {
+    'chamber': 'Chamber',
+    'westminsterhall': 'Westminster Hall',
+    'wh': 'Westminster Hall',
+}
+
+
+def parse_int(text: str) -> Union[int, str]:
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+def parse_date(text: str) -> Union[datetime, str]:
+    """e.g. 2024-09-03, 2024-09-03 00:00:00 or 03/09/2024"""
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(text, '%d/%m/%Y')
+    except ValueError:
+        return text
+
+
+def parse_time(text: str) -> Union[time, datetime, str]:
+    """e.g. 9:30, 14:30:00, 14.30 or a date and time"""
+    parts = text.replace('.', ':').split(':')
+    if 2 <= len(parts) <= 3 and all(part.isdigit() for part in parts):
+        try:
+            return time(*map(int, parts))
+        except ValueError:
+            return text
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def column_parser(heading: Any) -> Optional[Callable[[str], Any]]:
+    # imported here as cli.py imports this module
+    from sessional_diary.cli import AAT, DATE, DAY, DURATION, TIME
+
+    return {DAY: parse_int,
+            DATE: parse_date,
+            TIME: parse_time,
+            DURATION: parse_time,
+            AAT: parse_time}.get(heading)
+
+
+class CsvCell:
+    """Stands in for an openpyxl cell."""
+
+    __slots__ = ('value', 'row', 'column')
+
+    def __init__(self, value: Any, row: int, column: int):
+        self.value = value
+        self.row = row
+        self.column = column
+
+    @property
+    def coordinate(self) -> str:
+        return f'{get_column_letter(self.column)}{self.row}'
+
+
+class CsvSheet:
+    """Stands in for an openpyxl (read only) worksheet."""
+
+    def __init__(self, title: str, file_path: Union[str, Path]):
+        self.title = title
+        self.file_path = file_path
+
+        with open(self.file_path, newline='', encoding='utf-8-sig') as f:
+            headings = next(csv.reader(f), [])
+        self.headings = [heading.strip() for heading in headings]
+        self.parsers = [column_parser(heading) for heading in self.headings]
+
+    def _rows(self) -> Iterator[list[str]]:
+        with open(self.file_path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.reader(f)
+
+    def __getitem__(self, row_number: int) -> list[CsvCell]:
+        for row in self.iter_rows(min_row=row_number):
+            return list(row)
+        return []
+
+    def _values(self, row: list[str], first: int, last: int) -> list[Any]:
+        values: list[Any] = []
+        for c in range(first, last):
+            text = row[c].strip() if c < len(row) else ''
+            if not text:
+                values.append(None)
+                continue
+            parser = self.parsers[c] if c < len(self.parsers) else None
+            values.append(parser(text) if parser else text)
+        return values
+
+    def iter_rows(self, min_row: int = 1, max_row: Optional[int] = None,
+                  min_col: Optional[int] = None, max_col: Optional[int] = None,
+                  values_only: bool = False) -> Iterator[Sequence]:
+        first = (min_col or 1) - 1
+        last = max_col or len(self.headings)
+
+        for r, row in enumerate(self._rows(), start=1):
+            if r < min_row:
+                continue
+            if max_row is not None and r > max_row:
+                break
+            if r == 1:
+                values: list[Any] = list(self.headings[first:last])
+            else:
+                values = self._values(row, first, last)
+            if values_only:
+                yield tuple(values)
+            else:
+                yield [CsvCell(value, r, c) for c, value in enumerate(values, start=first + 1)]
+
+
+class CsvWorkbook:
+    """Stands in for an openpyxl (read only) workbook made from CSV files."""
+
+    def __init__(self, sheet_files: dict[str, Union[str, Path]]):
+        self.sheets = {title: CsvSheet(title, path) for title, path in sheet_files.items()}
+
+    @property
+    def sheetnames(self) -> list[str]:
+        return list(self.sheets)
+
+    def __getitem__(self, title: str) -> CsvSheet:
+        return self.sheets[title]
+
+
+def sheet_title_for(file_path: Union[str, Path]) -> Optional[str]:
+    name = Path(file_path).stem.lower().replace(' ', '').replace('_', '').replace('-', '')
+    return SHEET_FILE_NAMES.get(name)
+
+
+def csv_files(paths: Sequence[Union[str, Path]]) -> list[Path]:
+    """The CSV files in paths, which may be CSV files or directories of them."""
+
+    files: list[Path] = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files.extend(sorted(p for p in path.iterdir() if p.suffix.lower() == '.csv'))
+        else:
+            files.append(path)
+    return files
+
+
+def is_csv_input(paths: Union[str, Sequence[str]]) -> bool:
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]  # type: ignore
+    return any(Path(p).is_dir() or Path(p).suffix.lower() == '.csv' for p in paths)
+
+
+def load_csv_workbook(paths: Union[str, Sequence[str]]) -> CsvWorkbook:
+    """A workbook from CSV files (or directories of them) named after the sheets,
+    e.g. Chamber.csv and Westminster Hall.csv"""
+
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]  # type: ignore
+
+    sheet_files: dict[str, Path] = {}
+    for file_path in csv_files(paths):
+        title = sheet_title_for(file_path)
+        if title is None:
+            print(f'Ignoring {file_path}. CSV files should be named after the sheet, '
+                  'e.g. Chamber.csv or Westminster Hall.csv')
+            continue
+        sheet_files[title] = file_path
+    return CsvWorkbook(sheet_files)
@@ -0,0 +1,103 @@
+"""Problems found in the input Excel file.
+
+Rather than printing a message for every problem as the rows are read (which on
+a messy workbook floods the console and slows the run) the problems are
+collected here and a summary is shown at the end. They can also be saved as
+JSON so they can be checked by other tools.
+"""
+
+import json
+from typing import Any, NamedTuple, Optional, TextIO
+
+# categories of diagnostic
+INVALID_DAY = 'invalid-day'
+INVALID_DATE = 'invalid-date'
+INVALID_TIME = 'invalid-time'
+INVALID_DURATION = 'invalid-duration'
+DATETIME_CONVERTED = 'datetime-converted'
+SKIPPED_ROW = 'skipped-row'
+DURATION_DERIVED = 'duration-derived'
+DURATION_MISMATCH = 'duration-mismatch'
+DURATION_MISSING = 'duration-missing'
+ROW_OUT_OF_ORDER = 'row-out-of-order'
+
+DESCRIPTIONS = {
+    INVALID_DAY: 'Day cells that do not contain a whole number, the rows have been skipped',
+    INVALID_DATE: 'Date cells that do not contain a date, the rows have been skipped',
+    INVALID_TIME: 'Time cells that do not contain a time, the rows have been skipped',
+    INVALID_DURATION: 'Duration and AAT cells that do not contain a time, counted as no time',
+    DATETIME_CONVERTED: 'Cells with a date and time in, only the time has been used',
+    SKIPPED_ROW: 'Rows that have been skipped',
+    DURATION_DERIVED: 'Empty Duration cells worked out from the Time column',
+    DURATION_MISMATCH: 'Duration cells that differ from the time until the next item',
+    DURATION_MISSING: 'Empty Duration cells that could not be worked out (last item of the day)',
+    ROW_OUT_OF_ORDER: 'Rows below a later sitting day, added to their own day',
+}
+
+# the categories for which the row is skipped. Each skipped row has one of these
+SKIPPED_ROW_CATEGORIES = (INVALID_DAY, INVALID_DATE, INVALID_TIME, SKIPPED_ROW)
+
+# how many cells to list for each category in the summary
+EXAMPLES_IN_SUMMARY = 10
+
+
+class Diagnostic(NamedTuple):
+    category: str
+    sheet: str
+    cell: str   # cell coordinate e.g. 'C12', or row number for whole rows
+    value: str  # the value of the cell, as a string
+    message: str = ''
+
+
+class InvalidCell(ValueError):
+    """A row can not be read because of a cell that is already in the
+    diagnostics, so the row is skipped without another diagnostic."""
+
+
+class Diagnostics:
+    """Collects diagnostics in memory. Nothing is printed until `summary`."""
+
+    def __init__(self):
+        self.items: list[Diagnostic] = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, category: str, sheet: str, cell: str, value: Any = None,
+            message: str = '') -> None:
+        self.items.append(Diagnostic(category, sheet, cell,
+                                     '' if value is None else str(value), message))
+
+    def grouped(self) -> dict[tuple[str, str], list[Diagnostic]]:
+        """Diagnostics grouped by (sheet, category), in the order first seen."""
+        groups: dict[tuple[str, str], list[Diagnostic]] = {}
+        for item in self.items:
+            groups.setdefault((item.sheet, item.category), []).append(item)
+        return groups
+
+    def summary(self) -> str:
+        lines = []
+        for (sheet, category), items in self.grouped().items():
+            lines.append(f'{DESCRIPTIONS.get(category, category)} '
+                         f'in the {sheet} sheet: {len(items)}')
+            for item in items[:EXAMPLES_IN_SUMMARY]:
+                detail = item.message or (f'has value {item.value}' if item.value else '')
+                lines.append(f'    {item.cell}\t{detail}'.rstrip())
+            if len(items) > EXAMPLES_IN_SUMMARY:
+                lines.append(f'    ...and {len(items) - EXAMPLES_IN_SUMMARY} more')
+        return '\n'.join(lines)
+
+    def print_summary(self, file: Optional[TextIO] = None) -> None:
+        if self.items:
+            print(self.summary(), file=file)
+
+    def to_json(self) -> str:
+        return json.dumps({'diagnostics': [item._asdict() for item in self.items],
+                           'counts': {f'{sheet}: {category}': len(items)
+                                      for (sheet, category), items in self.grouped().items()}},
+                          indent=2, ensure_ascii=False)
+
+    def save_json(self, file_path: Optional[str]) -> None:
+        if file_path:
+            with open(file_path, 'w', encoding='UTF-8') as f:
+                f.write(self.to_json())
@@ -0,0 +1,222 @@
+"""Render the House and Westminster Hall diary tables, in parallel if large.
+
+Each sitting day of a diary only depends on the days before it through the
+totals for the session shown at the end of the day. These are worked out
+first, as running totals of the days' totals, so every day can be rendered
+on its own. If there are enough rows to make it worthwhile the days are split
+into one run of consecutive days per process, each process renders and
+serialises its days, and the fragments are parsed and added to the table in
+order. The rows are handed to the processes in shared memory (see columns.py)
+rather than pickled for each one. Otherwise the days are added to the table
+here. Either way the table is the same.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, time, timedelta
+from itertools import accumulate
+from typing import Optional, Sequence
+
+from lxml import etree
+from lxml.etree import SubElement
+
+from sessional_diary.columns import ColumnsLayout, SharedColumns
+from sessional_diary.output import process_pool_context
+from sessional_diary.tables import (
+    CH_Diary_Table,
+    CH_DiaryDay_TableSection,
+    TableChunks,
+    WH_Diary_Table,
+    WH_DiaryDay_TableSection,
+    WH_Table,
+)
+from sessional_diary.utilities import AID, NS_MAP, ID_Cell, make_id_cells
+
+# below this many rows starting the processes takes longer than it saves
+PARALLEL_MIN_ROWS = 20_000
+
+MICROSECOND = timedelta(microseconds=1)
+DAY_SECONDS = 24 * 60 * 60
+
+# items with a time before this are after midnight, i.e. on the day after the
+# sitting date. No sitting starts before 9.30 but one that goes on all night
+# can run past 6am
+SITTING_DAY_STARTS = time(9)
+
+# every cell of a diary has text (if only '') or children
+EMPTY_CELLS = etree.XPath('*[not(node())]')
+
+
+def seconds(value: time) -> int:
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+class DiaryDay:
+    """A sitting day of a diary: its title, date, the chunk it is in (see
+    `TableChunks`) and its rows, with the totals of every row of the day."""
+
+    __slots__ = ('title', 'date', 'chunk_key', 'rows', 'duration', 'aat', 'out_of_order')
+
+    def __init__(self, title: str, day_date: date, chunk_key: str = ''):
+        self.title = title
+        self.date = day_date
+        self.chunk_key = chunk_key
+        # (time, subject 1, subject 2, duration[, after appointed time])
+        self.rows: list[tuple] = []
+        self.duration = timedelta()
+        self.aat = timedelta()
+        # whether some of the rows were further down the sheet than the rest
+        self.out_of_order = False
+
+    def sort_rows(self) -> None:
+        """Put the rows in time order from the start of the sitting day, so
+        times after midnight come last. Rows at the same time keep their order."""
+
+        start = seconds(SITTING_DAY_STARTS)
+        self.rows.sort(key=lambda row: (seconds(row[0]) - start) % DAY_SECONDS)
+
+
+def add_day(table: WH_Table, chamber: bool, title: str, rows: Sequence[tuple],
+            session_duration: timedelta, session_aat: timedelta) -> None:
+    """Add the section for a day to a House (`chamber`) or Westminster Hall diary."""
+
+    if chamber:
+        ch_section = CH_DiaryDay_TableSection(title)
+        for row_time, subject1, subject2, duration, aat in rows:
+            row_time = row_time.strftime('%H.%M')
+            # create a Bold element. Optionally can have non bold tail text
+            cell = ID_Cell()
+            bold = SubElement(cell, 'Bold')
+            bold.text = subject1
+            if subject2:
+                bold.tail = f': {subject2}'  # this text will not be bold
+            ch_section.add_row([row_time, cell,
+                                duration if duration != timedelta() else '',
+                                aat if aat != timedelta() else ''],
+                               duration=duration, aat=aat)
+        ch_section.add_to(table, session_duration, session_aat)
+    else:
+        wh_section = WH_DiaryDay_TableSection(title)
+        for row_time, subject1, subject2, duration in rows:
+            row_time = row_time.strftime('%H.%M')
+            cell = ID_Cell()
+            bold = SubElement(cell, 'Bold')
+            bold.text = subject1
+            if subject2:
+                bold.tail = f': {subject2}'
+            wh_section.add_row(make_id_cells([row_time, cell, duration]), duration)
+        wh_section.add_to(table, session_duration)
+
+
+def diary_columns(days: Sequence[DiaryDay], session_durations: Sequence[timedelta],
+                  session_aats: Sequence[timedelta]) -> SharedColumns:
+    """The days and their rows as columns in shared memory. Times are stored
+    in minutes and durations in microseconds."""
+
+    rows = [row for day in days for row in day.rows]
+    return SharedColumns.create(
+        {
+            # the rows of day d are first_row[d] to first_row[d + 1]
+            'first_row': accumulate((len(day.rows) for day in days), initial=0),
+            'session_duration': (total // MICROSECOND for total in session_durations),
+            'session_aat': (total // MICROSECOND for total in session_aats),
+            'time': (row[0].hour * 60 + row[0].minute for row in rows),
+            'duration': (row[3] // MICROSECOND for row in rows),
+            # only in the House diary
+            'aat': (row[4] // MICROSECOND if len(row) > 4 else 0 for row in rows),
+        },
+        {
+            'title': (day.title for day in days),
+            'subject1': (row[1] for row in rows),
+            'subject2': (row[2] for row in rows),
+        })
+
+
+def _render_days(args: tuple[ColumnsLayout, bool, int, int]) -> tuple[bytes, list[int]]:
+    """The tables of days `first` to `end` (not included), one table per day,
+    serialised together, and the number of rows of each day. Runs in a worker
+    process."""
+
+    layout, chamber, first, end = args
+    table_class = CH_Diary_Table if chamber else WH_Diary_Table
+    tables = []
+    rows = []
+    with SharedColumns.attach(layout) as columns:
+        first_row = columns.column('first_row')
+        session_durations = columns.column('session_duration')
+        session_aats = columns.column('session_aat')
+        titles = columns.column('title')
+        times = columns.column('time')
+        subjects1 = columns.column('subject1')
+        subjects2 = columns.column('subject2')
+        durations = columns.column('duration')
+        aats = columns.column('aat')
+
+        for d in range(first, end):
+            day_rows: list[tuple] = []
+            for r in range(first_row[d], first_row[d + 1]):
+                row = (time(*divmod(times[r], 60)), columns.string(subjects1[r]),
+                       columns.string(subjects2[r]), timedelta(microseconds=durations[r]))
+                day_rows.append(row + (timedelta(microseconds=aats[r]),) if chamber else row)
+
+            table = table_class(nsmap=NS_MAP, attrib={AID + 'trows': '0'})  # type: ignore
+            add_day(table, chamber, columns.string(titles[d]), day_rows,
+                    timedelta(microseconds=session_durations[d]),
+                    timedelta(microseconds=session_aats[d]))
+            tables.append(etree.tostring(table))
+            rows.append(int(table.get(AID + 'trows')))
+    return b'<days>' + b''.join(tables) + b'</days>', rows
+
+
+def render_diary(table: WH_Table, chunks: TableChunks, chamber: bool,
+                 days: Sequence[DiaryDay],
+                 duration_before: timedelta = timedelta(),
+                 aat_before: timedelta = timedelta(),
+                 processes: Optional[int] = None) -> None:
+    """Add the days to a diary table. The session totals start from
+    `duration_before` and `aat_before` (e.g. for a preview of some days).
+
+    `processes` is the number of worker processes, by default this depends on
+    the number of rows. 1 means do everything in this process and 0 means one
+    process per CPU."""
+
+    # the totals for the session at the end of each day
+    session_durations = list(accumulate((day.duration for day in days), initial=duration_before))[1:]
+    session_aats = list(accumulate((day.aat for day in days), initial=aat_before))[1:]
+
+    total_rows = sum(len(day.rows) for day in days)
+    if processes is None:
+        if total_rows < PARALLEL_MIN_ROWS or (os.cpu_count() or 1) < 2:
+            processes = 1
+
+    if processes == 1 or len(days) < 2:
+        for day, session_duration, session_aat in zip(days, session_durations, session_aats):
+            chunks.mark(day.chunk_key)
+            add_day(table, chamber, day.title, day.rows, session_duration, session_aat)
+        return
+
+    # runs of consecutive days, each with roughly the same number of rows
+    workers = min(processes or os.cpu_count() or 1, len(days))
+    batches: list[list[int]] = [[]]
+    batch_rows = 0
+    for i, day in enumerate(days):
+        if batch_rows >= total_rows / workers * len(batches) and len(batches) < workers:
+            batches.append([])
+        batches[-1].append(i)
+        batch_rows += len(day.rows)
+
+    with diary_columns(days, session_durations, session_aats) as columns, \
+            ProcessPoolExecutor(max_workers=len(batches),
+                                mp_context=process_pool_context()) as executor:
+        results = executor.map(_render_days, [(columns.layout, chamber, batch[0], batch[-1] + 1)
+                                              for batch in batches])
+
+        for batch, (fragment, rows) in zip(batches, results):
+            for i, day_table, day_rows in zip(batch, etree.fromstring(fragment), rows):
+                # an empty cell is parsed without its (empty) text, which
+                # would then be written as <Cell/>
+                for cell in EMPTY_CELLS(day_table):
+                    cell.text = ''
+                chunks.mark(days[i].chunk_key)
+                table.extend(list(day_table))
+                table.increment_rows(increment_by=day_rows)
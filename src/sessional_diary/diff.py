@@ -0,0 +1,266 @@
+"""Compare two versions of a sessional diary Excel file, sitting day by sitting day.
+
+Each day's parsed rows are hashed so only the days whose hash differs need to be
+compared item by item. For the days that have changed, the effect on the total of
+every analysis section is also worked out.
+"""
+
+import argparse
+import hashlib
+import json
+from datetime import date, timedelta
+from difflib import SequenceMatcher
+from typing import NamedTuple, Optional
+
+from sessional_diary.cli import (
+    CH_SECTIONS,
+    CH_SHEET_TITLE,
+    WH_SECTIONS,
+    WH_SHEET_TITLE,
+    Sessional_Diary,
+    WHRow,
+    existing_path,
+    section_keys,
+)
+from sessional_diary.utilities import format_timedelta
+
+
+class Item(NamedTuple):
+    """A single row of the Chamber or Westminster Hall sheet."""
+    time: str
+    subject1: str
+    subject2: str
+    tags: str
+    duration: timedelta
+    aat: timedelta
+
+    def identity(self) -> tuple[str, str, str]:
+        # items with the same identity are treated as the same item, edited
+        return (self.time, self.subject1, self.subject2)
+
+    def describe(self) -> str:
+        subject = ': '.join([self.subject1, self.subject2]).rstrip(': ')
+        return f'{self.time}\t{subject} ({format_timedelta(self.duration)})'
+
+
+class SittingDay:
+
+    def __init__(self, day: int, day_date: date):
+        self.day = day
+        self.date = day_date
+        self.items: list[Item] = []
+        self.entries: list[WHRow] = []
+
+    def digest(self) -> bytes:
+        return hashlib.blake2b(repr(self.items).encode('UTF-8'), digest_size=16).digest()
+
+    def title(self) -> str:
+        return f'{self.day}.\u2002{self.date.strftime("%A %d %B %Y")}'
+
+
+class DayChange:
+
+    def __init__(self, status: str, old: Optional[SittingDay], new: Optional[SittingDay]):
+        # status is one of 'added', 'removed' or 'changed'
+        self.status = status
+        self.old = old
+        self.new = new
+        self.added: list[Item] = []
+        self.removed: list[Item] = []
+        self.changed: list[tuple[Item, Item]] = []
+
+    def title(self) -> str:
+        day = self.new or self.old
+        assert day is not None
+        return day.title()
+
+
+def read_days(excel_file_path: str) -> dict[str, dict[date, SittingDay]]:
+    """Group the rows of both sheets by sitting day (keyed on the date)."""
+
+    sd = Sessional_Diary(excel_file_path, no_excel=True)
+
+    days: dict[str, dict[date, SittingDay]] = {}
+    for sheet_title in (CH_SHEET_TITLE, WH_SHEET_TITLE):
+        sheet_days: dict[date, SittingDay] = {}
+        for _, entry in sd.entries(sheet_title):
+            sitting_day = sheet_days.get(entry.date)
+            if sitting_day is None:
+                sitting_day = sheet_days[entry.date] = SittingDay(entry.day, entry.date)
+            sitting_day.items.append(Item(entry.time.strftime('%H.%M'),
+                                          entry.subject1,
+                                          entry.subject2,
+                                          entry.tags,
+                                          entry.duration,
+                                          getattr(entry, 'aat', timedelta())))
+            sitting_day.entries.append(entry)
+        days[sheet_title] = sheet_days
+
+    return days
+
+
+def diff_items(change: DayChange, old_items: list[Item], new_items: list[Item]) -> None:
+    matcher = SequenceMatcher(None,
+                              [item.identity() for item in old_items],
+                              [item.identity() for item in new_items],
+                              autojunk=False)
+
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            for old_item, new_item in zip(old_items[i1:i2], new_items[j1:j2]):
+                if old_item != new_item:
+                    change.changed.append((old_item, new_item))
+        elif tag == 'replace':
+            # pair up as many as possible as edits, the rest are additions or removals
+            pairs = min(i2 - i1, j2 - j1)
+            change.changed.extend(zip(old_items[i1:i1 + pairs], new_items[j1:j1 + pairs]))
+            change.removed.extend(old_items[i1 + pairs:i2])
+            change.added.extend(new_items[j1 + pairs:j2])
+        elif tag == 'delete':
+            change.removed.extend(old_items[i1:i2])
+        elif tag == 'insert':
+            change.added.extend(new_items[j1:j2])
+
+
+def diff_days(old_days: dict[date, SittingDay],
+              new_days: dict[date, SittingDay]) -> list[DayChange]:
+
+    changes: list[DayChange] = []
+
+    for day_date in sorted(old_days.keys() | new_days.keys()):
+        old = old_days.get(day_date)
+        new = new_days.get(day_date)
+
+        if old is None:
+            change = DayChange('added', None, new)
+        elif new is None:
+            change = DayChange('removed', old, None)
+        elif old.digest() == new.digest():
+            # the day number may still have changed if a day has been added before it
+            # but that is reported as part of the day that was added
+            continue
+        else:
+            change = DayChange('changed', old, new)
+
+        diff_items(change,
+                   old.items if old else [],
+                   new.items if new else [])
+        changes.append(change)
+
+    return changes
+
+
+def section_totals(sheet_title: str,
+                   entries: list[WHRow]) -> dict[str, list[timedelta]]:
+    """Total duration and after appointed time for every analysis section."""
+
+    totals: dict[str, list[timedelta]] = {}
+    for entry in entries:
+        keys = section_keys(sheet_title == CH_SHEET_TITLE, entry)
+        aat = getattr(entry, 'aat', timedelta())
+        for key in keys:
+            section_total = totals.setdefault(key, [timedelta(), timedelta()])
+            section_total[0] += entry.duration
+            section_total[1] += aat
+    return totals
+
+
+def section_effects(sheet_title: str,
+                    changes: list[DayChange]) -> list[tuple[str, timedelta, timedelta]]:
+    """How the total of each analysis section changes, only looking at the days
+    that have changed."""
+
+    old_entries = [entry for change in changes if change.old for entry in change.old.entries]
+    new_entries = [entry for change in changes if change.new for entry in change.new.entries]
+
+    old_totals = section_totals(sheet_title, old_entries)
+    new_totals = section_totals(sheet_title, new_entries)
+
+    sections = CH_SECTIONS if sheet_title == CH_SHEET_TITLE else WH_SECTIONS
+
+    effects = []
+    for key, title, _, _ in sections:
+        old_dur, old_aat = old_totals.get(key, [timedelta(), timedelta()])
+        new_dur, new_aat = new_totals.get(key, [timedelta(), timedelta()])
+        if new_dur != old_dur or new_aat != old_aat:
+            effects.append((title.replace('\t', ' '), new_dur - old_dur, new_aat - old_aat))
+    return effects
+
+
+def signed_timedelta(td: timedelta) -> str:
+    sign = '-' if td < timedelta() else '+'
+    return sign + format_timedelta(abs(td))
+
+
+def diff_workbooks(old_file_path: str, new_file_path: str) -> dict:
+    """Compare two Excel files and return the differences as a JSON friendly dict."""
+
+    old_days = read_days(old_file_path)
+    new_days = read_days(new_file_path)
+
+    result: dict = {}
+    for sheet_title in (CH_SHEET_TITLE, WH_SHEET_TITLE):
+        changes = diff_days(old_days[sheet_title], new_days[sheet_title])
+        result[sheet_title] = {
+            'days': [{
+                'status': change.status,
+                'date': (change.new or change.old).date.strftime('%Y-%m-%d'),  # type: ignore
+                'title': change.title(),
+                'added': [item.describe() for item in change.added],
+                'removed': [item.describe() for item in change.removed],
+                'changed': [[old.describe(), new.describe()] for old, new in change.changed],
+            } for change in changes],
+            'sections': [{
+                'section': title,
+                'duration': signed_timedelta(duration),
+                'aat': signed_timedelta(aat),
+            } for title, duration, aat in section_effects(sheet_title, changes)],
+        }
+    return result
+
+
+def print_report(result: dict) -> None:
+    for sheet_title, sheet_result in result.items():
+        print(sheet_title)
+        if not sheet_result['days']:
+            print('  No changes')
+            continue
+
+        for day in sheet_result['days']:
+            print(f'  {day["status"].capitalize()}: {day["title"]}')
+            for item in day['removed']:
+                print(f'    - {item}')
+            for item in day['added']:
+                print(f'    + {item}')
+            for old, new in day['changed']:
+                print(f'    ~ {old}\n      {new}')
+
+        print('  Effect on section totals:')
+        for section in sheet_result['sections']:
+            aat = ''
+            if sheet_title == CH_SHEET_TITLE:
+                aat = f'\t(after appointed time {section["aat"]})'
+            print(f'    {section["section"]}\t{section["duration"]}{aat}')
+
+
+def main(argv: list[str]):
+    parser = argparse.ArgumentParser(
+        prog='sessional_diary diff',
+        description='Show which sitting days have changed between two versions of '
+                    'the Sessional diary Excel file.')
+
+    parser.add_argument('old', metavar='old_file', type=existing_path,
+                        help='File path to the earlier Excel file.')
+    parser.add_argument('new', metavar='new_file', type=existing_path,
+                        help='File path to the later Excel file.')
+    parser.add_argument('--json', action='store_true',
+                        help='Output the differences as JSON.')
+
+    args = parser.parse_args(argv)
+
+    result = diff_workbooks(args.old, args.new)
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        print_report(result)
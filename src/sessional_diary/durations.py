@@ -0,0 +1,44 @@
+"""Work out the durations again from the Time column.
+
+The Excel file is read with the values of the formulas as they were last
+calculated. If the file was last saved by a program that does not recalculate
+formulas the Duration cells are empty, and count as no time. Each item lasts
+until the next item of the same sitting day starts, so the durations can be
+worked out from the times, for the whole sheet at once with NumPy (an optional
+dependency, see stats.py).
+"""
+
+from typing import Sequence
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def rebuild_durations(days: Sequence[int], times: Sequence[float],
+                      durations: Sequence[float]):
+    """`days`, `times` and `durations` are the columns of the rows of a sheet,
+    the times and durations in seconds (NaN for an empty Duration).
+
+    Returns the time in seconds until the next item of the same day for every
+    row (NaN for the last item of each day), the indexes of the rows with an
+    empty Duration that has been worked out, the indexes of the rows whose
+    Duration is not the time until the next item, and the indexes of the rows
+    with an empty Duration that could not be worked out."""
+
+    import numpy as np
+
+    day = np.asarray(days, dtype=np.int64)
+    seconds = np.asarray(times, dtype=np.float64)
+    duration = np.asarray(durations, dtype=np.float64)
+
+    to_next = np.full(seconds.shape, np.nan)
+    if seconds.size > 1:
+        # a time earlier than the one before is after midnight
+        gaps = np.mod(seconds[1:] - seconds[:-1], SECONDS_PER_DAY)
+        to_next[:-1] = np.where(day[1:] == day[:-1], gaps, np.nan)
+
+    known = ~np.isnan(to_next)
+    empty = np.isnan(duration)
+    rebuilt = np.flatnonzero(empty & known)
+    mismatched = np.flatnonzero(~empty & known & (duration != to_next))
+    not_rebuilt = np.flatnonzero(empty & ~known)
+    return to_next, rebuilt, mismatched, not_rebuilt
@@ -0,0 +1,167 @@
+"""Create the worksheets of Analysis.xlsx in parallel.
+
+There is a sheet for every analysis section (about 40 of them). Rather than
+openpyxl serialising every sheet one after the other, the XML for each analysis
+sheet is created independently from its rows, in a pool of processes if there
+are enough rows to make that worthwhile. openpyxl still creates everything else
+in the xlsx file (the workbook, styles, content types etc.) from a workbook in
+which the analysis sheets are empty placeholders, and the placeholders are then
+swapped for the created sheets. See output.workbook_to_bytes.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from typing import Optional, Sequence
+from xml.sax.saxutils import escape
+
+from openpyxl import Workbook
+from openpyxl.compat import safe_string
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import to_excel
+
+from sessional_diary.output import process_pool_context
+from sessional_diary.tables import ExcelCell, WH_ExcelSheet
+
+# override default openpyxl timedelta (duration) format, as in cli.py
+DURATION_FORMAT = '[h].mm'
+
+# below this many rows (in all the sheets) starting the processes takes
+# longer than it saves
+PARALLEL_MIN_ROWS = 20_000
+
+# tidy up the col widths of the first two columns.
+# Otherwise it's too narrow and you have to change it every time you open the excel
+COLUMN_WIDTHS = {1: 20, 2: 30}
+
+SHEET_START = (
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetPr><outlinePr summaryBelow="1" summaryRight="1"/><pageSetUpPr/></sheetPr>'
+    '<dimension ref="{dimension}"/>'
+    '<sheetViews><sheetView workbookViewId="0"><selection activeCell="A1" sqref="A1"/>'
+    '</sheetView></sheetViews>'
+    '<sheetFormatPr baseColWidth="8" defaultRowHeight="15"/>'
+    '{cols}<sheetData>'
+)
+SHEET_END = (
+    '</sheetData>'
+    '<pageMargins left="0.75" right="0.75" top="1" bottom="1" header="0.5" footer="0.5"/>'
+    '</worksheet>'
+)
+
+
+class StyleIds:
+    """The ids of the (cellXfs) styles used in the analysis sheets. These are
+    looked up in the workbook so they match the styles.xml openpyxl creates."""
+
+    def __init__(self, workbook: Workbook):
+        # use a scratch sheet to add the styles to the workbook
+        ws = workbook.create_sheet()
+        bold = ws.cell(row=1, column=1)
+        bold.font = Font(bold=True)
+        bold_duration = ws.cell(row=1, column=2)
+        bold_duration.font = Font(bold=True)
+        bold_duration.number_format = DURATION_FORMAT
+        duration = ws.cell(row=1, column=3)
+        duration.number_format = DURATION_FORMAT
+
+        self.bold = bold.style_id
+        self.bold_duration = bold_duration.style_id
+        self.duration = duration.style_id
+
+        workbook.remove(ws)
+
+    def style_id(self, value, bold: bool) -> int:
+        if isinstance(value, timedelta):
+            return self.bold_duration if bold else self.duration
+        return self.bold if bold else 0
+
+
+def render_cell(coordinate: str, value, style_id: int) -> str:
+    style = f' s="{style_id}"' if style_id else ''
+
+    if value is None:
+        return f'<c r="{coordinate}"{style}/>'
+
+    if isinstance(value, str):
+        if value == '':
+            return f'<c r="{coordinate}"{style} t="inlineStr"></c>'
+        space = ''
+        if value.strip() and value != value.strip():
+            space = ' xml:space="preserve"'
+        return (f'<c r="{coordinate}"{style} t="inlineStr">'
+                f'<is><t{space}>{escape(value)}</t></is></c>')
+
+    if isinstance(value, timedelta):
+        value = to_excel(value)
+
+    return f'<c r="{coordinate}"{style} t="n"><v>{safe_string(value)}</v></c>'
+
+
+def render_worksheet(rows: Sequence[Sequence], style_ids: StyleIds) -> bytes:
+    """The worksheet XML for rows of values (or ExcelCells). None values, other
+    than in an ExcelCell, are left out as there is no cell."""
+
+    parts = []
+    max_column = 1
+    for r, row in enumerate(rows, start=1):
+        cells = []
+        for c, item in enumerate(row, start=1):
+            if item is None:
+                continue
+            bold = False
+            if isinstance(item, ExcelCell):
+                item, bold = item.value, item.bold
+            max_column = max(max_column, c)
+            cells.append(render_cell(f'{get_column_letter(c)}{r}', item,
+                                     style_ids.style_id(item, bold)))
+        parts.append(f'<row r="{r}">{"".join(cells)}</row>')
+
+    cols = ''.join(f'<col width="{width}" customWidth="1" min="{c}" max="{c}"/>'
+                   for c, width in COLUMN_WIDTHS.items())
+    start = SHEET_START.format(
+        dimension=f'A1:{get_column_letter(max_column)}{max(len(rows), 1)}',
+        cols=f'<cols>{cols}</cols>')
+
+    # like openpyxl, non ascii characters are written as character references
+    return (start + ''.join(parts) + SHEET_END).encode('ascii', 'xmlcharrefreplace')
+
+
+def _render_sheets(args: tuple[list[list[Sequence]], StyleIds]) -> list[bytes]:
+    sheets_rows, style_ids = args
+    return [render_worksheet(rows, style_ids) for rows in sheets_rows]
+
+
+def render_worksheets(sheets: Sequence[WH_ExcelSheet], style_ids: StyleIds,
+                      processes: Optional[int] = None) -> dict[str, bytes]:
+    """Worksheet XML for each analysis sheet, keyed by sheet title.
+
+    `processes` is the number of worker processes, by default this depends on
+    the number of rows. 1 means do everything in this process and 0 means one
+    process per CPU."""
+
+    sheets_rows = [sheet.excel_rows() for sheet in sheets]
+    titles = [sheet.excel_sheet.title for sheet in sheets]
+
+    if processes is None:
+        total_rows = sum(len(rows) for rows in sheets_rows)
+        if total_rows < PARALLEL_MIN_ROWS or (os.cpu_count() or 1) < 2:
+            processes = 1
+
+    if processes == 1 or len(sheets) < 2:
+        return dict(zip(titles, _render_sheets((sheets_rows, style_ids))))
+
+    workers = min(processes or os.cpu_count() or 1, len(sheets))
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=process_pool_context()) as executor:
+        # one batch per worker, dealing the sheets out so the batches are
+        # roughly the same size
+        batches = [sheets_rows[i::workers] for i in range(workers)]
+        results = list(executor.map(_render_sheets,
+                                    [(batch, style_ids) for batch in batches]))
+
+    rendered: list[bytes] = [b''] * len(sheets)
+    for i, batch_result in enumerate(results):
+        rendered[i::workers] = batch_result
+    return dict(zip(titles, rendered))
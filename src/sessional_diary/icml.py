@@ -0,0 +1,73 @@
+"""Write the tables as InCopy (ICML) stories.
+
+An ICML file is a single story that is placed into an InDesign document as a
+link (File > Place). When the file changes InDesign marks the link as
+modified and it can be updated in place, without importing anything again.
+The tables are converted as for the IDML files (see idml.py) and the styles
+of the template are included so the story looks the same in any document.
+
+Output files are only rewritten when their content changes (see output.py), so
+after a weekly update only the stories that are different need updating.
+"""
+
+import os
+
+from lxml import etree
+from lxml.etree import Element, SubElement, _Element
+
+from sessional_diary.idml import (
+    add_tables,
+    template_for,
+    template_styles,
+    template_styles_xml,
+)
+
+# the style groups copied from the template into each story
+STYLE_GROUPS = ['RootCharacterStyleGroup', 'RootParagraphStyleGroup',
+                'RootCellStyleGroup', 'RootTableStyleGroup']
+
+
+def icml_file_name(xml_name: str) -> str:
+    """e.g. House_Diary.xml -> House_Diary.icml"""
+    return os.path.splitext(xml_name)[0] + '.icml'
+
+
+def table_to_icml(table: _Element, xml_name: str) -> bytes:
+    """The ICML story for a table that would be saved as `xml_name` (or a
+    chunk of it), using the styles of its template."""
+
+    template_name = template_for(xml_name)
+    styles_root = etree.fromstring(template_styles_xml(template_name))
+    dom_version = styles_root.get('DOMVersion', '17.0')
+
+    document = Element('Document', DOMVersion=dom_version, Self='d')
+    for group in STYLE_GROUPS:
+        style_group = styles_root.find(group)
+        if style_group is not None:
+            document.append(style_group)
+
+    # the ids only have to be unique within the story, so keep them the same
+    # from one run to the next
+    story_id = 'story'
+    story = SubElement(document, 'Story',
+                       Self=story_id,
+                       AppliedTOCStyle='n',
+                       TrackChanges='false',
+                       StoryTitle=os.path.splitext(xml_name)[0],
+                       AppliedNamedGrid='n')
+    SubElement(story, 'StoryPreference',
+               OpticalMarginAlignment='false',
+               OpticalMarginSize='12',
+               FrameType='TextFrameType',
+               StoryOrientation='Horizontal',
+               StoryDirection='LeftToRightDirection')
+    SubElement(story, 'InCopyExportOption',
+               IncludeGraphicProxies='true',
+               IncludeAllResources='false')
+    add_tables(story, [table], story_id, template_styles(template_name))
+
+    header = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+              '<?aid style="50" type="snippet" readerVersion="6.0" featureSet="513" '
+              f'product="{dom_version}" ?>\n'
+              '<?aid SnippetType="InCopyInterchange"?>\n')
+    return header.encode('UTF-8') + etree.tostring(document, encoding='UTF-8')
@@ -0,0 +1,354 @@
+"""Create finished InDesign (IDML) files from the templates.
+
+Rather than importing the XML files into the templates by hand, the tables are
+converted into IDML table markup and put into the story that the XML would have
+been imported into. An IDML file is a zip, only the story that holds the tables
+is changed, every other entry is copied across unchanged.
+"""
+
+import io
+import struct
+import zipfile
+import zlib
+from copy import copy
+from functools import lru_cache
+from importlib.resources import files
+from importlib.resources.abc import Traversable
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+from lxml import etree
+from lxml.etree import Element, SubElement, _Element
+
+from sessional_diary.utilities import AID, AID5
+
+# the templates are package data, so they are there however it is installed
+TEMPLATES_DIR: Traversable = files('sessional_diary') / 'templates'
+
+# which XML output files go into which template
+TEMPLATE_TABLES = {
+    'sessional-diary_Part-1_template.idml': ['House_Diary.xml'],
+    'sessional-diary_Part-2_template.idml': ['House_Analysis.xml'],
+    'sessional-diary_Part-3_template.idml': ['WH_diary.xml'],
+    'sessional-diary_Part-4_template.idml': ['WH_Analysis.xml'],
+    'sessional-diary_Contents_template.idml': ['House_An_Contents.xml', 'WH_An_Contents.xml'],
+}
+
+NO_PARAGRAPH_STYLE = 'ParagraphStyle/$ID/[No paragraph style]'
+NORMAL_PARAGRAPH_STYLE = 'ParagraphStyle/$ID/NormalParagraphStyle'
+NO_CHARACTER_STYLE = 'CharacterStyle/$ID/[No character style]'
+NO_CELL_STYLE = 'CellStyle/$ID/[None]'
+
+# the fixed length parts of the zip records (see the zip file format
+# specification, APPNOTE.TXT). The templates are small so zip64 isn't needed
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+CENTRAL_HEADER = struct.Struct('<4s6H3L5H2L')
+END_OF_CENTRAL_DIRECTORY = struct.Struct('<4s4H2LH')
+DATA_DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+HAS_DATA_DESCRIPTOR = 0x08
+UTF8_NAME = 0x800
+
+
+def idml_file_name(template_name: str) -> str:
+    """e.g. sessional-diary_Part-1_template.idml -> sessional-diary_Part-1.idml"""
+    return template_name.replace('_template', '')
+
+
+def template_for(xml_name: str) -> str:
+    """The template that a table (e.g. House_Diary.xml) goes into."""
+    for template_name, xml_names in TEMPLATE_TABLES.items():
+        if xml_name in xml_names:
+            return template_name
+    raise ValueError(f'No template for {xml_name}')
+
+
+@lru_cache
+def template_styles_xml(template_name: str) -> bytes:
+    with (TEMPLATES_DIR / template_name).open('rb') as f, zipfile.ZipFile(f) as template:
+        return template.read('Resources/Styles.xml')
+
+
+class Styles:
+    """The paragraph styles that go with the cell and table styles of a template.
+
+    In IDML every paragraph must say which paragraph style it uses, whereas when
+    XML is imported InDesign works this out from the cell style."""
+
+    def __init__(self, styles_xml: bytes):
+        root = etree.fromstring(styles_xml)
+
+        self.cell_paragraph_style: dict[str, str] = {}
+        for cell_style in root.iter('CellStyle'):
+            self.cell_paragraph_style[cell_style.get('Self', '')] = cell_style.get(
+                'AppliedParagraphStyle', NO_PARAGRAPH_STYLE)
+
+        # table style -> (header region cell style, body region cell style)
+        self.table_regions: dict[str, tuple[str, str]] = {}
+        for table_style in root.iter('TableStyle'):
+            self.table_regions[table_style.get('Self', '')] = (
+                table_style.get('HeaderRegionCellStyle', NO_CELL_STYLE),
+                table_style.get('BodyRegionCellStyle', NO_CELL_STYLE))
+
+    def paragraph_style(self, table_style: str, cell_style: str, header: bool) -> str:
+        paragraph_style = self.cell_paragraph_style.get(cell_style, NO_PARAGRAPH_STYLE)
+        if paragraph_style == NO_PARAGRAPH_STYLE:
+            # fall back to the cell style of the region of the table
+            header_style, body_style = self.table_regions.get(
+                table_style, (NO_CELL_STYLE, NO_CELL_STYLE))
+            region_style = header_style if header else body_style
+            paragraph_style = self.cell_paragraph_style.get(region_style, NO_PARAGRAPH_STYLE)
+        if paragraph_style == NO_PARAGRAPH_STYLE:
+            paragraph_style = NORMAL_PARAGRAPH_STYLE
+        return paragraph_style
+
+
+@lru_cache
+def template_styles(template_name: str) -> Styles:
+    return Styles(template_styles_xml(template_name))
+
+
+def cell_text_runs(cell: _Element) -> list[tuple[str, str]]:
+    """Split the text of an InDesign XML cell into (character style, text) runs."""
+
+    runs = []
+    if cell.text:
+        runs.append((NO_CHARACTER_STYLE, cell.text))
+    for child in cell:
+        if child.text:
+            runs.append((f'CharacterStyle/{child.tag}', child.text))
+        if child.tail:
+            runs.append((NO_CHARACTER_STYLE, child.tail))
+    return runs
+
+
+def add_paragraph(parent: _Element, paragraph_style: str,
+                  runs: list[tuple[str, str]]) -> _Element:
+    paragraph = SubElement(parent, 'ParagraphStyleRange',
+                           AppliedParagraphStyle=paragraph_style)
+    if not runs:
+        SubElement(paragraph, 'CharacterStyleRange', AppliedCharacterStyle=NO_CHARACTER_STYLE)
+    for character_style, text in runs:
+        SubElement(SubElement(paragraph, 'CharacterStyleRange',
+                              AppliedCharacterStyle=character_style),
+                   'Content').text = text
+    return paragraph
+
+
+def table_to_idml(table: _Element, self_id: str, styles: Styles) -> _Element:
+    """Convert a table created by this tool (e.g. a CH_Diary_Table) into an IDML
+    Table element."""
+
+    columns = int(table.get(AID + 'tcols', '1'))
+    table_style = 'TableStyle/' + table.get(AID5 + 'tablestyle', '$ID/[Basic Table]')
+
+    idml_cells = []
+    column_widths: list[str] = []
+    header_rows = 0
+    row = col = 0
+    for i, cell in enumerate(table):
+        span = int(cell.get(AID + 'ccols', '1'))
+        header = cell.get(AID + 'theader') is not None
+        if header:
+            header_rows = row + 1
+            column_widths.append(cell.get(AID + 'ccolwidth', ''))
+
+        cell_style = NO_CELL_STYLE
+        if cell.get(AID5 + 'cellstyle'):
+            cell_style = 'CellStyle/' + cell.get(AID5 + 'cellstyle', '')
+
+        idml_cell = Element('Cell',
+                            Self=f'{self_id}i{i}',
+                            Name=f'{col}:{row}',
+                            RowSpan='1',
+                            ColumnSpan=str(span),
+                            CellType='TextTypeCell',
+                            AppliedCellStyle=cell_style,
+                            AppliedCellStylePriority='0' if cell_style == NO_CELL_STYLE else '1')
+        add_paragraph(idml_cell,
+                      styles.paragraph_style(table_style, cell_style, header),
+                      cell_text_runs(cell))
+        idml_cells.append(idml_cell)
+
+        col += span
+        if col >= columns:
+            row += 1
+            col = 0
+
+    rows = row + (1 if col else 0)
+
+    idml_table = Element('Table',
+                         Self=self_id,
+                         HeaderRowCount=str(header_rows),
+                         FooterRowCount='0',
+                         BodyRowCount=str(rows - header_rows),
+                         ColumnCount=str(columns),
+                         AppliedTableStyle=table_style,
+                         TableDirection='LeftToRightDirection')
+    for r in range(rows):
+        SubElement(idml_table, 'Row', Self=f'{self_id}Row{r}', Name=str(r))
+    for c in range(columns):
+        column = SubElement(idml_table, 'Column', Self=f'{self_id}Column{c}', Name=str(c))
+        if c < len(column_widths) and column_widths[c]:
+            column.set('SingleColumnWidth', column_widths[c])
+    idml_table.extend(idml_cells)
+    return idml_table
+
+
+def xml_story_id(backing_story_xml: bytes) -> str:
+    """The id of the story linked to the root element of the XML structure."""
+    root = etree.fromstring(backing_story_xml)
+    xml_element = root.find('.//XMLElement[@MarkupTag="XMLTag/root"]')
+    if xml_element is None or not xml_element.get('XMLContent'):
+        raise ValueError('The template has no story for the root XML element.')
+    return xml_element.get('XMLContent', '')
+
+
+def inject_tables(story_xml: bytes, tables: Iterable[_Element], styles: Styles) -> bytes:
+    """Replace the content of the root XML element of a story with tables."""
+
+    root = etree.fromstring(story_xml)
+    story = root.find('Story')
+    assert story is not None
+    story_id = story.get('Self', '')
+
+    xml_element = story.find('XMLElement[@MarkupTag="XMLTag/root"]')
+    if xml_element is None:
+        raise ValueError(f'Story {story_id} has no root XML element.')
+
+    for child in list(xml_element):
+        xml_element.remove(child)
+    add_tables(xml_element, tables, story_id, styles)
+
+    return etree.tostring(root, encoding='UTF-8', xml_declaration=True, standalone=True)
+
+
+def add_tables(parent: _Element, tables: Iterable[_Element], story_id: str,
+               styles: Styles) -> None:
+    """Add tables to a story (or an element in one), one after the other."""
+
+    paragraph = SubElement(parent, 'ParagraphStyleRange',
+                           AppliedParagraphStyle=NORMAL_PARAGRAPH_STYLE)
+    character_range = SubElement(paragraph, 'CharacterStyleRange',
+                                 AppliedCharacterStyle=NO_CHARACTER_STYLE)
+    for i, table in enumerate(tables):
+        if i > 0:
+            SubElement(character_range, 'Br')
+        character_range.append(table_to_idml(table, f'{story_id}t{i}', styles))
+
+
+def dos_date_time(date_time: tuple) -> tuple[int, int]:
+    year, month, day, hour, minute, second = date_time
+    return hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day
+
+
+def zip_name(info: zipfile.ZipInfo) -> bytes:
+    return info.filename.encode('utf-8' if info.flag_bits & UTF8_NAME else 'cp437')
+
+
+def raw_entry(archive: bytes, info: zipfile.ZipInfo) -> bytes:
+    """The local header and compressed data of an entry exactly as they are in
+    the archive."""
+
+    start = info.header_offset
+    *_, name_length, extra_length = LOCAL_HEADER.unpack_from(archive, start)
+    end = start + LOCAL_HEADER.size + name_length + extra_length + info.compress_size
+    if info.flag_bits & HAS_DATA_DESCRIPTOR:
+        # the crc and sizes follow the data, with or without a signature
+        end += 16 if archive[end:end + 4] == DATA_DESCRIPTOR_SIGNATURE else 12
+    return archive[start:end]
+
+
+def deflated_entry(info: zipfile.ZipInfo, data: bytes) -> tuple[zipfile.ZipInfo, bytes]:
+    """A new entry with the name, date and attributes of `info` holding `data`,
+    and its local header and compressed data."""
+
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+
+    entry_info = copy(info)
+    entry_info.compress_type = zipfile.ZIP_DEFLATED
+    entry_info.flag_bits = info.flag_bits & UTF8_NAME
+    entry_info.extract_version = max(info.extract_version, 20)
+    entry_info.CRC = zlib.crc32(data)
+    entry_info.compress_size = len(compressed)
+    entry_info.file_size = len(data)
+    entry_info.extra = b''
+
+    name = zip_name(entry_info)
+    header = LOCAL_HEADER.pack(b'PK\x03\x04', entry_info.extract_version, entry_info.flag_bits,
+                               entry_info.compress_type, *dos_date_time(entry_info.date_time),
+                               entry_info.CRC, entry_info.compress_size, entry_info.file_size,
+                               len(name), 0)
+    return entry_info, header + name + compressed
+
+
+def central_header(info: zipfile.ZipInfo, offset: int) -> bytes:
+    """The central directory record of an entry whose local header is at `offset`."""
+
+    name = zip_name(info)
+    header = CENTRAL_HEADER.pack(b'PK\x01\x02', info.create_system << 8 | info.create_version,
+                                 info.extract_version, info.flag_bits, info.compress_type,
+                                 *dos_date_time(info.date_time), info.CRC, info.compress_size,
+                                 info.file_size, len(name), len(info.extra), len(info.comment),
+                                 0, info.internal_attr, info.external_attr, offset)
+    return header + name + info.extra + info.comment
+
+
+def build_idml(template_path: Union[Path, Traversable], tables: list[_Element]) -> bytes:
+    """Create an IDML file from a template with the tables put into the story
+    that the root XML element is linked to.
+
+    The zip is written here rather than with `zipfile` so that every other
+    entry can be copied across as it is, without decompressing and
+    compressing it again."""
+
+    archive = template_path.read_bytes()
+    with zipfile.ZipFile(io.BytesIO(archive)) as template:
+        styles = Styles(template.read('Resources/Styles.xml'))
+        story_name = f'Stories/Story_{xml_story_id(template.read("XML/BackingStory.xml"))}.xml'
+
+        output = io.BytesIO()
+        central_directory = []
+        for info in template.infolist():
+            offset = output.tell()
+            if info.filename == story_name:
+                # keep the date of the original entry so the output is deterministic
+                info, entry = deflated_entry(
+                    info, inject_tables(template.read(info), tables, styles))
+            else:
+                entry = raw_entry(archive, info)
+            output.write(entry)
+            central_directory.append(central_header(info, offset))
+        comment = template.comment
+
+    start = output.tell()
+    output.write(b''.join(central_directory))
+    output.write(END_OF_CENTRAL_DIRECTORY.pack(
+        b'PK\x05\x06', 0, 0, len(central_directory), len(central_directory),
+        output.tell() - start, start, len(comment)))
+    output.write(comment)
+    return output.getvalue()
+
+
+def create_idml_files(outputs: dict[str, bytes],
+                      templates_dir: Optional[Path] = None) -> dict[str, bytes]:
+    """Create an IDML file for every template whose XML files have been created.
+
+    `outputs` maps XML file names (e.g. House_Diary.xml) to their content. Returns
+    a mapping of IDML file names to their content."""
+
+    templates: Union[Path, Traversable] = Path(templates_dir) if templates_dir else TEMPLATES_DIR
+
+    idml_files = {}
+    for template_name, xml_names in TEMPLATE_TABLES.items():
+        tables = []
+        for xml_name in xml_names:
+            if xml_name in outputs:
+                root = etree.fromstring(outputs[xml_name])
+                tables.extend(root)
+        if not tables:
+            continue
+        idml_files[idml_file_name(template_name)] = build_idml(
+            templates / template_name, tables)
+
+    return idml_files
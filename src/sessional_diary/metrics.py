@@ -0,0 +1,150 @@
+"""Metrics about a run, in the Prometheus text format.
+
+For unattended (e.g. nightly) runs, `--metrics-file` saves how long each stage
+took, the rows read and skipped in each sheet, the cells in each table, the
+size of each output file, the peak memory used and how many outputs came from
+the cache. Save it in the folder of node_exporter's textfile collector and the
+metrics are collected along with everything else on the machine, there is no
+server to run. The file is replaced in one go so the collector never reads a
+half written one.
+
+The rows, problems and table cells are cached along with the outputs, so a run
+that takes every output from the cache reports them too.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from typing import ContextManager, Iterator, Optional
+
+from sessional_diary.diagnostics import SKIPPED_ROW_CATEGORIES, Diagnostics
+
+PREFIX = 'sessional_diary_'
+
+# the name the counts from reading the input are cached under, next to the outputs
+COUNTS_CACHE_NAME = 'input_counts.json'
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None  # type: ignore
+
+
+def peak_memory_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RunMetrics:
+    """The metrics of one run, filled in as it goes."""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.stage_seconds: dict[str, float] = {}
+        self.rows: dict[str, int] = {}
+        self.table_cells: dict[str, int] = {}
+        self.output_bytes: dict[str, int] = {}
+        # (sheet, category) -> number of problems found in the input
+        self.problems: dict[tuple[str, str], int] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] = (self.stage_seconds.get(name, 0.0)
+                                        + perf_counter() - start)
+
+    def add_diagnostics(self, diagnostics: Diagnostics) -> None:
+        self.problems = {key: len(items) for key, items in diagnostics.grouped().items()}
+
+    def input_counts(self) -> bytes:
+        """The rows, problems and table cells as JSON, for the output cache."""
+        return json.dumps({'rows': self.rows,
+                           'problems': [[sheet, category, count] for (sheet, category), count
+                                        in self.problems.items()],
+                           'table_cells': self.table_cells}).encode('UTF-8')
+
+    def load_input_counts(self, data: bytes) -> None:
+        counts = json.loads(data)
+        self.rows = counts['rows']
+        self.problems = {(sheet, category): count
+                         for sheet, category, count in counts['problems']}
+        self.table_cells = counts['table_cells']
+
+    def to_text(self) -> str:
+        lines: list[str] = []
+
+        def metric(name: str, help_text: str,
+                   samples: list[tuple[dict[str, str], float]]) -> None:
+            lines.append(f'# HELP {PREFIX}{name} {help_text}')
+            lines.append(f'# TYPE {PREFIX}{name} gauge')
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{label_value(label)}"'
+                                      for key, label in labels.items())
+                lines.append(f'{PREFIX}{name}{{{label_text}}} {value}' if labels
+                             else f'{PREFIX}{name} {value}')
+
+        metric('last_run_timestamp_seconds', 'When the run finished.',
+               [({}, round(time.time(), 3))])
+        metric('run_duration_seconds', 'How long the whole run took.',
+               [({}, round(perf_counter() - self.started, 6))])
+        metric('stage_duration_seconds', 'How long each stage of the run took.',
+               [({'stage': stage_name}, round(seconds, 6))
+                for stage_name, seconds in self.stage_seconds.items()])
+        metric('rows_parsed', 'Rows read from each sheet.',
+               [({'sheet': sheet}, rows) for sheet, rows in self.rows.items()])
+        metric('rows_skipped', 'Rows skipped in each sheet.',
+               [({'sheet': sheet}, sum(self.problems.get((sheet, category), 0)
+                                       for category in SKIPPED_ROW_CATEGORIES))
+                for sheet in self.rows])
+        metric('input_problems', 'Problems found in the input, by sheet and type.',
+               [({'sheet': sheet, 'category': category}, count)
+                for (sheet, category), count in self.problems.items()])
+        metric('table_cells', 'Cells in each table, including the headings.',
+               [({'table': table}, cells) for table, cells in self.table_cells.items()])
+        metric('output_bytes', 'Size of each output file.',
+               [({'file': name}, size) for name, size in sorted(self.output_bytes.items())])
+        peak = peak_memory_bytes()
+        if peak is not None:
+            metric('peak_memory_bytes', 'Peak resident memory of the process.',
+                   [({}, peak)])
+        looked_up = self.cache_hits + self.cache_misses
+        if looked_up:
+            metric('cache_hits', 'Output files reused from the cache.',
+                   [({}, self.cache_hits)])
+            metric('cache_misses', 'Output files not in the cache.',
+                   [({}, self.cache_misses)])
+            metric('cache_hit_ratio', 'Share of the output files reused from the cache.',
+                   [({}, round(self.cache_hits / looked_up, 4))])
+
+        return '\n'.join(lines) + '\n'
+
+    def save(self, file_path: Optional[str]) -> None:
+        if not file_path:
+            return
+        # the collector reads every *.prom file, so the temporary file must
+        # not end in .prom
+        temp_path = f'{file_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='UTF-8', newline='\n') as f:
+            f.write(self.to_text())
+        os.replace(temp_path, file_path)
+
+
+def stage(metrics: Optional[RunMetrics], name: str) -> ContextManager:
+    """Time a stage of the run if metrics are being kept."""
+    return metrics.stage(name) if metrics is not None else nullcontext()
@@ -0,0 +1,252 @@
+"""Writing the output files.
+
+Outputs are turned into bytes before they are written so that the same input
+always gives the same bytes. This means outputs can be cached and a file is only
+rewritten when its content has actually changed (which keeps the modified time of
+unchanged files the same so InDesign links do not think they have been updated).
+"""
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Union
+
+from lxml import etree
+from openpyxl import Workbook
+from openpyxl.writer.excel import ExcelWriter
+
+from sessional_diary import __version__
+
+# the xlsx format stores timestamps (in the document properties and in the zip
+# entries). Use a fixed time so that the same input always gives the same bytes
+FIXED_TIMESTAMP = datetime(1980, 1, 1)
+
+
+def tree_to_bytes(tree: etree._ElementTree) -> bytes:
+    """Serialise an XML tree exactly as `tree.write` would."""
+    return etree.tostring(tree, encoding='UTF-8', xml_declaration=True)
+
+
+class _FixedTimeZipFile(zipfile.ZipFile):
+    """ZipFile that stamps every entry with `FIXED_TIMESTAMP`.
+
+    Entries named in `replacements` are written with the replacement data."""
+
+    def __init__(self, file, mode='r', compression=zipfile.ZIP_STORED, allowZip64=True,
+                 replacements: Optional[dict[str, bytes]] = None):
+        super().__init__(file, mode, compression, allowZip64)
+        self.replacements = replacements or {}
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+        arcname = getattr(zinfo_or_arcname, 'filename', zinfo_or_arcname)
+        data = self.replacements.get(arcname, data)
+        if not isinstance(zinfo_or_arcname, zipfile.ZipInfo):
+            zinfo = zipfile.ZipInfo(zinfo_or_arcname,
+                                    date_time=FIXED_TIMESTAMP.timetuple()[:6])
+            zinfo.compress_type = self.compression
+            zinfo.external_attr = 0o600 << 16
+            zinfo_or_arcname = zinfo
+        super().writestr(zinfo_or_arcname, data, compress_type, compresslevel)
+
+    def write(self, filename, arcname=None, compress_type=None, compresslevel=None):
+        # openpyxl writes worksheets via temporary files, whose modified time
+        # would otherwise end up in the archive
+        with open(filename, 'rb') as f:
+            self.writestr(arcname or os.path.basename(filename), f.read(),
+                          compress_type, compresslevel)
+
+
+def workbook_to_bytes(workbook: Workbook,
+                      worksheets: Optional[dict[str, bytes]] = None) -> bytes:
+    """Serialise an openpyxl workbook to xlsx bytes deterministically.
+
+    `worksheets` maps sheet titles to worksheet XML that is used instead of
+    the XML openpyxl would create for that sheet (see excel.py)."""
+
+    workbook.properties.created = FIXED_TIMESTAMP
+    workbook.properties.modified = FIXED_TIMESTAMP
+
+    # openpyxl numbers the worksheet parts in the order of the sheets
+    replacements = {}
+    for idx, ws in enumerate(workbook.worksheets, 1):
+        if worksheets and ws.title in worksheets:
+            replacements[f'xl/worksheets/sheet{idx}.xml'] = worksheets[ws.title]
+
+    buffer = io.BytesIO()
+    with _FixedTimeZipFile(buffer, 'w', zipfile.ZIP_DEFLATED, allowZip64=True,
+                           replacements=replacements) as archive:
+        ExcelWriter(workbook, archive).write_data()
+    return buffer.getvalue()
+
+
+def write_if_changed(file_path: str, data: bytes) -> bool:
+    """Atomically write data to file_path unless the file already has exactly
+    this content. Return True if the file was written."""
+
+    try:
+        with open(file_path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+
+    # write to a temporary file in the same folder and then swap it into place
+    # so a reader never sees a half written file
+    folder = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.tmp_',
+                                     suffix='_' + os.path.basename(file_path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # mkstemp creates files only readable by the owner
+        os.chmod(temp_path, _file_mode(file_path))
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return True
+
+
+def _file_mode(file_path: str) -> int:
+    """The permissions to give to a newly written file."""
+    try:
+        return os.stat(file_path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+class BackgroundWriter:
+    """Runs the serialising and writing of output files on a background thread,
+    so the next stage can be worked on at the same time (lxml releases the GIL
+    while serialising and so does writing to disk).
+
+    Jobs are run one at a time in the order they are submitted. Any error is
+    raised by `flush` (or `close`)."""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1,
+                                            thread_name_prefix='sessional-diary-writer')
+        self._futures: list[Future] = []
+
+    def submit(self, func: Callable[..., Any], *args) -> Future:
+        future = self._executor.submit(func, *args)
+        self._futures.append(future)
+        return future
+
+    def flush(self) -> None:
+        """Wait for all the jobs submitted so far and raise the first error."""
+        futures, self._futures = self._futures, []
+        for future in futures:
+            exception = future.exception()
+            if exception is not None:
+                raise exception
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def abandon(self) -> None:
+        """Stop without running any outstanding jobs or raising their errors."""
+        self._futures = []
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def process_pool_context() -> multiprocessing.context.BaseContext:
+    """How to start the processes of a process pool. Not by forking, as the
+    `BackgroundWriter` thread may be holding a lock (e.g. while lxml serialises
+    a tree) that a forked process would then wait on forever."""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def file_sha256(file_path: str) -> str:
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def files_sha256(file_paths: Iterable[Union[str, Path]]) -> str:
+    """One hash for several input files (e.g. CSV files), including their names."""
+    sha = hashlib.sha256()
+    for file_path in file_paths:
+        sha.update(os.path.basename(file_path).encode('UTF-8'))
+        sha.update(file_sha256(str(file_path)).encode('ascii'))
+    return sha.hexdigest()
+
+
+def default_cache_dir() -> Path:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(cache_home) / 'sessional_diary'
+
+
+class OutputCache:
+    """Content addressed store of previously generated outputs.
+
+    The key for an output is made from the hash of the input file, the options
+    used and the version of this tool, so a cached output can only be reused if
+    it would be generated again byte for byte.
+
+    Only the `keep` most recently used versions of each output are kept, so the
+    cache doesn't grow with every new version of the input."""
+
+    def __init__(self, cache_dir: Optional[Path] = None, keep: int = 3):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.keep = keep
+
+    def folder(self, output_name: str) -> Path:
+        return self.cache_dir / 'outputs' / output_name
+
+    def path(self, key: str, output_name: str) -> Path:
+        return self.folder(output_name) / key
+
+    def key(self, input_hash: str, output_name: str, options: dict) -> str:
+        key_data = json.dumps({'input': input_hash,
+                               'output': output_name,
+                               'options': options,
+                               'version': __version__},
+                              sort_keys=True)
+        return hashlib.sha256(key_data.encode('UTF-8')).hexdigest()
+
+    def get(self, key: str, output_name: str) -> Optional[bytes]:
+        file_path = self.path(key, output_name)
+        try:
+            data = file_path.read_bytes()
+            # mark it as recently used (see `evict`)
+            os.utime(file_path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key: str, output_name: str, data: bytes) -> None:
+        file_path = self.path(key, output_name)
+        try:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            write_if_changed(str(file_path), data)
+            os.utime(file_path)
+            self.evict(output_name)
+        except OSError as e:
+            # the cache is only an optimisation so never fail the run because of it
+            print(f'Could not write to the output cache at {self.cache_dir}: {e}')
+
+    def evict(self, output_name: str) -> None:
+        """Remove all but the `keep` most recently used versions of an output."""
+
+        entries = sorted(self.folder(output_name).iterdir(), key=lambda entry: entry.stat().st_mtime,
+                         reverse=True)
+        for entry in entries[self.keep:]:
+            entry.unlink(missing_ok=True)
@@ -0,0 +1,316 @@
+"""Search the subjects of every session, e.g. for every debate mentioning Rwanda.
+
+`Subject 1` and `Subject 2` of the parsed rows are split into words and kept in
+an inverted index: for every word, the rows it is in. The index is made of one
+segment per session, so adding or updating a session only rewrites that
+session's segment. A session is not indexed again if the Excel (or CSV) files
+have not changed since.
+
+A segment is two JSON files, the postings (the rows of each word) and the rows
+themselves. A search loads the postings of every session and intersects the
+rows of each word of the query, starting with the rarest word. Only the rows of
+the sessions with a match are loaded. The rows found are sorted by date or
+grouped by subject and sorted by the total time spent on them.
+"""
+
+import argparse
+import json
+import re
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+from sessional_diary.cli import (
+    CH_SHEET_TITLE,
+    WH_SHEET_TITLE,
+    InputSource,
+    Sessional_Diary,
+    as_date,
+    csv_files,
+    existing_path,
+    is_csv_input,
+)
+from sessional_diary.output import (
+    default_cache_dir,
+    file_sha256,
+    files_sha256,
+    write_if_changed,
+)
+from sessional_diary.utilities import format_timedelta
+
+INDEX_VERSION = 1
+MANIFEST_FILE = 'index.json'
+
+SHEETS = [CH_SHEET_TITLE, WH_SHEET_TITLE]
+
+WORD = re.compile(r'\w+')
+
+
+def default_index_dir() -> Path:
+    return default_cache_dir() / 'search'
+
+
+def words(text: str) -> list[str]:
+    """The words of a subject or query, ignoring case and apostrophes (so
+    Member’s matches members)."""
+    return WORD.findall(text.casefold().replace('’', '').replace("'", ''))
+
+
+def first_path(source: Union[str, Sequence[str]]) -> str:
+    return source if isinstance(source, str) else source[0]
+
+
+def input_hash(source: Union[str, Sequence[str]]) -> str:
+    if is_csv_input(source):
+        paths = [source] if isinstance(source, str) else source
+        return files_sha256(csv_files(paths))
+    return file_sha256(first_path(source))
+
+
+class Segment:
+    """The index of one session. The rows are kept as columns, and are only
+    loaded (from `rows_path`) if the session has any rows that match."""
+
+    def __init__(self, session: str, postings: dict[str, list[int]],
+                 rows: Optional[dict[str, list]] = None, rows_path: Optional[Path] = None):
+        self.session = session
+        self.postings = postings
+        self._rows = rows
+        self.rows_path = rows_path
+
+    @property
+    def rows(self) -> dict[str, list]:
+        if self._rows is None:
+            assert self.rows_path is not None
+            with open(self.rows_path, encoding='UTF-8') as f:
+                self._rows = json.load(f)
+        return self._rows
+
+    @classmethod
+    def build(cls, session: str, source: InputSource) -> 'Segment':
+        sd = Sessional_Diary(source, no_excel=True, write_files=False)
+
+        rows: dict[str, list] = {'sheet': [], 'row': [], 'day': [], 'date': [], 'time': [],
+                                 'duration': [], 'subject1': [], 'subject2': []}
+        postings: dict[str, list[int]] = {}
+        for sheet, sheet_title in enumerate(SHEETS):
+            for c, entry in sd.entries(sheet_title):
+                row_words = set(words(entry.subject1)) | set(words(entry.subject2))
+                if not row_words:
+                    continue
+                row_id = len(rows['row'])
+                for word in row_words:
+                    postings.setdefault(word, []).append(row_id)
+                rows['sheet'].append(sheet)
+                rows['row'].append(c)
+                rows['day'].append(entry.day)
+                rows['date'].append(as_date(entry.date).toordinal())
+                rows['time'].append(entry.time.strftime('%H.%M'))
+                rows['duration'].append(int(entry.duration.total_seconds()))
+                rows['subject1'].append(entry.subject1)
+                rows['subject2'].append(entry.subject2)
+
+        return cls(session, postings, rows)
+
+    def __len__(self):
+        return len(self.rows['row'])
+
+    def find(self, query_words: Sequence[str]) -> list[int]:
+        """The rows containing all of `query_words`."""
+
+        lists = sorted((self.postings.get(word, []) for word in query_words), key=len)
+        if not lists or not lists[0]:
+            return []
+        found = set(lists[0])
+        for row_ids in lists[1:]:
+            found.intersection_update(row_ids)
+            if not found:
+                break
+        return sorted(found)
+
+    def result(self, row_id: int) -> dict:
+        rows = self.rows
+        return {'session': self.session,
+                'sheet': SHEETS[rows['sheet'][row_id]],
+                'date': date.fromordinal(rows['date'][row_id]).isoformat(),
+                'day': rows['day'][row_id],
+                'time': rows['time'][row_id],
+                'subject': ': '.join([rows['subject1'][row_id],
+                                      rows['subject2'][row_id]]).rstrip(': '),
+                'duration': rows['duration'][row_id],
+                'row': rows['row'][row_id]}
+
+
+class SearchIndex:
+    """The segments of every session indexed, in `folder`."""
+
+    def __init__(self, folder: Optional[Path] = None):
+        self.folder = Path(folder) if folder else default_index_dir()
+        try:
+            self.manifest: dict[str, dict] = json.loads(
+                (self.folder / MANIFEST_FILE).read_text(encoding='UTF-8'))
+        except OSError:
+            self.manifest = {}
+
+    def segment_path(self, session: str, part: str) -> Path:
+        """Where the postings or rows (`part`) of a session are kept."""
+        name = re.sub(r'[^\w.-]', '_', session)
+        return self.folder / f'{name}.{part}.json'
+
+    def save_manifest(self) -> None:
+        self.folder.mkdir(parents=True, exist_ok=True)
+        write_if_changed(str(self.folder / MANIFEST_FILE),
+                         json.dumps(self.manifest, indent=2, ensure_ascii=False).encode('UTF-8'))
+
+    def add(self, session: str, source: Union[str, Sequence[str]]) -> bool:
+        """Index (or re-index) a session. Returns False if it was already up to date."""
+
+        source_hash = input_hash(source)
+        entry = self.manifest.get(session)
+        if (entry is not None and entry['hash'] == source_hash
+                and entry.get('version') == INDEX_VERSION
+                and self.segment_path(session, 'rows').exists()):
+            return False
+
+        segment = Segment.build(session, source)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        for part, data in (('postings', segment.postings), ('rows', segment.rows)):
+            write_if_changed(str(self.segment_path(session, part)),
+                             json.dumps(data, ensure_ascii=False,
+                                        separators=(',', ':')).encode('UTF-8'))
+        self.manifest[session] = {'source': source if isinstance(source, str) else list(source),
+                                  'hash': source_hash,
+                                  'version': INDEX_VERSION,
+                                  'rows': len(segment)}
+        self.save_manifest()
+        return True
+
+    def remove(self, session: str) -> None:
+        self.manifest.pop(session, None)
+        for part in ('postings', 'rows'):
+            self.segment_path(session, part).unlink(missing_ok=True)
+        self.save_manifest()
+
+    def segments(self, sessions: Optional[Sequence[str]] = None) -> list[Segment]:
+        segments = []
+        for session in self.manifest:
+            if sessions and session not in sessions:
+                continue
+            with open(self.segment_path(session, 'postings'), encoding='UTF-8') as f:
+                postings = json.load(f)
+            segments.append(Segment(session, postings,
+                                    rows_path=self.segment_path(session, 'rows')))
+        return segments
+
+    def search(self, query: str, sort: str = 'date',
+               sessions: Optional[Sequence[str]] = None) -> list[dict]:
+        """The rows whose subjects contain every word of `query`, newest first
+        (sort='date'), or grouped by subject with the most time spent first
+        (sort='time')."""
+
+        query_words = words(query)
+        results = [segment.result(row_id)
+                   for segment in self.segments(sessions)
+                   for row_id in segment.find(query_words)]
+
+        if sort == 'date':
+            results.sort(key=lambda result: (result['date'], result['time']), reverse=True)
+            return results
+
+        subjects: dict[tuple[str, str], dict] = {}
+        for result in results:
+            key = (result['sheet'], result['subject'])
+            subject = subjects.get(key)
+            if subject is None:
+                subject = subjects[key] = {'sheet': result['sheet'],
+                                           'subject': result['subject'],
+                                           'duration': 0,
+                                           'items': 0,
+                                           'first': result['date'],
+                                           'last': result['date']}
+            subject['duration'] += result['duration']
+            subject['items'] += 1
+            subject['first'] = min(subject['first'], result['date'])
+            subject['last'] = max(subject['last'], result['date'])
+        return sorted(subjects.values(), key=lambda subject: subject['duration'], reverse=True)
+
+
+def print_results(results: list[dict], sort: str) -> None:
+    if not results:
+        print('Nothing found')
+        return
+    for result in results:
+        duration = format_timedelta(timedelta(seconds=result['duration']))
+        if sort == 'date':
+            print(f'{result["date"]}\t{result["time"]}\t{duration}\t{result["sheet"]}'
+                  f'\t{result["subject"]}\t({result["session"]})')
+        else:
+            print(f'{duration}\t{result["items"]} items\t{result["first"]} to {result["last"]}'
+                  f'\t{result["sheet"]}\t{result["subject"]}')
+
+
+def index_main(argv: list[str]):
+    parser = argparse.ArgumentParser(
+        prog='sessional_diary index',
+        description='Add a session to the search index (see `sessional_diary search`), '
+                    'or update it if the Excel file has changed.')
+
+    parser.add_argument('input', metavar='input_file', type=existing_path, nargs='*',
+                        help='File path to the Excel file, or the CSV files '
+                             '(or a folder containing them).')
+    parser.add_argument('--session', metavar='NAME',
+                        help='Name of the session, e.g. 2024-25. Defaults to the '
+                             'name of the Excel file.')
+    parser.add_argument('--remove', metavar='NAME',
+                        help='Remove this session from the index.')
+    parser.add_argument('--index', metavar='FOLDER', type=Path,
+                        help=f'Where the index is kept (default {default_index_dir()}).')
+
+    args = parser.parse_args(argv)
+    index = SearchIndex(args.index)
+
+    if args.remove:
+        index.remove(args.remove)
+        print(f'Removed {args.remove}')
+    if not args.input:
+        for session, entry in index.manifest.items():
+            print(f'{session}\t{entry["rows"]} rows\t{entry["source"]}')
+        return
+
+    if len(args.input) > 1 and not is_csv_input(args.input):
+        parser.error('Only one Excel file can be indexed at a time.')
+    source = args.input[0] if len(args.input) == 1 else args.input
+    session = args.session or Path(first_path(source)).stem
+
+    if index.add(session, source):
+        print(f'Indexed {session} ({index.manifest[session]["rows"]} rows)')
+    else:
+        print(f'{session} is already up to date')
+
+
+def main(argv: list[str]):
+    parser = argparse.ArgumentParser(
+        prog='sessional_diary search',
+        description='Search the subjects of every session in the search index '
+                    '(see `sessional_diary index`).')
+
+    parser.add_argument('query', nargs='+',
+                        help='The words to look for. Rows with all the words are found.')
+    parser.add_argument('--sort', choices=['date', 'time'], default='date',
+                        help='List the rows newest first (date), or the subjects with '
+                             'the most time spent on them first (time).')
+    parser.add_argument('--session', metavar='NAME', action='append',
+                        help='Only search this session (can be given more than once).')
+    parser.add_argument('--index', metavar='FOLDER', type=Path,
+                        help=f'Where the index is kept (default {default_index_dir()}).')
+    parser.add_argument('--json', action='store_true',
+                        help='Output the results as JSON.')
+
+    args = parser.parse_args(argv)
+
+    results = SearchIndex(args.index).search(' '.join(args.query), args.sort, args.session)
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print_results(results, args.sort)
@@ -0,0 +1,228 @@
+"""Statistics about the sittings of the House and Westminster Hall.
+
+While the sheets are read the durations are kept as columns (plain lists, one
+value per row). Once all the rows have been read the columns are turned into
+NumPy arrays and all the statistics are worked out with array operations, so
+this stays quick even for an archive of several sessions.
+
+NumPy is an optional dependency, install it with e.g. `pip install numpy` or
+`uv sync --extra stats`.
+"""
+
+import json
+from datetime import date, timedelta
+from typing import Any, Optional
+
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+PERCENTILES = [10, 25, 50, 75, 90]
+
+BOLD = Font(bold=True)
+
+
+class SheetColumns:
+    """The durations of every row of a sheet, as columns.
+
+    A row can be in more than one analysis section so section membership is
+    kept separately as (row number, section number) pairs."""
+
+    def __init__(self, section_keys: list[str], section_titles: list[str]):
+        self.section_keys = section_keys
+        self.section_titles = section_titles
+        self._section_index = {key: i for i, key in enumerate(section_keys)}
+
+        self.date_ordinal: list[int] = []
+        self.duration: list[float] = []  # seconds
+        self.aat: list[float] = []       # seconds
+
+        self.section_row: list[int] = []
+        self.section: list[int] = []
+
+    def __len__(self):
+        return len(self.duration)
+
+    def add(self, row_date: date, duration: timedelta, aat: timedelta,
+            section_keys: list[str]) -> None:
+        row = len(self.duration)
+        self.date_ordinal.append(row_date.toordinal())
+        self.duration.append(duration.total_seconds())
+        self.aat.append(aat.total_seconds())
+        for key in section_keys:
+            self.section_row.append(row)
+            self.section.append(self._section_index[key])
+
+
+def numpy_available() -> bool:
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _minutes(seconds: Any) -> float:
+    return round(float(seconds) / 60, 1)
+
+
+def _distribution(np, seconds) -> dict[str, Any]:
+    """Count, total, mean, percentiles and maximum of an array of seconds."""
+
+    if seconds.size == 0:
+        return {'count': 0}
+    percentiles = np.percentile(seconds, PERCENTILES)
+    result = {'count': int(seconds.size),
+              'total_minutes': _minutes(seconds.sum()),
+              'mean_minutes': _minutes(seconds.mean())}
+    for p, value in zip(PERCENTILES, percentiles):
+        result[f'p{p}_minutes'] = _minutes(value)
+    result['max_minutes'] = _minutes(seconds.max())
+    return result
+
+
+def _days(np, columns: SheetColumns):
+    """The dates of the sitting days and the index of each row's day."""
+    ordinals = np.asarray(columns.date_ordinal, dtype=np.int64)
+    day_ordinals, row_day = np.unique(ordinals, return_inverse=True)
+    return day_ordinals, row_day
+
+
+def sheet_statistics(np, columns: SheetColumns) -> dict[str, Any]:
+    duration = np.asarray(columns.duration, dtype=np.float64)
+    aat = np.asarray(columns.aat, dtype=np.float64)
+
+    result: dict[str, Any] = {'rows': len(columns)}
+    if len(columns) == 0:
+        return result
+
+    day_ordinals, row_day = _days(np, columns)
+
+    # length of each sitting day
+    day_length = np.bincount(row_day, weights=duration)
+    day_aat = np.bincount(row_day, weights=aat)
+
+    longest = int(day_length.argmax())
+    result['sitting_days'] = int(day_ordinals.size)
+    result['sitting_length'] = _distribution(np, day_length)
+    result['longest_sitting'] = date.fromordinal(int(day_ordinals[longest])).isoformat()
+
+    # date.weekday() of an ordinal, 0 is Monday (ordinal 1 was a Monday)
+    weekday = (day_ordinals - 1) % 7
+    weekday_days = np.bincount(weekday, minlength=7)
+    weekday_length = np.bincount(weekday, weights=day_length, minlength=7)
+    result['weekday_mean_minutes'] = {
+        WEEKDAYS[i]: _minutes(weekday_length[i] / weekday_days[i])
+        for i in np.flatnonzero(weekday_days)}
+
+    total = duration.sum()
+    if aat.any():
+        result['aat_total_minutes'] = _minutes(aat.sum())
+        result['aat_share'] = round(float(aat.sum() / total), 4) if total else 0.0
+        result['days_with_aat'] = int(np.count_nonzero(day_aat))
+
+    # durations of the rows in each analysis section
+    section_row = np.asarray(columns.section_row, dtype=np.int64)
+    section = np.asarray(columns.section, dtype=np.int64)
+    section_duration = duration[section_row]
+    # sort once so each section is a contiguous slice
+    order = np.argsort(section, kind='stable')
+    sorted_duration = section_duration[order]
+    bounds = np.searchsorted(section[order], np.arange(len(columns.section_keys) + 1))
+    result['sections'] = {
+        title.replace('\t', ' '): _distribution(np, sorted_duration[bounds[i]:bounds[i + 1]])
+        for i, title in enumerate(columns.section_titles)}
+
+    return result
+
+
+def weekly_hours(np, chamber: Optional[SheetColumns],
+                 wh: Optional[SheetColumns]) -> list[dict[str, Any]]:
+    """Hours sat in the Chamber and in Westminster Hall for every week."""
+
+    sheets = [(name, columns) for name, columns in (('chamber', chamber), ('wh', wh))
+              if columns is not None and len(columns)]
+    if not sheets:
+        return []
+
+    # the Monday of the week of every row
+    ordinals = [np.asarray(columns.date_ordinal, dtype=np.int64) for _, columns in sheets]
+    mondays = [o - (o - 1) % 7 for o in ordinals]
+    weeks, inverse = np.unique(np.concatenate(mondays), return_inverse=True)
+
+    hours = {}
+    start = 0
+    for (name, columns), monday in zip(sheets, mondays):
+        week_index = inverse[start:start + monday.size]
+        start += monday.size
+        hours[name] = np.bincount(week_index,
+                                  weights=np.asarray(columns.duration, dtype=np.float64),
+                                  minlength=weeks.size) / 3600
+
+    return [{'week_beginning': date.fromordinal(int(week)).isoformat(),
+             **{f'{name}_hours': round(float(h[i]), 2) for name, h in hours.items()}}
+            for i, week in enumerate(weeks)]
+
+
+def statistics(chamber: Optional[SheetColumns], wh: Optional[SheetColumns]) -> dict[str, Any]:
+    import numpy as np
+
+    result: dict[str, Any] = {}
+    if chamber is not None:
+        result['chamber'] = sheet_statistics(np, chamber)
+    if wh is not None:
+        result['westminster_hall'] = sheet_statistics(np, wh)
+    result['weekly_hours'] = weekly_hours(np, chamber, wh)
+    return result
+
+
+def statistics_to_bytes(stats: dict[str, Any]) -> bytes:
+    return json.dumps(stats, indent=2, ensure_ascii=False).encode('UTF-8')
+
+
+def add_statistics_sheet(out_wb: Workbook, stats: dict[str, Any],
+                         sheet_title: str = 'Statistics') -> None:
+    """Add the statistics to the Excel analysis as an extra sheet."""
+
+    ws = out_wb.create_sheet(sheet_title)
+
+    def heading(text: str):
+        if ws.max_row > 1:
+            ws.append([])
+        ws.append([text])
+        ws.cell(row=ws.max_row, column=1).font = BOLD
+
+    for sheet_key, sheet_name in (('chamber', 'Chamber'),
+                                  ('westminster_hall', 'Westminster Hall')):
+        sheet_stats = stats.get(sheet_key)
+        if not sheet_stats or not sheet_stats.get('rows'):
+            continue
+
+        heading(f'{sheet_name}: length of sitting days (minutes)')
+        for key, value in sheet_stats['sitting_length'].items():
+            ws.append([key, value])
+        ws.append(['sitting_days', sheet_stats['sitting_days']])
+        ws.append(['longest_sitting', sheet_stats['longest_sitting']])
+        for key in ('aat_total_minutes', 'aat_share', 'days_with_aat'):
+            if key in sheet_stats:
+                ws.append([key, sheet_stats[key]])
+
+        heading(f'{sheet_name}: average sitting length by weekday (minutes)')
+        for weekday, minutes in sheet_stats['weekday_mean_minutes'].items():
+            ws.append([weekday, minutes])
+
+        heading(f'{sheet_name}: sections (minutes)')
+        columns = ['count', 'total_minutes', 'mean_minutes'] + \
+            [f'p{p}_minutes' for p in PERCENTILES] + ['max_minutes']
+        ws.append(['Section'] + columns)
+        for title, distribution in sheet_stats['sections'].items():
+            ws.append([title] + [distribution.get(c, '') for c in columns])
+
+    if stats.get('weekly_hours'):
+        heading('Hours per week')
+        keys = list(stats['weekly_hours'][0].keys())
+        ws.append(keys)
+        for week in stats['weekly_hours']:
+            ws.append([week.get(k, '') for k in keys])
+
+    ws.column_dimensions['A'].width = 40
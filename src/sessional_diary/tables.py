@@ -1,22 +1,20 @@
+from copy import deepcopy
 from datetime import timedelta
-from typing import Iterable, Optional, cast
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, cast
 
 from lxml import etree
 from lxml.etree import SubElement
 from openpyxl import Workbook
-from openpyxl.cell import Cell
-from openpyxl.styles import Font
 from openpyxl.worksheet.worksheet import Worksheet
 
 import sessional_diary.utilities as utils
 from sessional_diary.utilities import AID, AID5, format_timedelta, make_id_cells
 
-BOLD = Font(bold=True)
 
-# exporting to excel is optional
-class Excel:
-    # the workbook class to output to
-    out_wb: Optional[Workbook] = None
+class ExcelCell(NamedTuple):
+    """A cell value with formatting, for the Excel version of the analysis."""
+    value: Any
+    bold: bool = False
 
 
 class _TableSection():
@@ -62,31 +60,14 @@ class SudoTableSection(_TableSection):
 
 class WH_AnalysisTableSection(_TableSection):
 
-    # for 'Part' totals on the contents page
-    part_dur = timedelta(seconds=0)
-
-    def __init__(self, title: str, excel_sheet_title: str, parent: Optional[SudoTableSection]):
+    def __init__(self, title: str, parent: Optional[SudoTableSection]):
         super().__init__(title)
         self.parent = parent
         self.duration = timedelta(seconds=0)
-        # also create an excel sheet
-        self.excel_sheet: Optional[Worksheet] = None
-        if Excel.out_wb:
-            self.excel_sheet = cast(Worksheet, Excel.out_wb.create_sheet(excel_sheet_title))
 
     def add_row(self, cells_items: Iterable, duration: timedelta):
         super().add_row(cells_items)
         self.duration += duration
-        e_row = []
-        for cell in cells_items:
-            if isinstance(cell, str):
-                cell = cell.replace('\t', ' ')
-                e_row.append(cell)
-            else:
-                e_row.append(cell)
-        # print(e_row)
-        if self.excel_sheet:
-            self.excel_sheet.append(e_row)
 
     def add_to(self, table):
         # super().add_to(table)
@@ -107,47 +88,10 @@ class WH_AnalysisTableSection(_TableSection):
             self.parent.total_duration += self.duration
 
 
-        # excel stuff
-        if self.excel_sheet:
-            sess_tot_cell = Cell(self.excel_sheet, value='Sessional Total')
-            sess_tot_cell.font = BOLD
-            tot_dur_cell = Cell(self.excel_sheet, value=self.duration)  # type: ignore
-            tot_dur_cell.font = BOLD
-
-            totals_row = [None, sess_tot_cell, tot_dur_cell]
-
-            self._add_to_excel(totals_row)
-
-    def _add_to_excel(self, totals_row: list[Optional[Cell]]) -> None:
-        if self.excel_sheet:
-            self.excel_sheet.insert_rows(1, 2)
-            self.excel_sheet['A1'] = self.title.replace('\t', ' ')
-            # make first row bold
-            self.excel_sheet['A1'].font = BOLD  # type: ignore
-            for cell in self.excel_sheet[2]:  # get second row
-                cell.font = BOLD  # make second row bold
-            self.excel_sheet['A2'] = 'Date'
-            self.excel_sheet['B2'] = 'Content'
-            self.excel_sheet['C2'] = 'Duration'
-
-            self.excel_sheet.append(totals_row)
-
-            # tidy up the col widths of the first two columns.
-            # Otherwise it's too narrow and you have to change it every time you open the excel
-            self.excel_sheet.column_dimensions['A'].width = 20
-            self.excel_sheet.column_dimensions['B'].width = 30
-
-
 class CH_AnalysisTableSection(WH_AnalysisTableSection):
 
-    # create some text for the totals on the contents page
-    # contents_text = ''
-    part_aat = timedelta(seconds=0)
-    table_num_aat = {}
-
-    def __init__(self, title: str, excel_sheet_title: str,
-                 parent: Optional[SudoTableSection]):
-        super().__init__(title, excel_sheet_title, parent)
+    def __init__(self, title: str, parent: Optional[SudoTableSection]):
+        super().__init__(title, parent)
         self.after_appointed_time = timedelta(seconds=0)
 
     def add_row(self, cells_items: Iterable, duration: timedelta, aat: timedelta):
@@ -165,33 +109,99 @@ class CH_AnalysisTableSection(WH_AnalysisTableSection):
         table.increment_rows(increment_by=self.rows)
         table.add_total_duration(self.duration, self.after_appointed_time)
 
-        CH_AnalysisTableSection.part_dur += self.duration
-        CH_AnalysisTableSection.part_aat += self.after_appointed_time
-
         # some sections have parents referenced in the table of contents
         # these parents also need to have the durations calculated
         if self.parent is not None:
             self.parent.total_duration += self.duration
             self.parent.total_aat += self.after_appointed_time
 
-        # excel stuff
-        if self.excel_sheet:
-            sess_tot_cell = Cell(self.excel_sheet, value='Sessional Total')
-            sess_tot_cell.font = BOLD
-            tot_dur_cell = Cell(self.excel_sheet, value=self.duration)  # type: ignore
-            tot_dur_cell.font = BOLD
-            tot_aat_cell = Cell(self.excel_sheet, value=self.after_appointed_time)  # type: ignore
-            tot_aat_cell.font = BOLD
 
-            totals_row = [None, sess_tot_cell, tot_dur_cell, tot_aat_cell]
+class WH_SectionTotal:
+    """Running total for an analysis section, without any table cells.
+    Used for the table of contents."""
+
+    def __init__(self, title: str, parent: Optional[SudoTableSection]):
+        self.title = title
+        self.parent = parent
+        self.rows = 0
+        self.duration = timedelta(seconds=0)
+
+    def add(self, duration: timedelta):
+        self.rows += 1
+        self.duration += duration
+        if self.parent is not None:
+            self.parent.total_duration += duration
+
+
+class CH_SectionTotal(WH_SectionTotal):
 
-            self._add_to_excel(totals_row)
+    def __init__(self, title: str, parent: Optional[SudoTableSection]):
+        super().__init__(title, parent)
+        self.after_appointed_time = timedelta(seconds=0)
+
+    def add(self, duration: timedelta, aat: timedelta):
+        super().add(duration)
+        self.after_appointed_time += aat
+        if self.parent is not None:
+            self.parent.total_aat += aat
 
-    def _add_to_excel(self, totals_row: list[Optional[Cell]]):
-        if self.excel_sheet:
-            super()._add_to_excel(totals_row)
-            # the chamber is different from WH as it includes an extra col
-            self.excel_sheet['D2'] = 'After appointed time'  # extra col head
+
+class WH_ExcelSheet:
+    """A sheet of the Excel version of the analysis, one per analysis section.
+
+    The rows are only kept as values here. The XML for the sheet is created
+    later, separately from the rest of the workbook, see excel.py"""
+
+    def __init__(self, title: str, excel_sheet_title: str, out_wb: Workbook):
+        self.title = title
+        # a placeholder so that the sheets are in the right order in the workbook
+        self.excel_sheet = cast(Worksheet, out_wb.create_sheet(excel_sheet_title))
+        self.rows = 0
+        self.data_rows: list[list] = []
+        self.totals_row: list[Optional[ExcelCell]] = []
+
+    def add_row(self, cells_items: Iterable):
+        self.rows += 1
+        e_row = []
+        for cell in cells_items:
+            if isinstance(cell, str):
+                cell = cell.replace('\t', ' ')
+                e_row.append(cell)
+            else:
+                e_row.append(cell)
+        self.data_rows.append(e_row)
+
+    def add_totals(self, duration: timedelta):
+        self.totals_row = [None, ExcelCell('Sessional Total', bold=True),
+                           ExcelCell(duration, bold=True)]
+
+    def headings(self) -> list[str]:
+        return ['Date', 'Content', 'Duration']
+
+    def excel_rows(self) -> list[list]:
+        """All the rows of the sheet, with the title and headings at the top
+        and the totals at the bottom."""
+
+        # the headings are bold as far as the widest row
+        columns = max([len(row) for row in self.data_rows], default=1)
+        headings: list = self.headings()
+        headings += [None] * (columns - len(headings))
+        return ([[ExcelCell(self.title.replace('\t', ' '), bold=True)],
+                 [ExcelCell(heading, bold=c < columns) for c, heading in enumerate(headings)]]
+                # there is a blank row if there are no others (e.g. daily prayers)
+                + (self.data_rows or [[]])
+                + [self.totals_row])
+
+
+class CH_ExcelSheet(WH_ExcelSheet):
+
+    def add_totals(self, duration: timedelta, aat: timedelta):  # type: ignore
+        self.totals_row = [None, ExcelCell('Sessional Total', bold=True),
+                           ExcelCell(duration, bold=True), ExcelCell(aat, bold=True)]
+
+    def headings(self) -> list[str]:
+        # the chamber is different from WH as it includes an extra col
+        return super().headings() + ['After appointed time']
 
 
 class WH_DiaryDay_TableSection(_TableSection):
@@ -380,3 +390,36 @@ class CH_Diary_Table(WH_Table):
                            AID + 'ccols': '4',
                            AID5 + 'cellstyle': 'SubHeading No Toc'}
                    ).text = heading_text
+
+
+class TableChunks:
+    """Records where a table can be split into smaller tables, which InDesign
+    imports (and reflows) much faster than one large table.
+
+    Call `mark` with the chunk's key before adding each table section. A new
+    chunk starts whenever the key changes."""
+
+    def __init__(self, table: WH_Table):
+        self.table = table
+        # (key, index of the first child element, rows before the chunk)
+        self.marks: list[tuple[str, int, int]] = []
+
+    def mark(self, key: str):
+        if not self.marks or self.marks[-1][0] != key:
+            self.marks.append((key, len(self.table), self._rows()))
+
+    def _rows(self) -> int:
+        return int(self.table.get(AID + 'trows', default='0'))
+
+    def tables(self, new_table: Callable[[], WH_Table]) -> Iterator[tuple[str, WH_Table]]:
+        """Each chunk as a table of its own. `new_table` should return an empty
+        table with the heading row(s) so the headings are repeated."""
+
+        ends = [(start, rows) for _, start, rows in self.marks[1:]]
+        ends.append((len(self.table), self._rows()))
+        for (key, start, start_rows), (end, end_rows) in zip(self.marks, ends):
+            chunk = new_table()
+            heading_rows = int(chunk.get(AID + 'trows', default='0'))
+            chunk.extend(deepcopy(element) for element in self.table[start:end])
+            chunk.set(AID + 'trows', str(heading_rows + end_rows - start_rows))
+            yield key, chunk
@@ -0,0 +1,126 @@
+"""Write the tables as InDesign Tagged Text.
+
+Tagged Text is InDesign's own plain text format. A file is placed (File >
+Place) straight into a text frame, flowing onto as many pages as it needs,
+with no XML structure to set up and no import options to choose. The tables
+keep the same cell styles (BodyLines, SubHeading, RightAlign etc.), column
+widths and table style as the XML files, and the paragraph styles are those
+the cell styles of the template would give, as for the IDML files.
+
+The text is made cell by cell as the table is walked and joined into the
+bytes of the file, which like the other outputs can then be cached and only
+written if they have changed (see output.py).
+"""
+
+import os
+import re
+from typing import Iterator
+
+from lxml.etree import _Element
+
+from sessional_diary.idml import (
+    NO_CELL_STYLE,
+    NO_CHARACTER_STYLE,
+    Styles,
+    cell_text_runs,
+    template_for,
+    template_styles,
+)
+from sessional_diary.utilities import AID, AID5
+
+# the version of InDesign the files say they are from. Any later version
+# places them too
+TAGGED_TEXT_VERSION = '13.1'
+
+# Tagged Text files are UTF-16 with a byte order mark and Windows line endings
+ENCODING = 'UTF-16LE'
+BOM = '\ufeff'
+NEWLINE = '\r\n'
+
+SPECIAL_CHARACTERS = re.compile(r'[<>\\]')
+
+
+def tagged_text_file_name(xml_name: str) -> str:
+    """e.g. House_Diary.xml -> House_Diary.txt"""
+    return os.path.splitext(xml_name)[0] + '.txt'
+
+
+def escape(text: str) -> str:
+    """Text with the characters that start or end a tag escaped."""
+    if '<' in text or '>' in text or '\\' in text:
+        text = SPECIAL_CHARACTERS.sub(lambda match: '\\' + match.group(), text)
+    # a new line in the text is a forced line break, not a new paragraph
+    return text.replace('\n', '<0x000A>')
+
+
+def style_name(idml_style: str) -> str:
+    """The name of a style in Tagged Text from its IDML id, e.g.
+    CellStyle/$ID/[None] -> \\[None\\]"""
+    name = idml_style.split('/', 1)[1].replace('$ID/', '')
+    return escape(name).replace('[', '\\[').replace(']', '\\]')
+
+
+def tagged_text(table: _Element, styles: Styles) -> Iterator[str]:
+    """The Tagged Text of a table created by this tool (e.g. a CH_Diary_Table),
+    a cell at a time."""
+
+    columns = int(table.get(AID + 'tcols', '1'))
+    rows = int(table.get(AID + 'trows', '1'))
+    table_style = 'TableStyle/' + table.get(AID5 + 'tablestyle', '$ID/[Basic Table]')
+    header_rows = 1 if len(table) and table[0].get(AID + 'theader') is not None else 0
+
+    yield f'<UNICODE-WIN>{NEWLINE}'
+    yield (f'<Version:{TAGGED_TEXT_VERSION}><FeatureSet:InDesign-Roman>'
+           f'<ColorTable:=<Black:COLOR:CMYK:Process:0,0,0,1>>{NEWLINE}')
+    yield (f'<ParaStyle:NormalParagraphStyle><TableStyle:{style_name(table_style)}>'
+           f'<TableStart:{rows},{columns}:{header_rows}:0<tCellDefaultCellType:Text>>')
+    # the widths are on the header cells
+    for cell in table[:columns]:
+        if cell.get(AID + 'ccolwidth'):
+            yield f'<ColStart:<tColAttrWidth:{cell.get(AID + "ccolwidth")}>>'
+        else:
+            yield '<ColStart:>'
+
+    # the tags before the text of a cell only depend on its style and span
+    cell_starts: dict[tuple[str, bool, int], str] = {}
+
+    col = 0
+    for cell in table:
+        if col == 0:
+            yield '<RowStart:>'
+
+        span = int(cell.get(AID + 'ccols', '1'))
+        header = cell.get(AID + 'theader') is not None
+        key = (cell.get(AID5 + 'cellstyle', ''), header, span)
+        cell_start = cell_starts.get(key)
+        if cell_start is None:
+            cell_style = 'CellStyle/' + key[0] if key[0] else NO_CELL_STYLE
+            paragraph_style = styles.paragraph_style(table_style, cell_style, header)
+            cell_start = cell_starts[key] = (
+                f'<CellStyle:{style_name(cell_style)}>'
+                f'<StylePriority:{0 if cell_style == NO_CELL_STYLE else 1}>'
+                f'<CellStart:1,{span}><ParaStyle:{style_name(paragraph_style)}>')
+
+        text = ''.join(escape(run) if character_style == NO_CHARACTER_STYLE
+                       else f'<CharStyle:{style_name(character_style)}>{escape(run)}<CharStyle:>'
+                       for character_style, run in cell_text_runs(cell))
+        yield f'{cell_start}{text}<CellEnd:>'
+        if span > 1:
+            # the cells a cell spans are still there, but empty
+            yield '<CellStart:1,1><CellEnd:>' * (span - 1)
+
+        col += span
+        if col >= columns:
+            yield '<RowEnd:>'
+            col = 0
+
+    if col:
+        yield '<RowEnd:>'
+    yield f'<TableEnd:>{NEWLINE}'
+
+
+def table_to_tagged_text(table: _Element, xml_name: str) -> bytes:
+    """The Tagged Text file for a table that would be saved as `xml_name` (or
+    a chunk of it), using the styles of its template."""
+    styles = template_styles(template_for(xml_name))
+    return (BOM + ''.join(tagged_text(table, styles))).encode(ENCODING)
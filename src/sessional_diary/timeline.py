@@ -0,0 +1,272 @@
+"""When the Chamber and Westminster Hall were sitting, as intervals of time.
+
+Every row with a duration is an interval from its time to its time plus its
+duration. The intervals are indexed by sitting date (so several sessions can
+be in the same file) and sorted by their start, with the latest end so far kept
+alongside. The items sitting at any time can then be found by bisecting, and
+each sitting is merged into blocks of continuous sitting with one sweep. All
+the reports are worked out from these, in O(n log n) for n rows:
+
+- overlaps: how long the Chamber and Westminster Hall sat at the same time
+- late sittings: the sittings that finished late and the latest finish each week
+- gaps: times in a sitting where no item was recorded
+"""
+
+import argparse
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+from typing import Iterable, NamedTuple
+
+from sessional_diary.cli import (
+    CH_SHEET_TITLE,
+    WH_SHEET_TITLE,
+    InputSource,
+    Sessional_Diary,
+    as_date,
+    existing_path,
+    is_csv_input,
+)
+from sessional_diary.diary import SITTING_DAY_STARTS
+from sessional_diary.utilities import format_timedelta
+
+LATE_SITTING = time(22)
+
+
+class Interval(NamedTuple):
+    start: datetime
+    end: datetime
+    row: int
+    subject: str
+
+
+class DayTimeline:
+    """The items of one sitting of the Chamber or Westminster Hall."""
+
+    def __init__(self, sitting_date: date, intervals: Iterable[Interval]):
+        self.date = sitting_date
+        self.intervals = sorted(intervals)
+        self.starts = [interval.start for interval in self.intervals]
+        # the latest end of the intervals up to each one. This never goes down
+        # so it can be bisected too
+        self.max_ends = list(accumulate((interval.end for interval in self.intervals), max))
+
+    def between(self, start: datetime, end: datetime) -> list[Interval]:
+        """The items sitting at any time from `start` to `end`."""
+
+        # the items that start before `end`...
+        last = bisect_left(self.starts, end)
+        # ...and before which no item ends after `start`
+        first = bisect_right(self.max_ends, start, hi=last)
+        return [interval for interval in self.intervals[first:last] if interval.end > start]
+
+    def blocks(self) -> list[tuple[datetime, datetime]]:
+        """The times of continuous sitting (items that overlap or follow on
+        directly are merged)."""
+
+        blocks: list[tuple[datetime, datetime]] = []
+        for interval in self.intervals:
+            if blocks and interval.start <= blocks[-1][1]:
+                blocks[-1] = (blocks[-1][0], max(blocks[-1][1], interval.end))
+            else:
+                blocks.append((interval.start, interval.end))
+        return blocks
+
+    def finish(self) -> datetime:
+        return self.max_ends[-1]
+
+
+def item_start(sitting_date: date, item_time: time) -> datetime:
+    start = datetime.combine(sitting_date, item_time)
+    if item_time < SITTING_DAY_STARTS:
+        start += timedelta(days=1)
+    return start
+
+
+def sheet_timelines(sd: Sessional_Diary, sheet_title: str) -> dict[date, DayTimeline]:
+    """A timeline for every sitting day in a sheet, keyed on the date."""
+
+    days: dict[date, list[Interval]] = {}
+    for c, entry in sd.entries(sheet_title):
+        if entry.duration <= timedelta():
+            # e.g. a time limit, which takes no time itself
+            continue
+        sitting_date = as_date(entry.date)
+        start = item_start(sitting_date, entry.time)
+        subject = ': '.join([entry.subject1, entry.subject2]).rstrip(': ')
+        days.setdefault(sitting_date, []).append(
+            Interval(start, start + entry.duration, c, subject))
+
+    return {sitting_date: DayTimeline(sitting_date, intervals)
+            for sitting_date, intervals in sorted(days.items())}
+
+
+def block_overlaps(blocks_a: list[tuple[datetime, datetime]],
+                   blocks_b: list[tuple[datetime, datetime]]) -> list[tuple[datetime, datetime]]:
+    """The times in both lists of (sorted, separate) blocks."""
+
+    overlaps = []
+    i = j = 0
+    while i < len(blocks_a) and j < len(blocks_b):
+        start = max(blocks_a[i][0], blocks_b[j][0])
+        end = min(blocks_a[i][1], blocks_b[j][1])
+        if start < end:
+            overlaps.append((start, end))
+        # move on from whichever block finishes first
+        if blocks_a[i][1] < blocks_b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return overlaps
+
+
+def clock(moment: datetime, sitting_date: date) -> str:
+    """e.g. 22.30, or 00.15 (+1) for after midnight"""
+    text = moment.strftime('%H.%M')
+    days_after = (moment.date() - sitting_date).days
+    return f'{text} (+{days_after})' if days_after else text
+
+
+def overlaps_report(chamber: dict[date, DayTimeline], wh: dict[date, DayTimeline]) -> dict:
+    total = timedelta()
+    days = []
+    for sitting_date in sorted(chamber.keys() & wh.keys()):
+        chamber_day = chamber[sitting_date]
+        wh_day = wh[sitting_date]
+        overlaps = block_overlaps(chamber_day.blocks(), wh_day.blocks())
+        if not overlaps:
+            continue
+        overlap = sum((end - start for start, end in overlaps), timedelta())
+        total += overlap
+        days.append({
+            'date': sitting_date.isoformat(),
+            'overlap': format_timedelta(overlap),
+            'times': [f'{clock(start, sitting_date)}-{clock(end, sitting_date)}'
+                      for start, end in overlaps],
+            'westminster_hall': [interval.subject for start, end in overlaps
+                                 for interval in wh_day.between(start, end)],
+        })
+    return {'total': format_timedelta(total), 'days': days}
+
+
+def finish_time(day: DayTimeline) -> timedelta:
+    """How long after midnight on the sitting date the sitting finished."""
+    return day.finish() - datetime.combine(day.date, time())
+
+
+def late_sittings_report(timelines: dict[date, DayTimeline], late: time) -> dict:
+    days = []
+    weeks: dict[tuple[int, int], DayTimeline] = {}
+    for sitting_date, day in timelines.items():
+        if day.finish() > datetime.combine(sitting_date, late):
+            days.append({'date': sitting_date.isoformat(),
+                         'finish': clock(day.finish(), sitting_date)})
+        week = sitting_date.isocalendar()[:2]
+        latest = weeks.get(week)
+        if latest is None or finish_time(day) > finish_time(latest):
+            weeks[week] = day
+
+    return {
+        'days': days,
+        'latest_each_week': [{'week': f'{year}-W{week:02}',
+                              'date': day.date.isoformat(),
+                              'finish': clock(day.finish(), day.date)}
+                             for (year, week), day in weeks.items()],
+    }
+
+
+def gaps_report(timelines: dict[date, DayTimeline], min_gap: timedelta) -> list[dict]:
+    gaps = []
+    for sitting_date, day in timelines.items():
+        blocks = day.blocks()
+        for (_, gap_start), (gap_end, _) in zip(blocks, blocks[1:]):
+            if gap_end - gap_start < min_gap:
+                continue
+            before = day.between(gap_start - timedelta(microseconds=1), gap_start)
+            gaps.append({'date': sitting_date.isoformat(),
+                         'from': clock(gap_start, sitting_date),
+                         'to': clock(gap_end, sitting_date),
+                         'length': format_timedelta(gap_end - gap_start),
+                         'after': before[-1].subject if before else ''})
+    return gaps
+
+
+def timeline_report(source: InputSource,
+                    late: time = LATE_SITTING,
+                    min_gap: timedelta = timedelta(minutes=1)) -> dict:
+    """The overlaps, late sittings and gaps as a JSON friendly dict."""
+
+    sd = Sessional_Diary(source, no_excel=True, write_files=False)
+    timelines = {sheet_title: sheet_timelines(sd, sheet_title)
+                 for sheet_title in (CH_SHEET_TITLE, WH_SHEET_TITLE)}
+
+    return {
+        'overlaps': overlaps_report(timelines[CH_SHEET_TITLE], timelines[WH_SHEET_TITLE]),
+        'late_sittings': {sheet_title: late_sittings_report(sheet_timelines, late)
+                          for sheet_title, sheet_timelines in timelines.items()},
+        'gaps': {sheet_title: gaps_report(sheet_timelines, min_gap)
+                 for sheet_title, sheet_timelines in timelines.items()},
+    }
+
+
+def print_report(result: dict, late: time) -> None:
+    overlaps = result['overlaps']
+    print(f'Chamber and Westminster Hall sitting at the same time: {overlaps["total"]}')
+    for day in overlaps['days']:
+        print(f'  {day["date"]}\t{day["overlap"]}\t({", ".join(day["times"])})')
+        for subject in day['westminster_hall']:
+            print(f'    {subject}')
+
+    for sheet_title, report in result['late_sittings'].items():
+        print(f'{sheet_title} sittings finishing after {late.strftime("%H.%M")}: '
+              f'{len(report["days"])}')
+        for day in report['days']:
+            print(f'  {day["date"]}\t{day["finish"]}')
+        print('  Latest finish each week:')
+        for week in report['latest_each_week']:
+            print(f'    {week["week"]}\t{week["date"]}\t{week["finish"]}')
+
+    for sheet_title, gaps in result['gaps'].items():
+        print(f'Gaps in {sheet_title} sittings: {len(gaps)}')
+        for gap in gaps:
+            print(f'  {gap["date"]}\t{gap["from"]}-{gap["to"]}\t({gap["length"]})'
+                  f'\tafter {gap["after"]}')
+
+
+def clock_time(text: str) -> time:
+    """argparse type for a time of day, e.g. 22:00 or 22.00"""
+    try:
+        return time.fromisoformat(text.replace('.', ':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{text!r} is not a time, e.g. 22:00')
+
+
+def main(argv: list[str]):
+    parser = argparse.ArgumentParser(
+        prog='sessional_diary timeline',
+        description='Show when the Chamber and Westminster Hall sat at the same time, '
+                    'the late sittings and the gaps in sittings.')
+
+    parser.add_argument('input', metavar='input_file', type=existing_path, nargs='+',
+                        help='File path to the Excel file, or the CSV files '
+                             '(or a folder containing them).')
+    parser.add_argument('--late', metavar='TIME', type=clock_time, default=LATE_SITTING,
+                        help='Sittings finishing after this time are late (default 22:00).')
+    parser.add_argument('--min-gap', metavar='MINUTES', type=int, default=1,
+                        help='Only report gaps of at least this many minutes (default 1).')
+    parser.add_argument('--json', action='store_true',
+                        help='Output the report as JSON.')
+
+    args = parser.parse_args(argv)
+
+    input_path = args.input[0] if len(args.input) == 1 else args.input
+    if len(args.input) > 1 and not is_csv_input(args.input):
+        parser.error('Only one Excel file can be processed at a time.')
+
+    result = timeline_report(input_path, args.late, timedelta(minutes=args.min_gap))
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        print_report(result, args.late)
@@ -0,0 +1,24 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from equivalence import generated_workbook
+
+
+@pytest.fixture(scope='session')
+def generated(tmp_path_factory) -> Path:
+    """A small generated workbook, made once. Use `workbook` for a copy that
+    outputs can be written next to."""
+    return generated_workbook(tmp_path_factory.mktemp('generated') / 'diary.xlsx', days=20)
+
+
+@pytest.fixture
+def workbook(generated: Path, tmp_path: Path) -> Path:
+    return Path(shutil.copy(generated, tmp_path / generated.name))
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path: Path, monkeypatch) -> Path:
+    """Keep the output cache and search index out of the user's home."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
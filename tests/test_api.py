@@ -0,0 +1,31 @@
+import io
+
+from lxml import etree
+
+from sessional_diary.api import generate
+from sessional_diary.cli import EXCEL_FILE, HOUSE_DIARY_FILE, expected_outputs
+from sessional_diary.output import tree_to_bytes
+
+
+def test_nothing_is_written_to_disk(generated, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = generated.read_bytes()
+
+    outputs = generate(data, idml=True)
+    assert sorted(outputs) == sorted(expected_outputs(idml=True))
+    assert all(isinstance(content, bytes) for content in outputs.values())
+    # not even the output cache, which is in tmp_path too
+    assert list(tmp_path.iterdir()) == []
+    assert sorted(p.name for p in generated.parent.iterdir()) == [generated.name]
+
+    # the same whether the workbook is given as bytes, a file object or a path
+    assert generate(io.BytesIO(data), idml=True) == outputs
+    assert generate(str(generated), idml=True) == outputs
+
+
+def test_trees(generated):
+    outputs = generate(str(generated), trees=True)
+    assert isinstance(outputs[EXCEL_FILE], bytes)
+    tree = outputs[HOUSE_DIARY_FILE]
+    assert isinstance(tree, etree._ElementTree)
+    assert tree_to_bytes(tree) == generate(str(generated))[HOUSE_DIARY_FILE]
@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+
+from sessional_diary.cli import HOUSE_DIARY_FILE, WH_DIARY_FILE, run
+from sessional_diary.output import BackgroundWriter
+
+
+def test_jobs_run_in_order_on_another_thread():
+    writer = BackgroundWriter()
+    done = []
+    for n in range(5):
+        writer.submit(lambda n: done.append((n, threading.current_thread().name)), n)
+    writer.close()
+
+    assert [n for n, _ in done] == list(range(5))
+    assert all(name.startswith('sessional-diary-writer') for _, name in done)
+
+
+def test_flush_raises_the_first_error():
+    writer = BackgroundWriter()
+    writer.submit(lambda: 1 / 0)
+    writer.submit(lambda: [][0])
+    with pytest.raises(ZeroDivisionError):
+        writer.flush()
+    # the errors have been reported
+    writer.close()
+
+
+def test_write_error_fails_the_run(workbook):
+    # a folder where the file should go
+    (workbook.parent / HOUSE_DIARY_FILE).mkdir()
+    with pytest.raises(IsADirectoryError):
+        run(str(workbook), no_excel=True, use_cache=False)
+
+
+def test_files_are_written_by_the_end_of_the_run(workbook):
+    run(str(workbook), no_excel=True, use_cache=False)
+    for name in (HOUSE_DIARY_FILE, WH_DIARY_FILE):
+        assert (workbook.parent / name).read_bytes().startswith(b'<?xml')
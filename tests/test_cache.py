@@ -0,0 +1,37 @@
+import os
+
+from sessional_diary.cli import HOUSE_DIARY_FILE, run
+from sessional_diary.output import OutputCache, write_if_changed
+
+
+def test_unchanged_input_uses_the_cache(workbook, capsys):
+    run(str(workbook), no_excel=True)
+    diary = workbook.parent / HOUSE_DIARY_FILE
+    data = diary.read_bytes()
+    os.utime(diary, (0, 0))
+    capsys.readouterr()
+
+    run(str(workbook), no_excel=True)
+    assert 'Using the cached output' in capsys.readouterr().out
+    assert diary.read_bytes() == data
+    # not rewritten, so InDesign doesn't think it has changed
+    assert diary.stat().st_mtime == 0
+
+
+def test_write_if_changed(tmp_path):
+    file_path = str(tmp_path / 'out.xml')
+    assert write_if_changed(file_path, b'<a/>')
+    assert not write_if_changed(file_path, b'<a/>')
+    assert write_if_changed(file_path, b'<b/>')
+
+
+def test_cache_keeps_the_latest_versions(cache_home):
+    cache = OutputCache(keep=3)
+    keys = [cache.key(str(n), HOUSE_DIARY_FILE, {}) for n in range(5)]
+    for n, key in enumerate(keys):
+        cache.put(key, HOUSE_DIARY_FILE, b'%d' % n)
+        # mtimes are used to find the oldest
+        os.utime(cache.path(key, HOUSE_DIARY_FILE), (n, n))
+
+    cache.evict(HOUSE_DIARY_FILE)
+    assert [cache.get(key, HOUSE_DIARY_FILE) for key in keys] == [None, None, b'2', b'3', b'4']
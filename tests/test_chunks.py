@@ -0,0 +1,50 @@
+import sys
+
+from lxml import etree
+
+from sessional_diary import cli
+from sessional_diary.api import generate
+from sessional_diary.cli import HOUSE_DIARY_FILE, WH_DIARY_FILE
+from sessional_diary.utilities import AID
+
+DAY_HEADING = 'Cell[@aid5:cellstyle="SubHeading No Toc"]'
+NAMESPACES = {'aid5': 'http://ns.adobe.com/AdobeInDesign/5.0/'}
+
+
+def table_of(data: bytes):
+    [table] = etree.fromstring(data)
+    return table
+
+
+def body_cells(table) -> list[bytes]:
+    return [etree.tostring(cell) for cell in table if cell.get(AID + 'theader') is None]
+
+
+def test_diary_chunks_by_sitting_days(generated):
+    outputs = generate(str(generated), no_excel=True, chunk_by=5)
+
+    # the whole tables are still there, unchanged
+    whole = generate(str(generated), no_excel=True)
+    assert {name: outputs[name] for name in whole} == whole
+
+    table = table_of(outputs[HOUSE_DIARY_FILE])
+    chunks = [table_of(outputs[f'House_Diary_{n:02}.xml']) for n in range(1, 5)]
+    assert 'House_Diary_05.xml' not in outputs
+
+    assert [len(chunk.findall(DAY_HEADING, NAMESPACES)) for chunk in chunks] == [5] * 4
+    assert sum((body_cells(chunk) for chunk in chunks), []) == body_cells(table)
+    # every chunk has the heading row
+    trows = [int(chunk.get(AID + 'trows')) for chunk in chunks]
+    assert sum(rows - 1 for rows in trows) == int(table.get(AID + 'trows')) - 1
+
+
+def test_chunk_by_month(workbook, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['sessional_diary', str(workbook), '--no-excel',
+                                      '--chunk', 'month'])
+    cli.main()
+
+    # all the generated days are in September 2024
+    for name in (HOUSE_DIARY_FILE, WH_DIARY_FILE):
+        chunk = workbook.parent / name.replace('.xml', '_2024-09.xml')
+        assert chunk.read_bytes() == (workbook.parent / name).read_bytes()
+    assert (workbook.parent / 'House_Analysis_Part_02.xml').exists()
@@ -0,0 +1,54 @@
+import json
+import sys
+
+from openpyxl import load_workbook
+
+from sessional_diary import cli
+from sessional_diary.api import generate, totals
+from sessional_diary.classification import EXAMPLES, ClassificationReport
+from sessional_diary.cli import CH_SHEET_TITLE, WH_SHEET_TITLE
+
+
+def chamber_rows(workbook) -> dict[str, list[int]]:
+    """The row numbers of the Chamber rows, by Subject 1."""
+    rows: dict[str, list[int]] = {}
+    ws = load_workbook(workbook, read_only=True)[CH_SHEET_TITLE]
+    for r, (day, _, _, subject1) in enumerate(ws.iter_rows(min_row=2, max_col=4,
+                                                           values_only=True), 2):
+        if isinstance(day, int):
+            rows.setdefault(subject1, []).append(r)
+    return rows
+
+
+def test_classification_report(generated):
+    report = ClassificationReport()
+    generate(str(generated), no_excel=True, classification=report)
+    result = json.loads(report.to_json())
+    chamber = result[CH_SHEET_TITLE]
+
+    rows = chamber_rows(generated)
+    assert chamber['rows'] == sum(len(subject_rows) for subject_rows in rows.values())
+    [unclassified] = chamber['unclassified']
+    assert unclassified['subject1'] == 'Something new'
+    assert unclassified['rows'] == chamber['unclassified_rows'] == len(rows['Something new'])
+    assert unclassified['examples'] == [f'Row {r}' for r in rows['Something new'][:EXAMPLES]]
+
+    # the same totals as in the tables of contents
+    session_totals = totals(str(generated))
+    for sheet_title, key in ((CH_SHEET_TITLE, 'chamber'), (WH_SHEET_TITLE, 'westminster_hall')):
+        # 7: Backbench Business has its number in the title
+        contents = {section['number'] or section['title'].split(':')[0]: section['duration']
+                    for section in session_totals[key]['sections']}
+        for section in result[sheet_title]['sections']:
+            assert section['duration'] == contents[section['title'].split(':')[0]]
+
+
+def test_classification_file(workbook, monkeypatch):
+    report_file = workbook.parent / 'classification.json'
+    monkeypatch.setattr(sys, 'argv', ['sessional_diary', str(workbook), '--totals',
+                                      '--classification', str(report_file)])
+    cli.main()
+
+    report = json.loads(report_file.read_text(encoding='UTF-8'))
+    assert list(report) == [CH_SHEET_TITLE, WH_SHEET_TITLE]
+    assert report[CH_SHEET_TITLE]['unclassified'][0]['subject1'] == 'Something new'
@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from sessional_diary import diary
+from sessional_diary.api import generate
+from sessional_diary.cli import HOUSE_DIARY_FILE
+from sessional_diary.columns import ColumnsLayout, SharedColumns
+from sessional_diary.output import process_pool_context
+
+SUBJECTS = ['Prayers', 'Questions', 'Prayers', 'Ten minute rule motion: Housing', 'Ménage']
+
+
+def read_columns(layout: ColumnsLayout) -> tuple[list[int], list[str]]:
+    with SharedColumns.attach(layout) as columns:
+        return columns.column('day').tolist(), list(columns.strings('subject'))
+
+
+def test_columns_in_another_process():
+    with SharedColumns.create({'day': [1, 1, 2, 2, 3]}, {'subject': SUBJECTS}) as columns:
+        assert columns.column('day').tolist() == [1, 1, 2, 2, 3]
+        # each distinct string is only stored once
+        assert columns.column('subject').tolist() == [0, 1, 0, 2, 3]
+        assert columns.strings('subject') == SUBJECTS
+
+        with ProcessPoolExecutor(1, mp_context=process_pool_context()) as executor:
+            assert executor.submit(read_columns, columns.layout).result() == (
+                [1, 1, 2, 2, 3], SUBJECTS)
+
+
+def test_the_creator_removes_the_memory():
+    columns = SharedColumns.create({'day': []}, {'subject': []})
+    layout = columns.layout
+    with SharedColumns.attach(layout) as attached:
+        assert attached.strings('subject') == []
+    # a view still in use doesn't stop it closing
+    columns.column('day')
+    columns.close()
+
+    with pytest.raises(FileNotFoundError):
+        SharedColumns.attach(layout)
+
+
+def test_bad_columns():
+    with pytest.raises(ValueError, match='given twice'):
+        SharedColumns.create({'day': [1]}, {'day': ['1']})
+    with SharedColumns.create({'day': [1]}) as columns, pytest.raises(ValueError):
+        columns.strings('day')
+
+
+@pytest.mark.skipif(not os.path.isdir('/dev/shm'), reason='shared memory is not in /dev/shm')
+def test_diary_leaves_no_shared_memory(generated, monkeypatch):
+    before = set(os.listdir('/dev/shm'))
+    monkeypatch.setattr(diary, 'PARALLEL_MIN_ROWS', 0)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    generate(str(generated), outputs=[HOUSE_DIARY_FILE])
+    assert set(os.listdir('/dev/shm')) <= before
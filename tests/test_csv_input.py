@@ -0,0 +1,28 @@
+from csv_input import export_csv
+
+from sessional_diary.api import generate
+from sessional_diary.cli import run
+from sessional_diary.csv_input import is_csv_input
+from sessional_diary.diagnostics import Diagnostics
+
+
+def test_csv_files_give_the_same_output(generated, tmp_path):
+    export_csv(str(generated), tmp_path)
+    files = sorted(str(p) for p in tmp_path.glob('*.csv'))
+    assert len(files) == 2 and is_csv_input(files)
+
+    xlsx_diagnostics = Diagnostics()
+    xlsx = generate(str(generated), no_excel=True, diagnostics=xlsx_diagnostics)
+    csv_diagnostics = Diagnostics()
+    assert generate(files, no_excel=True, diagnostics=csv_diagnostics) == xlsx
+    # the problems are reported at the same cells
+    assert csv_diagnostics.items == xlsx_diagnostics.items
+
+
+def test_folder_of_csv_files(generated, tmp_path):
+    export_csv(str(generated), tmp_path)
+    run(str(tmp_path), no_excel=True)
+
+    xlsx = generate(str(generated), no_excel=True)
+    for name, data in xlsx.items():
+        assert (tmp_path / name).read_bytes() == data
@@ -0,0 +1,92 @@
+from datetime import date
+
+from lxml import etree
+from openpyxl import load_workbook
+
+from sessional_diary.api import generate
+from sessional_diary.cli import (
+    CH_SHEET_TITLE,
+    HOUSE_DIARY_FILE,
+    WH_DIARY_FILE,
+    WH_SHEET_TITLE,
+)
+from sessional_diary.diagnostics import ROW_OUT_OF_ORDER, Diagnostics
+from sessional_diary.utilities import AID5
+
+DIARIES = [HOUSE_DIARY_FILE, WH_DIARY_FILE]
+
+
+def unsorted_workbook(workbook, file_path) -> int:
+    """Save a copy of the workbook with the last two rows of day 3 and all the
+    rows of day 7 moved to the end of each sheet. Returns how many rows were moved."""
+    wb = load_workbook(workbook)
+    moved = 0
+    for sheet_title in (CH_SHEET_TITLE, WH_SHEET_TITLE):
+        ws = wb[sheet_title]
+        rows = [[cell.value for cell in row] for row in ws.iter_rows(min_row=2)]
+        to_move = [row for row in rows if row[0] == 3][-2:] + [row for row in rows if row[0] == 7]
+        ws.delete_rows(2, ws.max_row)
+        for row in [row for row in rows if row not in to_move] + to_move:
+            ws.append(row)
+        moved += len(to_move)
+    wb.save(file_path)
+    return moved
+
+
+def day_headings(table) -> list[str]:
+    return [cell.text for cell in table
+            if cell.get(AID5 + 'cellstyle') == 'SubHeading No Toc']
+
+
+def test_rows_out_of_order(generated, tmp_path):
+    edited = tmp_path / 'unsorted.xlsx'
+    moved = unsorted_workbook(generated, edited)
+
+    diagnostics = Diagnostics()
+    assert generate(str(edited), outputs=DIARIES, diagnostics=diagnostics) == generate(
+        str(generated), outputs=DIARIES)
+    out_of_order = [item for item in diagnostics.items if item.category == ROW_OUT_OF_ORDER]
+    assert len(out_of_order) == moved
+    assert {item.sheet for item in out_of_order} == {CH_SHEET_TITLE, WH_SHEET_TITLE}
+
+
+def test_first_row_of_a_day_moved(generated, tmp_path):
+    wb = load_workbook(generated)
+    for sheet_title in (CH_SHEET_TITLE, WH_SHEET_TITLE):
+        ws = wb[sheet_title]
+        rows = [[cell.value for cell in row] for row in ws.iter_rows(min_row=2)]
+        first = next(row for row in rows if row[0] == 3)
+        ws.delete_rows(2, ws.max_row)
+        for row in [row for row in rows if row is not first] + [first]:
+            ws.append(row)
+    edited = tmp_path / 'first row moved.xlsx'
+    wb.save(edited)
+
+    # the earliest item is still first, not after the items after midnight
+    assert generate(str(edited), outputs=DIARIES) == generate(str(generated), outputs=DIARIES)
+
+
+def test_preview_of_rows_out_of_order(generated, tmp_path):
+    edited = tmp_path / 'unsorted.xlsx'
+    unsorted_workbook(generated, edited)
+
+    for date_from, date_to in ((date(2024, 9, 4), date(2024, 9, 6)),
+                               (date(2024, 9, 9), date(2024, 9, 12))):
+        assert generate(str(edited), outputs=DIARIES, date_from=date_from,
+                        date_to=date_to) == generate(str(generated), outputs=DIARIES,
+                                                     date_from=date_from, date_to=date_to)
+
+
+def test_sheet_not_starting_at_day_1(generated, tmp_path):
+    wb = load_workbook(generated)
+    ws = wb[WH_SHEET_TITLE]
+    first_day = [row[0].row for row in ws.iter_rows(min_row=2) if row[0].value == 1]
+    ws.delete_rows(first_day[0], len(first_day))
+    edited = tmp_path / 'from day 2.xlsx'
+    wb.save(edited)
+
+    [table] = etree.fromstring(generate(str(edited), outputs=[WH_DIARY_FILE])[WH_DIARY_FILE])
+    [whole] = etree.fromstring(generate(str(generated), outputs=[WH_DIARY_FILE])[WH_DIARY_FILE])
+    # no empty section for day 1
+    assert len(day_headings(whole)) > 1
+    assert day_headings(table) == day_headings(whole)[1:]
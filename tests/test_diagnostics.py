@@ -0,0 +1,53 @@
+import json
+
+from openpyxl import load_workbook
+
+from sessional_diary.api import generate
+from sessional_diary.cli import CH_SHEET_TITLE, run
+from sessional_diary.diagnostics import INVALID_DAY, INVALID_DURATION, Diagnostics
+
+
+def bad_row(workbook) -> int:
+    """The row of the generated Chamber sheet with 'bad' as the day."""
+    ws = load_workbook(workbook, read_only=True)[CH_SHEET_TITLE]
+    [row] = [r for r, (day,) in enumerate(ws.iter_rows(max_col=1, values_only=True), 1)
+             if day == 'bad']
+    return row
+
+
+def test_invalid_rows_are_collected(generated):
+    diagnostics = Diagnostics()
+    generate(str(generated), no_excel=True, diagnostics=diagnostics)
+
+    row = bad_row(generated)
+    assert [(item.category, item.sheet, item.cell, item.value) for item in diagnostics.items] == [
+        (INVALID_DAY, CH_SHEET_TITLE, f'A{row}', 'bad'),
+    ]
+
+
+def test_invalid_duration(workbook):
+    wb = load_workbook(workbook)
+    ws = wb[CH_SHEET_TITLE]
+    duration_cell = ws.cell(row=2, column=7)
+    assert ws.cell(row=1, column=7).value == 'Duration'
+    duration_cell.value = 'ten minutes'
+    wb.save(workbook)
+
+    diagnostics = Diagnostics()
+    generate(str(workbook), no_excel=True, diagnostics=diagnostics)
+    assert [(item.category, item.cell, item.value) for item in diagnostics.items
+            if item.category != INVALID_DAY] == [(INVALID_DURATION, 'G2', 'ten minutes')]
+
+
+def test_summary_and_json(workbook, capsys):
+    diagnostics_file = workbook.parent / 'diagnostics.json'
+    run(str(workbook), no_excel=True, use_cache=False, diagnostics_file=str(diagnostics_file))
+
+    out = capsys.readouterr().out
+    # one summary at the end, not a message for each row
+    assert out.count('bad') == 1
+    assert out.rstrip().endswith(f'A{bad_row(workbook)}\thas value bad')
+
+    saved = json.loads(diagnostics_file.read_text(encoding='UTF-8'))
+    # one problem for the cell, not another for the row it is in
+    assert saved['counts'] == {f'{CH_SHEET_TITLE}: {INVALID_DAY}': 1}
@@ -0,0 +1,36 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from diary_render import make_days, render
+
+from sessional_diary import diary
+from sessional_diary.api import generate
+from sessional_diary.cli import HOUSE_DIARY_FILE, WH_DIARY_FILE
+
+
+def test_days_rendered_in_processes_are_the_same(generated, monkeypatch):
+    options = [{}, {'chunk_by': 5}, {'date_from': date(2024, 9, 10), 'date_to': date(2024, 9, 20)}]
+    serial = [generate(str(generated), outputs=[HOUSE_DIARY_FILE, WH_DIARY_FILE], **kwargs)
+              for kwargs in options]
+
+    pools = []
+
+    class Pool(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(diary, 'ProcessPoolExecutor', Pool)
+    monkeypatch.setattr(diary, 'PARALLEL_MIN_ROWS', 0)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    for kwargs, expected in zip(options, serial):
+        assert generate(str(generated), outputs=[HOUSE_DIARY_FILE, WH_DIARY_FILE],
+                        **kwargs) == expected
+    # both diaries each time
+    assert len(pools) == 2 * len(options)
+
+
+def test_more_processes_than_days():
+    days = make_days(3, 5)
+    assert render(days, processes=4) == render(days, processes=1)
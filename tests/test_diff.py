@@ -0,0 +1,43 @@
+import json
+from datetime import time
+
+from openpyxl import load_workbook
+
+from sessional_diary import diff
+from sessional_diary.cli import CH_SHEET_TITLE, WH_SHEET_TITLE
+
+
+def edited_workbook(workbook, tmp_path):
+    """A copy of the workbook with the second item of day 3 an hour longer."""
+    wb = load_workbook(workbook)
+    ws = wb[CH_SHEET_TITLE]
+    row = [row for row in ws.iter_rows(min_row=2) if row[0].value == 3][1]
+    duration = row[6].value
+    row[6].value = time(duration.hour + 1, duration.minute)
+    new_path = tmp_path / 'new.xlsx'
+    wb.save(new_path)
+    return new_path, row[3].value
+
+
+def test_same_workbook_has_no_changes(workbook):
+    result = diff.diff_workbooks(str(workbook), str(workbook))
+    assert result[CH_SHEET_TITLE]['days'] == []
+    assert result[WH_SHEET_TITLE]['days'] == []
+
+
+def test_changed_day(workbook, tmp_path, capsys):
+    new_path, subject1 = edited_workbook(workbook, tmp_path)
+
+    diff.main([str(workbook), str(new_path), '--json'])
+    result = json.loads(capsys.readouterr().out)
+
+    [day] = result[CH_SHEET_TITLE]['days']
+    assert day['status'] == 'changed'
+    assert day['date'] == '2024-09-05'
+    assert day['added'] == day['removed'] == []
+    [(old, new)] = day['changed']
+    assert subject1 in old and subject1 in new
+    assert result[WH_SHEET_TITLE]['days'] == []
+    assert result[CH_SHEET_TITLE]['sections']
+    for section in result[CH_SHEET_TITLE]['sections']:
+        assert section['duration'] == '+1.00'
@@ -0,0 +1,57 @@
+import math
+
+import pytest
+from openpyxl import load_workbook
+
+from sessional_diary.api import generate
+from sessional_diary.cli import CH_SHEET_TITLE, WH_SHEET_TITLE
+from sessional_diary.diagnostics import DURATION_DERIVED, DURATION_MISMATCH, Diagnostics
+from sessional_diary.durations import rebuild_durations
+
+pytest.importorskip('numpy')
+
+
+def without_durations(workbook, file_path) -> int:
+    """Save a copy of the workbook with the Duration cells empty, except for the
+    last item of each day. Returns how many were emptied."""
+    wb = load_workbook(workbook)
+    emptied = 0
+    for sheet_title in (CH_SHEET_TITLE, WH_SHEET_TITLE):
+        rows = [row for row in wb[sheet_title].iter_rows(min_row=2)
+                if isinstance(row[0].value, int)]
+        for row, next_row in zip(rows, rows[1:]):
+            if row[0].value == next_row[0].value:
+                row[6].value = None
+                emptied += 1
+    wb.save(file_path)
+    return emptied
+
+
+def test_derived_durations_give_the_same_output(generated, tmp_path):
+    edited = tmp_path / 'no durations.xlsx'
+    emptied = without_durations(generated, edited)
+
+    diagnostics = Diagnostics()
+    assert generate(str(edited), derive_durations=True,
+                    diagnostics=diagnostics) == generate(str(generated))
+    categories = [item.category for item in diagnostics.items]
+    assert categories.count(DURATION_DERIVED) == emptied
+    assert DURATION_MISMATCH not in categories
+
+    assert generate(str(edited)) != generate(str(generated))
+
+
+def test_rebuild_durations():
+    nan = float('nan')
+    hour = 3600
+    to_next, rebuilt, mismatched, not_rebuilt = rebuild_durations(
+        days=[1, 1, 1, 2, 2],
+        # the third item of day 1 is after midnight
+        times=[22 * hour, 23 * hour, hour / 2, 11 * hour, 12 * hour],
+        durations=[nan, 2 * hour, nan, hour, nan])
+
+    assert to_next[:2].tolist() == [hour, 1.5 * hour]
+    assert math.isnan(to_next[2])
+    assert rebuilt.tolist() == [0]
+    assert mismatched.tolist() == [1]
+    assert not_rebuilt.tolist() == [2, 4]
@@ -0,0 +1,35 @@
+from equivalence import anonymised_workbook, compare, csv_engine, xml_difference
+
+from sessional_diary.api import generate, totals
+from sessional_diary.cli import HOUSE_DIARY_FILE
+
+
+def test_csv_engine_is_the_same(generated, capsys):
+    assert compare('generated', str(generated), csv_engine, repeats=1)
+    assert 'differs' not in capsys.readouterr().out
+
+
+def test_a_different_output_is_found(generated, capsys):
+    def engine(excel_file_path):
+        outputs = generate(excel_file_path)
+        outputs[HOUSE_DIARY_FILE] = outputs[HOUSE_DIARY_FILE].replace(b'Prayers', b'Prayer', 1)
+        return outputs
+
+    assert not compare('generated', str(generated), engine, repeats=1)
+    assert "text 'Prayer' instead of 'Prayers'" in capsys.readouterr().out
+
+
+def test_xml_difference():
+    assert xml_difference(b'<a><b x="1"/></a>', b'<a><b x="1"/></a>') is None
+    assert xml_difference(b'<a><b x="1"/></a>', b'<a><b x="2"/></a>') == (
+        "root/b[0]: attributes {'x': '2'} instead of {'x': '1'}")
+    assert xml_difference(b'<a><b/></a>', b'<a><b/><b/></a>') == (
+        'root: 2 child elements instead of 1')
+    assert xml_difference(b'<a/>', b"<?xml version='1.0'?><a/>") == (
+        'the trees are the same but the bytes differ')
+
+
+def test_anonymised_workbook_keeps_the_sections(generated, tmp_path):
+    anonymised = anonymised_workbook(str(generated), tmp_path / 'anonymised.xlsx')
+    assert totals(str(anonymised)) == totals(str(generated))
+    assert generate(str(anonymised)) != generate(str(generated))
@@ -0,0 +1,34 @@
+import io
+import os
+from datetime import timedelta
+
+from openpyxl import load_workbook
+
+from sessional_diary import excel
+from sessional_diary.api import generate
+from sessional_diary.cli import EXCEL_FILE
+
+
+def test_sheets_made_in_processes_are_the_same(generated, monkeypatch):
+    serial = generate(str(generated), outputs=[EXCEL_FILE])[EXCEL_FILE]
+
+    monkeypatch.setattr(excel, 'PARALLEL_MIN_ROWS', 0)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    assert generate(str(generated), outputs=[EXCEL_FILE])[EXCEL_FILE] == serial
+
+
+def test_analysis_sheets(generated):
+    xlsx = generate(str(generated), outputs=[EXCEL_FILE])[EXCEL_FILE]
+    wb = load_workbook(io.BytesIO(xlsx))
+
+    assert len(wb.sheetnames) > 1
+    for ws in wb:
+        rows = list(ws.iter_rows(values_only=True))
+        # title, headings, the rows and the totals
+        assert rows[0][0]
+        assert rows[1][0] == 'Date'
+        assert rows[-1][1] == 'Sessional Total'
+        assert ws.cell(row=len(rows), column=2).font.b
+        durations = [row[2] for row in rows[2:-1] if isinstance(row[2], timedelta)]
+        if durations:
+            assert sum(durations, timedelta()) == rows[-1][2]
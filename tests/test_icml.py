@@ -0,0 +1,42 @@
+from lxml import etree
+from openpyxl import load_workbook
+
+from sessional_diary.api import generate
+from sessional_diary.cli import HOUSE_DIARY_FILE, WH_SHEET_TITLE, run
+from sessional_diary.icml import STYLE_GROUPS, icml_file_name
+
+
+def test_tables_as_icml_stories(generated):
+    outputs = generate(str(generated), no_excel=True, icml=True)
+
+    for name in [name for name in outputs if name.endswith('.xml')]:
+        data = outputs[icml_file_name(name)]
+        assert b'<?aid SnippetType="InCopyInterchange"?>' in data
+        document = etree.fromstring(data)
+        assert [group.tag for group in document if group.tag != 'Story'] == STYLE_GROUPS
+
+        [table] = etree.fromstring(outputs[name])
+        [story] = document.findall('Story')
+        [icml_table] = story.findall('.//Table')
+        cells = icml_table.findall('Cell')
+        assert len(cells) == len(table)
+        assert [''.join(cell.xpath('.//Content/text()')) for cell in cells] == [
+            ''.join(cell.itertext()) for cell in table]
+
+
+def test_only_changed_stories_are_rewritten(workbook, capsys):
+    run(str(workbook), no_excel=True, icml=True, use_cache=False)
+    capsys.readouterr()
+
+    run(str(workbook), no_excel=True, icml=True, use_cache=False)
+    assert 'No ICML stories have changed.' in capsys.readouterr().out
+
+    wb = load_workbook(workbook)
+    wb[WH_SHEET_TITLE]['E2'] = 'Libraries'
+    wb.save(workbook)
+    house_diary = workbook.parent / icml_file_name(HOUSE_DIARY_FILE)
+    modified = house_diary.stat().st_mtime_ns
+
+    run(str(workbook), no_excel=True, icml=True, use_cache=False)
+    assert 'ICML stories changed: WH_Analysis.icml, WH_diary.icml' in capsys.readouterr().out
+    assert house_diary.stat().st_mtime_ns == modified
@@ -0,0 +1,67 @@
+import io
+import struct
+import zipfile
+
+from lxml import etree
+
+from sessional_diary.api import generate
+from sessional_diary.idml import (
+    TEMPLATE_TABLES,
+    TEMPLATES_DIR,
+    idml_file_name,
+    xml_story_id,
+)
+
+
+def compressed_data(archive: bytes, info: zipfile.ZipInfo) -> bytes:
+    # the name and extra field lengths are the last fields of the local header
+    name_length, extra_length = struct.unpack_from('<2H', archive, info.header_offset + 26)
+    start = info.header_offset + 30 + name_length + extra_length
+    return archive[start:start + info.compress_size]
+
+
+def test_idml_files(generated):
+    outputs = generate(str(generated), idml=True, no_excel=True)
+
+    for template_name in TEMPLATE_TABLES:
+        with (TEMPLATES_DIR / template_name).open('rb') as f, zipfile.ZipFile(f) as template, \
+                zipfile.ZipFile(io.BytesIO(outputs[idml_file_name(template_name)])) as idml:
+            assert idml.namelist() == template.namelist()
+            story_name = f'Stories/Story_{xml_story_id(template.read("XML/BackingStory.xml"))}.xml'
+            for name in template.namelist():
+                if name != story_name:
+                    assert idml.read(name) == template.read(name), name
+
+            story = etree.fromstring(idml.read(story_name))
+            assert story.findall('.//Table')
+            assert story.findall('.//Cell')
+
+
+def test_house_diary_story(generated):
+    outputs = generate(str(generated), outputs=['sessional-diary_Part-1.idml'])
+
+    with zipfile.ZipFile(io.BytesIO(outputs['sessional-diary_Part-1.idml'])) as idml:
+        stories = [etree.fromstring(idml.read(name)) for name in idml.namelist()
+                   if name.startswith('Stories/')]
+    text = ''.join(''.join(story.xpath('.//Cell//Content/text()')) for story in stories)
+    assert 'Prayers' in text
+    assert 'Tuesday 03 September 2024' in text
+
+
+def test_untouched_entries_copied_raw(generated):
+    outputs = generate(str(generated), outputs=['sessional-diary_Part-3.idml'])
+    template_name = 'sessional-diary_Part-3_template.idml'
+    template_bytes = (TEMPLATES_DIR / template_name).read_bytes()
+    idml_bytes = outputs[idml_file_name(template_name)]
+
+    with zipfile.ZipFile(io.BytesIO(template_bytes)) as template, \
+            zipfile.ZipFile(io.BytesIO(idml_bytes)) as idml:
+        assert idml.testzip() is None
+        story_name = f'Stories/Story_{xml_story_id(template.read("XML/BackingStory.xml"))}.xml'
+        for info in template.infolist():
+            if info.filename != story_name:
+                copied = idml.getinfo(info.filename)
+                assert (copied.compress_type, copied.date_time) == \
+                    (info.compress_type, info.date_time)
+                assert compressed_data(idml_bytes, copied) == \
+                    compressed_data(template_bytes, info), info.filename
@@ -0,0 +1,63 @@
+import re
+
+from openpyxl import load_workbook
+
+from sessional_diary.cli import CH_SHEET_TITLE, WH_SHEET_TITLE, expected_outputs, run
+from sessional_diary.diagnostics import SKIPPED_ROW, Diagnostics
+from sessional_diary.metrics import PREFIX, RunMetrics
+
+SAMPLE = re.compile(r'(\w+)(?:\{(.*)\})? (\S+)')
+
+
+def samples(text: str) -> dict[tuple[str, str], float]:
+    """(metric name without the prefix, labels) -> value"""
+    result = {}
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+        name, labels, value = SAMPLE.fullmatch(line).groups()
+        assert name.startswith(PREFIX)
+        result[(name[len(PREFIX):], labels or '')] = float(value)
+    return result
+
+
+def test_metrics_file(workbook, capsys):
+    metrics_file = workbook.parent / 'sessional_diary.prom'
+    run(str(workbook), no_excel=True, metrics_file=str(metrics_file))
+    first = samples(metrics_file.read_text(encoding='UTF-8'))
+
+    names = expected_outputs(no_excel=True)
+    for name in names:
+        assert first[('output_bytes', f'file="{name}"')] == (workbook.parent / name).stat().st_size
+    assert first[('rows_skipped', f'sheet="{CH_SHEET_TITLE}"')] == 1
+    assert first[('rows_skipped', f'sheet="{WH_SHEET_TITLE}"')] == 0
+    ws = load_workbook(workbook, read_only=True)[CH_SHEET_TITLE]
+    assert first[('rows_parsed', f'sheet="{CH_SHEET_TITLE}"')] == sum(
+        isinstance(day, int) for (day,) in ws.iter_rows(max_col=1, values_only=True))
+    assert first[('stage_duration_seconds', f'stage="{CH_SHEET_TITLE}"')] > 0
+    assert first[('cache_misses', '')] == len(names)
+    assert first[('cache_hit_ratio', '')] == 0
+
+    # the second time everything comes from the cache
+    capsys.readouterr()
+    run(str(workbook), no_excel=True, metrics_file=str(metrics_file))
+    assert 'Using the cached output' in capsys.readouterr().out
+    second = samples(metrics_file.read_text(encoding='UTF-8'))
+    assert second[('cache_hits', '')] == len(names)
+    assert second[('cache_hit_ratio', '')] == 1
+    # with the counts from when the input was read
+    for key, value in first.items():
+        if key[0] in ('rows_parsed', 'rows_skipped', 'input_problems', 'table_cells'):
+            assert second[key] == value, key
+    assert any(name == 'table_cells' for name, _ in second)
+    assert [path.name for path in workbook.parent.iterdir() if path.suffix == '.tmp'] == []
+
+
+def test_labels_are_escaped():
+    metrics = RunMetrics()
+    diagnostics = Diagnostics()
+    diagnostics.add(SKIPPED_ROW, 'Sheet "2"\\', 'Row 2')
+    metrics.rows['Sheet "2"\\'] = 1
+    metrics.add_diagnostics(diagnostics)
+
+    assert samples(metrics.to_text())[('rows_skipped', r'sheet="Sheet \"2\"\\"')] == 1
@@ -0,0 +1,52 @@
+import sys
+
+import pytest
+
+from sessional_diary import cli
+from sessional_diary.api import generate
+from sessional_diary.cli import (
+    CH_SHEET_TITLE,
+    HOUSE_ANALYSIS_FILE,
+    WH_DIARY_FILE,
+    WH_SHEET_TITLE,
+    Sessional_Diary,
+    output_name,
+)
+
+
+def test_only_the_outputs_asked_for(workbook, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['sessional_diary', str(workbook), '--no-cache',
+                                      '--outputs', 'House_Analysis,wh_diary'])
+    cli.main()
+
+    assert sorted(p.name for p in workbook.parent.iterdir() if p != workbook) == [
+        HOUSE_ANALYSIS_FILE, WH_DIARY_FILE]
+    everything = generate(str(workbook))
+    for name in (HOUSE_ANALYSIS_FILE, WH_DIARY_FILE):
+        assert (workbook.parent / name).read_bytes() == everything[name]
+
+
+def test_only_the_sheets_needed_are_processed(generated, monkeypatch):
+    processed = []
+    process = Sessional_Diary.process
+
+    def recorded_process(self, sheet_title, sinks):
+        processed.append(sheet_title)
+        process(self, sheet_title, sinks)
+
+    monkeypatch.setattr(Sessional_Diary, 'process', recorded_process)
+
+    # the WH diary only needs the day numbers from the Chamber sheet
+    assert list(generate(str(generated), outputs=[WH_DIARY_FILE])) == [WH_DIARY_FILE]
+    assert processed == [WH_SHEET_TITLE]
+
+    processed.clear()
+    generate(str(generated), outputs=[HOUSE_ANALYSIS_FILE])
+    assert processed == [CH_SHEET_TITLE]
+
+
+def test_output_names():
+    assert output_name('house_analysis') == HOUSE_ANALYSIS_FILE
+    assert output_name(' WH_diary.xml') == WH_DIARY_FILE
+    with pytest.raises(ValueError, match='Unknown output'):
+        output_name('House_Summary')
@@ -0,0 +1,46 @@
+from collections import Counter
+
+from sessional_diary import cli
+from sessional_diary.api import generate
+from sessional_diary.cli import (
+    CH_SHEET_TITLE,
+    EXCEL_FILE,
+    HOUSE_ANALYSIS_FILE,
+    HOUSE_DIARY_FILE,
+    WH_SHEET_TITLE,
+    Sessional_Diary,
+)
+
+
+def test_each_sheet_is_read_and_classified_once(generated, monkeypatch):
+    reads: Counter = Counter()
+    rows: Counter = Counter()
+    classified: Counter = Counter()
+
+    entries = Sessional_Diary.entries
+    section_keys = cli.section_keys
+
+    def counted_entries(self, sheet_title):
+        reads[sheet_title] += 1
+        for c, entry in entries(self, sheet_title):
+            rows[sheet_title] += 1
+            yield c, entry
+
+    def counted_section_keys(chamber, entry):
+        classified[CH_SHEET_TITLE if chamber else WH_SHEET_TITLE] += 1
+        return section_keys(chamber, entry)
+
+    monkeypatch.setattr(Sessional_Diary, 'entries', counted_entries)
+    monkeypatch.setattr(cli, 'section_keys', counted_section_keys)
+
+    outputs = generate(str(generated))
+
+    assert EXCEL_FILE in outputs
+    assert reads == {CH_SHEET_TITLE: 1, WH_SHEET_TITLE: 1}
+    assert classified == rows
+
+
+def test_same_output_as_one_file_at_a_time(generated):
+    together = generate(str(generated), no_excel=True)
+    for name in (HOUSE_DIARY_FILE, HOUSE_ANALYSIS_FILE):
+        assert generate(str(generated), outputs=[name]) == {name: together[name]}
@@ -0,0 +1,52 @@
+from datetime import date
+
+from lxml import etree
+
+from sessional_diary.api import generate
+from sessional_diary.cli import HOUSE_DIARY_FILE, PREVIEW_FOLDER, WH_DIARY_FILE, run
+from sessional_diary.utilities import AID
+
+FROM, TO = date(2024, 9, 10), date(2024, 9, 13)
+
+
+def days(data: bytes) -> dict[str, list[bytes]]:
+    """The body cells of a diary, by day heading."""
+    [table] = etree.fromstring(data)
+    result: dict[str, list[bytes]] = {}
+    cells: list[bytes] = []
+    for cell in table:
+        if cell.get(AID + 'theader') is not None:
+            continue
+        # the day headings span the whole table
+        if cell.get(AID + 'ccols') in ('3', '4'):
+            cells = result[cell.text] = []
+        else:
+            cells.append(etree.tostring(cell))
+    return result
+
+
+def test_preview_is_the_days_from_the_whole_diary(generated):
+    whole = generate(str(generated), no_excel=True)
+    preview = generate(str(generated), no_excel=True, date_from=FROM, date_to=TO)
+
+    for name in (HOUSE_DIARY_FILE, WH_DIARY_FILE):
+        whole_days = days(whole[name])
+        preview_days = days(preview[name])
+        assert preview_days
+        assert all('September 2024' in title for title in preview_days)
+        # including the session totals so far
+        assert preview_days == {title: whole_days[title] for title in preview_days}
+
+    assert list(days(preview[HOUSE_DIARY_FILE])) == [
+        '6.\u2002Tuesday 10 September 2024', '7.\u2002Wednesday 11 September 2024',
+        '8.\u2002Thursday 12 September 2024', '9.\u2002Friday 13 September 2024']
+
+
+def test_preview_folder(workbook):
+    run(str(workbook), no_excel=True, date_from=FROM, date_to=TO)
+
+    preview = workbook.parent / PREVIEW_FOLDER
+    assert (preview / HOUSE_DIARY_FILE).read_bytes() == generate(
+        str(workbook), outputs=[HOUSE_DIARY_FILE], date_from=FROM, date_to=TO)[HOUSE_DIARY_FILE]
+    # the output for the whole session is left alone
+    assert not (workbook.parent / HOUSE_DIARY_FILE).exists()
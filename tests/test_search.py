@@ -0,0 +1,73 @@
+import json
+
+from equivalence import generated_workbook
+from openpyxl import load_workbook
+
+from sessional_diary import search
+from sessional_diary.cli import CH_SHEET_TITLE, WH_SHEET_TITLE
+from sessional_diary.search import SearchIndex, default_index_dir, words
+
+
+def matching_rows(workbook, query: str) -> list[tuple[str, int]]:
+    """(sheet, row) of every row with all the words of the query, by looking
+    at every row."""
+    found = []
+    wb = load_workbook(workbook, read_only=True)
+    for sheet_title in (CH_SHEET_TITLE, WH_SHEET_TITLE):
+        for r, (day, *_, subject1, subject2) in enumerate(
+                wb[sheet_title].iter_rows(min_row=2, max_col=5, values_only=True), 2):
+            if isinstance(day, int) and set(words(query)) <= set(
+                    words(f'{subject1} {subject2 or ""}')):
+                found.append((sheet_title, r))
+    return found
+
+
+def test_search_every_session(generated, tmp_path, capsys):
+    other = generated_workbook(tmp_path / '2025-26.xlsx', days=10, seed=2)
+    search.index_main([str(generated), '--session', '2024-25'])
+    search.index_main([str(other)])
+    assert capsys.readouterr().out == (
+        f'Indexed 2024-25 ({len(matching_rows(generated, ""))} rows)\n'
+        f'Indexed 2025-26 ({len(matching_rows(other, ""))} rows)\n')
+    assert sorted(SearchIndex(default_index_dir()).manifest) == ['2024-25', '2025-26']
+
+    search.main(['Opposition', 'rwanda', '--json'])
+    results = json.loads(capsys.readouterr().out)
+    assert results
+    assert sorted((result['session'], result['sheet'], result['row']) for result in results) == (
+        [('2024-25', *found) for found in matching_rows(generated, 'opposition rwanda')]
+        + [('2025-26', *found) for found in matching_rows(other, 'opposition rwanda')])
+    # newest first
+    assert results == sorted(results, key=lambda result: (result['date'], result['time']),
+                             reverse=True)
+
+    # only one session
+    index = SearchIndex()
+    assert {result['session'] for result in index.search('rwanda', sessions=['2025-26'])} == {
+        '2025-26'}
+
+
+def test_sort_by_time(generated):
+    index = SearchIndex()
+    index.add('2024-25', str(generated))
+
+    subjects = index.search('debate', sort='time')
+    items = index.search('debate')
+    assert sum(subject['items'] for subject in subjects) == len(items)
+    assert sum(subject['duration'] for subject in subjects) == sum(
+        item['duration'] for item in items)
+    durations = [subject['duration'] for subject in subjects]
+    assert durations == sorted(durations, reverse=True)
+
+
+def test_unchanged_sessions_are_not_indexed_again(generated, capsys):
+    index = SearchIndex()
+    assert index.add('2024-25', str(generated))
+    assert not index.add('2024-25', str(generated))
+
+    search.index_main([str(generated), '--session', '2024-25'])
+    assert capsys.readouterr().out == '2024-25 is already up to date\n'
+
+    index.remove('2024-25')
+    assert SearchIndex().manifest == {}
+    assert SearchIndex().search('rwanda') == []
@@ -0,0 +1,64 @@
+import io
+import json
+from collections import Counter
+from datetime import date, timedelta
+
+import pytest
+from openpyxl import load_workbook
+
+from sessional_diary.api import generate
+from sessional_diary.cli import CH_SHEET_TITLE, EXCEL_FILE, STATS_FILE, WH_SHEET_TITLE
+from sessional_diary.stats import SheetColumns, weekly_hours
+
+pytest.importorskip('numpy')
+
+
+def day_lengths(workbook, sheet_title) -> Counter:
+    """Minutes sat on each day, added up row by row."""
+    lengths: Counter = Counter()
+    ws = load_workbook(workbook, read_only=True)[sheet_title]
+    for day, day_date, *_, duration in ws.iter_rows(min_row=2, max_col=7, values_only=True):
+        if isinstance(day, int):
+            lengths[day_date.date()] += duration.hour * 60 + duration.minute
+    return lengths
+
+
+def test_statistics(generated):
+    outputs = generate(str(generated), stats=True)
+    stats = json.loads(outputs[STATS_FILE])
+
+    chamber = day_lengths(generated, CH_SHEET_TITLE)
+    sitting_length = stats['chamber']['sitting_length']
+    assert stats['chamber']['sitting_days'] == sitting_length['count'] == len(chamber) == 20
+    assert sitting_length['total_minutes'] == sum(chamber.values())
+    assert sitting_length['max_minutes'] == max(chamber.values())
+    longest = max(chamber, key=lambda day: chamber[day])
+    assert stats['chamber']['longest_sitting'] == longest.isoformat()
+
+    wh = day_lengths(generated, WH_SHEET_TITLE)
+    assert stats['westminster_hall']['sitting_length']['total_minutes'] == sum(wh.values())
+
+    # the hours of every week add up to the whole session
+    weeks = stats['weekly_hours']
+    assert sum(week['chamber_hours'] for week in weeks) == pytest.approx(
+        sum(chamber.values()) / 60, abs=0.01 * len(weeks))
+    assert all(date.fromisoformat(week['week_beginning']).weekday() == 0 for week in weeks)
+
+    wb = load_workbook(io.BytesIO(outputs[EXCEL_FILE]))
+    assert wb.sheetnames[-1] == 'Statistics'
+
+
+def test_weekly_hours_westminster_hall_only():
+    import numpy as np
+
+    wh = SheetColumns([], [])
+    # a Tuesday and a Thursday, then the Monday of the next week
+    wh.add(date(2024, 9, 3), timedelta(hours=1, minutes=30), timedelta(), [])
+    wh.add(date(2024, 9, 5), timedelta(hours=1), timedelta(), [])
+    wh.add(date(2024, 9, 9), timedelta(minutes=45), timedelta(), [])
+
+    for chamber in (None, SheetColumns([], [])):
+        assert weekly_hours(np, chamber, wh) == [
+            {'week_beginning': '2024-09-02', 'wh_hours': 2.5},
+            {'week_beginning': '2024-09-09', 'wh_hours': 0.75},
+        ]
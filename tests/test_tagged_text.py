@@ -0,0 +1,48 @@
+import re
+
+from lxml import etree
+from openpyxl import load_workbook
+
+from sessional_diary.api import generate
+from sessional_diary.cli import CH_SHEET_TITLE, HOUSE_DIARY_FILE, WH_ANALYSIS_FILE
+from sessional_diary.tagged_text import BOM, ENCODING, tagged_text_file_name
+from sessional_diary.utilities import AID
+
+TAG = re.compile(r'<(?:[^<>\\]|\\.)*(?:<[^<>]*>)*>')
+
+
+def cell_texts(tagged: str) -> list[str]:
+    """The text of every cell, without the tags."""
+    cells = re.findall(r'<CellStart:1,\d+>(.*?)<CellEnd:>', tagged)
+    return [re.sub(r'\\(.)', r'\1', TAG.sub('', cell)) for cell in cells]
+
+
+def test_tables_as_tagged_text(generated):
+    outputs = generate(str(generated), no_excel=True, tagged_text=True)
+
+    for name in (HOUSE_DIARY_FILE, WH_ANALYSIS_FILE):
+        data = outputs[tagged_text_file_name(name)]
+        assert data.startswith(f'{BOM}<UNICODE-WIN>\r\n'.encode(ENCODING))
+        tagged = data.decode(ENCODING)
+
+        [table] = etree.fromstring(outputs[name])
+        rows, columns = int(table.get(AID + 'trows')), int(table.get(AID + 'tcols'))
+        assert f'<TableStart:{rows},{columns}:1:0' in tagged
+        assert tagged.count('<RowStart:>') == rows
+        # the cells a cell spans are there too, empty
+        texts = cell_texts(tagged)
+        assert len(texts) == rows * columns
+        assert [text for text in texts if text] == [
+            ''.join(cell.itertext()) for cell in table if ''.join(cell.itertext())]
+
+
+def test_special_characters_are_escaped(generated, tmp_path):
+    wb = load_workbook(generated)
+    wb[CH_SHEET_TITLE]['E3'] = r'Fees <£100> \ month'
+    edited = tmp_path / 'edited.xlsx'
+    wb.save(edited)
+
+    outputs = generate(str(edited), outputs=[tagged_text_file_name(HOUSE_DIARY_FILE)])
+    tagged = outputs[tagged_text_file_name(HOUSE_DIARY_FILE)].decode(ENCODING)
+    assert r'Fees \<£100\> \\ month' in tagged
+    assert any(text.endswith(r'Fees <£100> \ month') for text in cell_texts(tagged))
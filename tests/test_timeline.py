@@ -0,0 +1,84 @@
+import json
+from collections import defaultdict
+from datetime import timedelta
+
+from openpyxl import load_workbook
+
+from sessional_diary import timeline
+from sessional_diary.cli import CH_SHEET_TITLE, WH_SHEET_TITLE
+from sessional_diary.utilities import format_timedelta
+
+
+def sitting_minutes(workbook, sheet_title) -> dict:
+    """The minutes of each sitting date (counted from midnight) when an item
+    was going on, worked out one minute at a time."""
+    minutes = defaultdict(set)
+    ws = load_workbook(workbook, read_only=True)[sheet_title]
+    for day, day_date, start, *_, duration in ws.iter_rows(min_row=2, max_col=7,
+                                                             values_only=True):
+        if not isinstance(day, int):
+            continue
+        first = start.hour * 60 + start.minute
+        if start < timeline.SITTING_DAY_STARTS:
+            first += 24 * 60
+        minutes[day_date.date()].update(range(first, first + duration.hour * 60
+                                              + duration.minute))
+    return minutes
+
+
+def clock(minute: int) -> str:
+    text = f'{minute // 60 % 24:02}.{minute % 60:02}'
+    return f'{text} (+1)' if minute >= 24 * 60 else text
+
+
+def gaps(minutes: dict) -> list[tuple[str, str, str]]:
+    result = []
+    for day_date, day_minutes in sorted(minutes.items()):
+        ordered = sorted(day_minutes)
+        result.extend((day_date.isoformat(), clock(before + 1), clock(after))
+                      for before, after in zip(ordered, ordered[1:]) if after > before + 1)
+    return result
+
+
+def test_timeline_report(generated):
+    result = timeline.timeline_report(str(generated))
+
+    chamber = sitting_minutes(generated, CH_SHEET_TITLE)
+    wh = sitting_minutes(generated, WH_SHEET_TITLE)
+    overlaps = {day_date: len(chamber[day_date] & wh[day_date]) for day_date in wh}
+    assert [(day['date'], day['overlap']) for day in result['overlaps']['days']] == [
+        (day_date.isoformat(), format_timedelta(timedelta(minutes=minutes)))
+        for day_date, minutes in sorted(overlaps.items()) if minutes]
+    assert result['overlaps']['total'] == format_timedelta(
+        timedelta(minutes=sum(overlaps.values())))
+
+    assert result['late_sittings'][CH_SHEET_TITLE]['days'] == [
+        {'date': day_date.isoformat(), 'finish': clock(max(minutes) + 1)}
+        for day_date, minutes in sorted(chamber.items()) if max(minutes) + 1 > 22 * 60]
+
+    for sheet_title, minutes in ((CH_SHEET_TITLE, chamber), (WH_SHEET_TITLE, wh)):
+        assert [(gap['date'], gap['from'], gap['to'])
+                for gap in result['gaps'][sheet_title]] == gaps(minutes)
+
+
+def test_gap(generated, tmp_path, capsys):
+    # take out the third item of the first day
+    wb = load_workbook(generated)
+    ws = wb[CH_SHEET_TITLE]
+    subject1, subject2 = ws['D3'].value, ws['E3'].value
+    start, duration, end = ws['C4'].value, ws['G4'].value, ws['C5'].value
+    ws.delete_rows(4)
+    edited = tmp_path / 'gap.xlsx'
+    wb.save(edited)
+
+    timeline.main([str(edited), '--json', '--min-gap', '1'])
+    result = json.loads(capsys.readouterr().out)
+
+    first_day = [gap for gap in result['gaps'][CH_SHEET_TITLE] if gap['date'] == '2024-09-03']
+    assert first_day == [{
+        'date': '2024-09-03',
+        'from': start.strftime('%H.%M'),
+        'to': end.strftime('%H.%M'),
+        'length': format_timedelta(timedelta(hours=duration.hour, minutes=duration.minute)),
+        'after': f'{subject1}: {subject2}',
+    }]
@@ -0,0 +1,58 @@
+import json
+import sys
+
+from lxml import etree
+from openpyxl import load_workbook
+
+from sessional_diary import api, cli
+from sessional_diary.cli import (
+    CH_SHEET_TITLE,
+    HOUSE_CONTENTS_FILE,
+    WH_CONTENTS_FILE,
+    WH_SHEET_TITLE,
+)
+
+
+def contents_column(data: bytes, column: int) -> list[str]:
+    """A column of a table of contents, without the heading."""
+    [table] = etree.fromstring(data)
+    return [cell.text for cell in table[4 + column::4]]
+
+
+def test_totals_match_the_tables_of_contents(generated):
+    totals = api.totals(str(generated))
+    outputs = api.generate(str(generated), outputs=[HOUSE_CONTENTS_FILE, WH_CONTENTS_FILE])
+
+    chamber = totals['chamber']
+    assert chamber['sitting_days'] == 20
+    contents = outputs[HOUSE_CONTENTS_FILE]
+    assert contents_column(contents, 2) == [section['duration'] for section in chamber['sections']]
+    assert contents_column(contents, 3) == [section['after_appointed_time']
+                                            for section in chamber['sections']]
+    assert contents_column(outputs[WH_CONTENTS_FILE], 2) == [
+        section['duration'] for section in totals['westminster_hall']['sections']]
+
+
+def test_totals_with_the_first_day_last(generated, tmp_path):
+    wb = load_workbook(generated)
+    for sheet_title in (CH_SHEET_TITLE, WH_SHEET_TITLE):
+        ws = wb[sheet_title]
+        rows = [[cell.value for cell in row] for row in ws.iter_rows(min_row=2)]
+        ws.delete_rows(2, ws.max_row)
+        for row in [row for row in rows if row[0] != 1] + [row for row in rows if row[0] == 1]:
+            ws.append(row)
+    edited = tmp_path / 'day 1 last.xlsx'
+    wb.save(edited)
+
+    totals = api.totals(str(edited))
+    assert totals['chamber']['sitting_days'] == 20
+    assert totals == api.totals(str(generated))
+
+
+def test_totals_option_creates_no_files(workbook, monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['sessional_diary', str(workbook), '--totals',
+                                      '--include-only', 'wh'])
+    cli.main()
+
+    assert json.loads(capsys.readouterr().out) == api.totals(str(workbook), include_chamber=False)
+    assert list(workbook.parent.iterdir()) == [workbook]